@@ -12,15 +12,131 @@ DB_PASSWORD = 'aJxD1W5FUBhW2u'  # Server DB Password
 DB_NAME = 'crmeb'
 TABLE_NAME = 'medical_device_enterprises'
 
+# SSH Tunnel Supervisor (database/tunnel.py): 后台线程保活 / 测 RTT / 断线后台重连，进程内所有连接共用一条隧道
+TUNNEL_KEEPALIVE = 15        # SSH keepalive 间隔（秒）
+TUNNEL_CHECK_INTERVAL = 5    # 健康检查间隔（秒）
+TUNNEL_LOCAL_PORT = 0        # 0 = 首次随机分配，之后重建隧道沿用同一端口
+TUNNEL_WAIT_TIMEOUT = 120    # 写库时最多等待隧道就绪的秒数
+TUNNEL_PING_TIMEOUT = 10     # 健康检查 RTT 探测超时（秒），超时按断线处理并重建
+
+# Categories (engine/categories.py): 要采的数据类别，main.py 轮流取各类别的关键词（共用一个浏览器会话和限速预算）
+# 第一个为主类别，沿用 TABLE_NAME / 原 checkpoint / 前缀表 / 租约键；其余默认表名 TABLE_NAME_<id>、checkpoint 与前缀表加 .<id> 后缀
+# 可选键: table / checkpoint / discovery_table
+# 默认只采主类别；追加类别会各建一张表，采集量按类别数成倍增加，例如:
+#     {"id": "licensed", "label": "医疗器械经营企业（许可）"},
+#     {"id": "manufacturer", "label": "医疗器械生产企业（许可）"},
+CATEGORIES = [
+    {"id": "filing", "label": "医疗器械经营企业（备案）"},
+]
+
 # Scraper Configuration
 # ... (rest of the file)
 
 # Scraper Configuration
 BASE_URL = "https://www.nmpa.gov.cn/datasearch/search-result.html"
-HEADLESS = False  # Set to True for production/background run
-MAX_PAGES = 1000   # Increased limit to 1000 pages (10,000 records) per keyword
+CDP_ENDPOINT = "http://localhost:9222"  # 手动启动的 Chrome 调试端口
+CHROME_PATH = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
+HEADLESS = False  # Set to True for production/background run (managed mode only)
+
+# Browser Mode
+# "cdp": 附着到手动启动的 Chrome (CDP_ENDPOINT)
+# "managed": 自启动 Chromium 池 (engine/browser_pool.py)，持久化 profile、按页数/内存回收、崩溃自动重启
+BROWSER_MODE = "cdp"
+BROWSER_POOL_SIZE = 2             # >1 时多余实例作为热备，回收时直接切换
+BROWSER_PROFILE_ROOT = "resources/browser_profiles"
+BROWSER_RECYCLE_PAGES = 500       # 单实例打开的页面（列表翻页 + 详情标签）超过该数即回收
+BROWSER_RECYCLE_MEMORY_MB = 1500  # 所有标签页 JS 堆总和超过该值即回收
+BROWSER_PROXIES = []              # 例如 ["http://127.0.0.1:7891"]，按实例轮流分配
+
+# Lightweight Mode (engine/resource_router.py): 拦截非必要资源，列表页和每条详情标签页都省流量/时间
+RESOURCE_BLOCKING = False
+BLOCK_RESOURCE_TYPES = ("image", "media", "font")  # 不拦 stylesheet：is_visible() 等判定依赖 CSS
+BLOCK_THIRD_PARTY = True          # 拦截站点域名以外的请求（统计脚本、第三方 CDN 等）
+ALLOWED_HOSTS = ("nmpa.gov.cn",)  # 额外放行的域名（含子域名）；BASE_URL 的域名自动放行
+RESOURCE_ALLOWLIST = ()           # 永远放行的 URL 片段，例如验证码图片接口
+
+# Detail Tab Reuse (engine/detail_tabs.py): 解析出详情 URL 后在常驻标签页里 goto，不再每行开/关新标签
+# URL 来源: 链接 href → DETAIL_URL_TEMPLATE（或首次点击时自动学习）+ 拦截到的列表 JSON；都失败则退回点击流程
+DETAIL_TAB_REUSE = False
+DETAIL_TAB_POOL_SIZE = 1
+DETAIL_TAB_RECYCLE_USES = 300       # 单个标签页加载详情超过该次数即关闭重建
+DETAIL_TAB_RECYCLE_MEMORY_MB = 256  # 单个标签页 JS 堆超过该值即关闭重建
+DETAIL_URL_TEMPLATE = None          # 例如 "https://.../datasearch/search-info.html?nid={id}"；None = 自动学习
+
+# Direct API Mode (engine/api_client.py): 从浏览器流量学会列表/详情接口后，用 httpx 直接请求（需 pip install "httpx[http2]"）
+# 浏览器仍然负责第一个关键词（学习接口）、提供 cookie，并在接口拒绝时接管
+API_MODE = False
+API_RECIPE_FILE = "resources/api_recipes.json"  # 学到的接口配方，重启后直接复用
+API_FIELD_MAP = {}           # 手动指定字段映射，如 {"legalRep": "data.fddbr"}；留空则自动学习
+API_TIMEOUT = 15
+API_SUSPEND_SECONDS = 600    # 接口被拒后多久内只用浏览器
+API_PAGE_SIZE = 100          # 直接请求列表接口时的每页条数（学到每页条数参数后生效；服务端封顶时以实际返回为准）
+
+# Response Archive (engine/archive.py): 每条详情 / 每页列表压缩存档（按内容寻址，按许可证编号索引）
+# 修改清洗规则后用 python -m engine.replay 离线重跑，无需重新爬取
+ARCHIVE_ENABLED = False
+ARCHIVE_DIR = "resources/archive"
+
+# Prefix Discovery (engine/prefix_discovery.py): 前缀频次表 + 入队裁剪
+# 已被更短的已搜关键词覆盖 / 样本几乎全是库内重复的前缀不再入队；新前缀入队时折叠队列里包含它的更长关键词
+PREFIX_DISCOVERY = False       # 默认关闭：开启后才按前缀频次表裁剪 / 折叠队列
+DISCOVERY_TABLE = "resources/prefix_table.db"
+DISCOVERY_MIN_SAMPLES = 20       # 至少观察到这么多行才按重复率判定
+DISCOVERY_SKIP_HIT_RATIO = 0.98  # 重复率 >= 该值视为已覆盖
+
+# Entity Resolution (engine/entity_resolution.py): 名称变体 / 同编号改名的近似重复索引（MinHash LSH + 编号分块）
+# 先用 python -m engine.entity_resolution --build 从库里建索引；采集时精确去重未命中的行再查一次
+ENTITY_RESOLUTION = False
+ENTITY_INDEX = "resources/entity_index.db"
+ENTITY_LSH_BANDS = 8             # bands × rows = MinHash 签名长度；8×4 约在 Jaccard 0.6 附近开始成桶
+ENTITY_LSH_ROWS = 4
+ENTITY_MATCH_THRESHOLD = 0.85    # 模糊匹配（规范名字二元组 Jaccard）阈值
+ENTITY_MAX_BUCKET = 200          # 超大桶（通用名称）不做两两比对
+ENTITY_MATCH_ACTION = "log"      # "log" = 记入索引的 matches 表仍照常采集；"skip" = 视为重复跳过
+
+# 地址 → 省 / 市 / 区县列（engine/geo.py）：入库时解析，存量数据 python -m engine.geo --backfill
+GEO_DIVISIONS = "resources/admin_divisions.json"   # 省级代码表（GB/T 2260）
+GEO_TARGETS = "resources/city_targets.json"        # 地级市名称来源
+GEO_BACKFILL_BATCH = 2000
+
+# 全文检索（engine/search.py）：scope / 地址上的 FULLTEXT ngram 索引；大表首次建索引会重建表，建议 python -m engine.search --build
+FULLTEXT_INDEX = False           # True = Storage.init_db 启动时补建缺失的全文索引
+SEARCH_PAGE_SIZE = 20
+
+# Coverage Estimator (engine/coverage.py): 站点总数 + 逐行去重命中率 + 库内按前缀计数 → 判断后续页几乎不可能有新记录时提前停止
+COVERAGE_EARLY_STOP = False    # 默认关闭：确认估计可靠后再开启
+COVERAGE_CONFIDENCE = 0.95     # 后续 HORIZON 页内 "没有任何新记录" 的概率 >= 该值即停止
+COVERAGE_HORIZON_PAGES = 20
+COVERAGE_MIN_PAGES = 3         # 每个关键词至少翻这么多页
+COVERAGE_PRIOR_STRENGTH = 20   # 库内覆盖率先验相当于多少行观测
+
+# Two-Phase Crawl (engine/enrichment.py): "full" = 列表 + 详情一起采（原行为）
+# "list" = 只快扫列表，新行写入待补表；"enrich" = main.py 按优先级从待补表补详情
+CRAWL_PHASE = "full"
+ENRICH_QUEUE = "resources/enrichment.db"
+ENRICH_PRIORITY_KEYWORDS = ()    # CRM 关注的地区 / 名称关键词，命中的待补记录优先
+ENRICH_DELAY_RANGE = (1.0, 3.0)  # 补详情阶段每条之间的间隔（秒）
+ENRICH_MAX_ATTEMPTS = 3
+
+# Incremental Mode (engine/incremental.py): python -m engine.incremental，按关键词水位线只采新备案企业
+INCREMENTAL_STORE = "resources/watermarks.db"
+INCREMENTAL_PROBE_PAGES = 2      # 前几页用来判断列表是否按备案时间倒序
+INCREMENTAL_ORDER_RATIO = 0.9    # 相邻行年份不增的比例 >= 该值视为倒序
+
+# 列表每页条数：None = 站点默认（10，默认不改）；"max" = 分页栏提供的最大档；整数 = 不超过该值的最大档
+# 总页数 / 1000 页拆分阈值都按实际每页条数计算
+LIST_PAGE_SIZE = None
+# 列表预取：处理第 N 页详情时，影子标签页用分页栏跳页框提前加载第 N+1 页（API 模式下由后台线程请求下一页）
+# 翻页加载与下一条详情之间仍间隔一次限速延迟，请求总数和间隔不变，只是省掉翻页等待
+LIST_PREFETCH = False
+# 关键词预热：当前关键词最后 KEYWORD_PREFETCH_TAIL_PAGES 页处理期间，备用标签页提前搜索队列里的下一个关键词
+# 下一个关键词直接接管备用标签页（省掉导航 / 选类别 / 输入 / 5 秒等待和关键词间 2 秒间隔），对大量小城市 / 发证机关关键词最明显
+KEYWORD_PREFETCH = False
+KEYWORD_PREFETCH_TAIL_PAGES = 2
+MAX_PAGES = 1000   # Increased limit to 1000 pages (10,000 records at 10 rows/page) per keyword
 DELAY_RANGE = (2, 4) # Fast scraping!
 BLOCKED_COOLDOWN = 70 # Legacy static value (will be superseded by Auto-Adaptive logic)
+BLOCK_SIGNAL_DEBOUNCE = 30 # 网络层封锁信号（403/429/验证页/空JSON）的去抖秒数：同一波信号只惩罚一次
 
 # Smart Adaptive Rate Limiter Settings
 RL_BASE_WAIT = 2.2    # 最快速率 (Block前多抓数据)
@@ -33,3 +149,32 @@ RL_RECOVERY_STEP = 2  # Seconds to recover (speed up) every 10 successes
 # Set to True to enable fast recovery after block (3 consecutive wins -> instant reset)
 # Set to False for gradual recovery (default, current behavior)
 USE_AGGRESSIVE_RECOVERY = True  # ← 激进模式实验中
+
+# Limiter Policy (engine/rate_limiter.py registry): "gradual" / "aggressive" / "aimd" / "time_of_day"
+# 运行时可通过 scraper.limiter.set_policy(...) 热切换
+RL_POLICY = "aggressive" if USE_AGGRESSIVE_RECOVERY else "gradual"
+RL_POLICY_OPTIONS = {}  # 传给策略构造函数的参数，如 time_of_day: {"schedule": {2: 2.2, 14: 3.5}, "inner": "aggressive"}
+RL_STATE_FILE = "resources/limiter_state.json"  # 限速状态持久化（重启后继承受罚状态）
+RL_STATE_MAX_AGE = 6 * 3600  # 超过该秒数的旧状态视为已冷却，不再继承
+
+# ⏰ Time-of-Day Throughput Scheduler (engine/throughput_scheduler.py)
+# 从 logs/scraper_behavior.jsonl 学习每小时封锁率：快窗口降速等待 + 跑大关键词，慢窗口跑小关键词 + 自修复
+SCHED_ENABLED = False
+SCHED_FAST_BLOCK_RATE = 0.5   # 每100次请求封锁次数 <= 该值 → 快窗口
+SCHED_SLOW_BLOCK_RATE = 2.0   # >= 该值 → 慢窗口
+SCHED_MIN_REQUESTS = 200      # 该小时样本不足则视为普通窗口
+SCHED_FAST_BASE = RL_MIN_WAIT
+SCHED_SLOW_BASE = RL_BASE_WAIT + 1.0
+
+# 🔒 Keyword Leases (engine/work_queue.py): main.py 与 fleet worker 共享的租约表
+# 心跳线程每 LEASE_SECONDS/3 续租一次；进程死掉后其关键词最多 LEASE_SECONDS 秒即被回收
+WORK_STORE = "resources/work_queue.db"
+LEASE_SECONDS = 90
+
+# 🚀 Crawl Fleet (engine/fleet.py): python -m engine.fleet
+# 每个 worker = 独立 CDP 端点 + 独立 profile + 独立代理（出口 IP）+ 独立限速器
+# launch=True 时由 coordinator 自动用 CHROME_PATH 启动对应的 Chrome
+FLEET_WORKERS = [
+    {"id": "w1", "cdp": "http://localhost:9222", "profile": r"C:\chrome_debug", "proxy": None, "launch": False},
+    # {"id": "w2", "cdp": "http://localhost:9223", "profile": r"C:\chrome_debug_2", "proxy": "http://127.0.0.1:7891", "launch": True},
+]
@@ -1,72 +1,65 @@
+import time
 import pymysql
 import config
+from engine.normalize import compact, db_rows, db_key, DB_COLUMNS, DB_KEY_COLUMNS
 from config import DB_HOST, DB_USER, DB_PASSWORD, DB_NAME, TABLE_NAME, DB_PORT
-try:
-    from sshtunnel import SSHTunnelForwarder
-except ImportError:
-    SSHTunnelForwarder = None
+from database.tunnel import get_supervisor
+from engine.geo import get_parser
+from engine.search import FULLTEXT_FIELDS, boolean_query, natural_query
+
+_POSITION = {name: i for i, (name, _) in enumerate(DB_COLUMNS)}
+_NAME, _ADDRESS, _OP_ADDRESS = _POSITION["enterprise_name"], _POSITION["address"], _POSITION["operation_address"]
+
+# 地区列（engine/geo.py）及其索引：idx_region 覆盖 省 / 省+市 / 省+市+区县，idx_city 覆盖只按市查
+GEO_DDL = (
+    ("province_code", "CHAR(2) DEFAULT NULL"),
+    ("province", "VARCHAR(16) DEFAULT NULL"),
+    ("city", "VARCHAR(32) DEFAULT NULL"),
+    ("district", "VARCHAR(32) DEFAULT NULL"),
+)
+GEO_INDEXES = (
+    ("idx_region", "province_code, city, district"),
+    ("idx_city", "city, district"),
+)
+
+
+def _backfill_key(value):
+    return None if value is None else (db_key(value) or '')
+
 
 class Storage:
-    def __init__(self):
-        self.tunnel = None
+    def __init__(self, table_name=None):
+        # 每个类别一张表（engine/categories.py）；默认即 config.TABLE_NAME
+        self.table = table_name or TABLE_NAME
+        self.supervisor = None
+        self._generation = 0
         self.conn = self._get_connection(init=True)
 
     def _ensure_tunnel_alive(self):
-        """检查SSH隧道是否存活，如果断开则重连（带重试机制）"""
-        import time as _time
-        
+        """
+        Wait (only if needed) for the supervisor's tunnel; the supervisor thread reconnects in the background.
+        If the tunnel came back on a different local port, reopen our connection.
+        """
         if not getattr(config, 'USE_SSH', False):
             return  # 不使用SSH隧道
-        
-        if self.tunnel is None or not self.tunnel.is_active:
-            print("[Storage] ⚠️ SSH Tunnel disconnected! Reconnecting...")
-            # 关闭旧隧道（如果存在）
-            if self.tunnel:
-                try:
-                    self.tunnel.stop()
-                except:
-                    pass
-            self.tunnel = None
-            
-            # 🔧 FIX: 重试机制 —— 最多尝试3次，间隔递增（10s, 30s, 60s）
-            retry_delays = [10, 30, 60]
-            last_error = None
-            for attempt, delay in enumerate(retry_delays, 1):
-                try:
-                    self.conn = self._get_connection(init=False)
-                    print(f"[Storage] ✅ SSH Tunnel reconnected! (attempt {attempt})")
-                    return  # 成功，直接返回
-                except Exception as e:
-                    last_error = e
-                    print(f"[Storage] ❌ Reconnect attempt {attempt}/{len(retry_delays)} failed: {e}")
-                    if attempt < len(retry_delays):
-                        print(f"[Storage] ⏳ Waiting {delay}s before retrying...")
-                        _time.sleep(delay)
-            
-            # 三次都失败，抛出异常
-            raise Exception(f"SSH Tunnel reconnection failed after {len(retry_delays)} attempts: {last_error}")
+        if not self.supervisor.is_ready():
+            print("[Storage] ⏳ Waiting for the SSH tunnel...")
+        self.supervisor.endpoint(timeout=getattr(config, 'TUNNEL_WAIT_TIMEOUT', 120))
+        if self._generation != self.supervisor.generation:
+            try: self.conn.close()
+            except: pass
+            self.conn = self._get_connection()
 
     def _get_connection(self, init=False):
-        # 1. Handle SSH Tunneling
+        # 1. Handle SSH Tunneling (database/tunnel.py: one supervised tunnel shared by every connection in this process)
         db_host = DB_HOST
         db_port = DB_PORT
         
         if getattr(config, 'USE_SSH', False):
-            if not self.tunnel or not self.tunnel.is_active:
-                print(f"[Storage] Opening SSH Tunnel to {config.SSH_HOST}:{config.SSH_PORT}...")
-                self.tunnel = SSHTunnelForwarder(
-                    (config.SSH_HOST, config.SSH_PORT),
-                    ssh_username=config.SSH_USER,
-                    ssh_password=config.SSH_PASSWORD,
-                    remote_bind_address=('127.0.0.1', 3306),
-                    local_bind_address=('127.0.0.1', 0) # Use random local port
-                )
-                self.tunnel.start()
-            
-            # Use the local port mapped by the tunnel
-            db_host = self.tunnel.local_bind_host
-            db_port = self.tunnel.local_bind_port
-            print(f"[Storage] Tunnel active. Local endpoint: {db_host}:{db_port}")
+            if self.supervisor is None:
+                self.supervisor = get_supervisor()
+            db_host, db_port = self.supervisor.endpoint(timeout=getattr(config, 'TUNNEL_WAIT_TIMEOUT', 120))
+            self._generation = self.supervisor.generation
 
         # 2. Database Connection
         # First connect without DB to create it if needed
@@ -98,7 +91,7 @@ class Storage:
             # enterprise_name, legal_representative, actual_controller, responsible_person, operation_mode, scope, address, 
             # operation_address, warehouse_address, filing_department, license_number, filing_date
             sql = f"""
-            CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            CREATE TABLE IF NOT EXISTS {self.table} (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 enterprise_name VARCHAR(255) NOT NULL,
                 legal_representative VARCHAR(100),
@@ -121,13 +114,238 @@ class Storage:
                 owner_id INT DEFAULT 0 COMMENT '当前跟进人',
                 t_last DATE DEFAULT NULL COMMENT '最后联系日期',
                 t_next DATE DEFAULT NULL COMMENT '计划回访日期',
+                license_key VARCHAR(255) DEFAULT NULL COMMENT '规范化编号（去空白），去重主键',
+                name_key VARCHAR(255) DEFAULT NULL COMMENT '规范化企业名称（去空白）',
+                province_code CHAR(2) DEFAULT NULL COMMENT 'GB/T 2260 省级代码，''=地址未能定位',
+                province VARCHAR(16) DEFAULT NULL COMMENT '省（简称）',
+                city VARCHAR(32) DEFAULT NULL COMMENT '地级市（直辖市同省）',
+                district VARCHAR(32) DEFAULT NULL COMMENT '区县',
                 UNIQUE KEY uq_enterprise_name (enterprise_name),
-                INDEX idx_stage (stage)
+                INDEX idx_stage (stage),
+                INDEX idx_license_key (license_key),
+                INDEX idx_name_key (name_key),
+                INDEX idx_region (province_code, city, district),
+                INDEX idx_city (city, district)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
             """
             cursor.execute(sql)
             self.conn.commit()
-            print(f"[Storage] Table '{TABLE_NAME}' checked.")
+            print(f"[Storage] Table '{self.table}' checked.")
+        self.migrate_keys()
+        self.migrate_geo()
+        if getattr(config, 'FULLTEXT_INDEX', False):
+            self.migrate_fulltext()
+
+    # ------------------------------------------------------------------
+    # Online migration: normalized key columns + indexes on existing tables
+    # ------------------------------------------------------------------
+    def _columns(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SHOW COLUMNS FROM {self.table}")
+            return {row['Field'] for row in cursor.fetchall()}
+
+    def _indexes(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SHOW INDEX FROM {self.table}")
+            return {row['Key_name'] for row in cursor.fetchall()}
+
+    def _alter_online(self, clause):
+        """ALTER without blocking writers: INSTANT → INPLACE/LOCK=NONE → plain (older MySQL)."""
+        for options in (", ALGORITHM=INSTANT", ", ALGORITHM=INPLACE, LOCK=NONE", ""):
+            try:
+                with self.conn.cursor() as cursor:
+                    cursor.execute(f"ALTER TABLE {self.table} {clause}{options}")
+                self.conn.commit()
+                return
+            except pymysql.err.MySQLError:
+                if not options:
+                    raise  # 否则：该算法不支持此操作，降级重试
+
+    def migrate_keys(self, batch_size=5000):
+        """
+        Add license_key / name_key to an existing table, backfill them in short id-ranged batches
+        (writers are never blocked for long), then build the indexes. Idempotent; safe to rerun after interruption.
+        """
+        columns = self._columns()
+        for key_col, _ in DB_KEY_COLUMNS:
+            if key_col not in columns:
+                print(f"[Storage] Migration: adding column {key_col}...")
+                self._alter_online(f"ADD COLUMN {key_col} VARCHAR(255) DEFAULT NULL")
+
+        backfilled = 0
+        last_id = 0
+        while True:
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    f"""SELECT id, license_number, enterprise_name FROM {self.table}
+                    WHERE id > %s AND ((license_key IS NULL AND license_number IS NOT NULL)
+                                    OR (name_key IS NULL AND enterprise_name IS NOT NULL))
+                    ORDER BY id LIMIT %s""", (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                # 源列非 NULL 但全是空白的旧行写入 ''，避免每次都被重新选中
+                cursor.executemany(
+                    f"UPDATE {self.table} SET license_key = %s, name_key = %s WHERE id = %s",
+                    [(_backfill_key(r['license_number']), _backfill_key(r['enterprise_name']), r['id']) for r in rows])
+            self.conn.commit()
+            backfilled += len(rows)
+            print(f"[Storage] Migration: backfilled {backfilled} rows (id <= {last_id})...")
+
+        indexes = self._indexes()
+        for key_col, _ in DB_KEY_COLUMNS:
+            index = f"idx_{key_col}"
+            if index not in indexes:
+                print(f"[Storage] Migration: building index {index}...")
+                self._alter_online(f"ADD INDEX {index} ({key_col})")
+        if backfilled:
+            print(f"[Storage] ✅ Key columns ready ({backfilled} rows backfilled).")
+
+    # ------------------------------------------------------------------
+    # Region columns (engine/geo.py): schema + batched backfill
+    # ------------------------------------------------------------------
+    def migrate_geo(self):
+        """Add the region columns and their indexes to an existing table (rows are filled by backfill_geo)."""
+        columns = self._columns()
+        for col, ddl in GEO_DDL:
+            if col not in columns:
+                print(f"[Storage] Migration: adding column {col}...")
+                self._alter_online(f"ADD COLUMN {col} {ddl}")
+        indexes = self._indexes()
+        for index, cols in GEO_INDEXES:
+            if index not in indexes:
+                print(f"[Storage] Migration: building index {index}...")
+                self._alter_online(f"ADD INDEX {index} ({cols})")
+
+    def backfill_geo(self, batch_size=2000, everything=False):
+        """
+        Parse address / operation_address / enterprise_name of existing rows in id-ranged batches.
+        Only rows never located (province_code IS NULL) unless everything=True (after a dictionary update).
+        """
+        self.migrate_geo()
+        geo = get_parser()
+        pending = "" if everything else "AND province_code IS NULL"
+        done = located = 0
+        last_id = 0
+        while True:
+            self._ensure_tunnel_alive()
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    f"""SELECT id, address, operation_address, enterprise_name FROM {self.table}
+                    WHERE id > %s {pending} ORDER BY id LIMIT %s""", (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1]['id']
+                values = []
+                for r in rows:
+                    geo_row = geo.db_values(r['address'], r['operation_address'], r['enterprise_name'])
+                    located += bool(geo_row[0])
+                    values.append(geo_row + (r['id'],))
+                cursor.executemany(
+                    f"UPDATE {self.table} SET province_code = %s, province = %s, city = %s, district = %s WHERE id = %s",
+                    values)
+            self.conn.commit()
+            done += len(rows)
+            print(f"[Storage] Geo backfill: {done} rows ({located} located, id <= {last_id})...")
+        print(f"[Storage] ✅ Geo backfill done: {done} rows, {located} located.")
+        return done
+
+    def count_by_region(self, province_code=None):
+        """(province or city, rows) via idx_region: per province, or per city inside one province."""
+        self._ensure_tunnel_alive()
+        self.conn.ping(reconnect=True)
+        with self.conn.cursor() as cursor:
+            if province_code:
+                cursor.execute(
+                    f"SELECT city AS name, COUNT(*) AS n FROM {self.table} WHERE province_code = %s "
+                    f"GROUP BY city ORDER BY n DESC", (province_code,))
+            else:
+                cursor.execute(
+                    f"SELECT province_code, MAX(province) AS name, COUNT(*) AS n FROM {self.table} "
+                    f"GROUP BY province_code ORDER BY n DESC")
+            return [(row['name'], row['n']) for row in cursor.fetchall()]
+
+    def find_by_region(self, province_code=None, city=None, district=None, limit=100, offset=0):
+        """Rows in a region: index lookup on (province_code, city, district) / (city, district)."""
+        where, params = [], []
+        for col, value in (("province_code", province_code), ("city", city), ("district", district)):
+            if value:
+                where.append(f"{col} = %s")
+                params.append(value)
+        if not where:
+            return []
+        self._ensure_tunnel_alive()
+        self.conn.ping(reconnect=True)
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT * FROM {self.table} WHERE {' AND '.join(where)} ORDER BY id LIMIT %s OFFSET %s",
+                params + [limit, offset])
+            return cursor.fetchall()
+
+    # ------------------------------------------------------------------
+    # Full-text search (engine/search.py): ngram FULLTEXT indexes on scope / addresses
+    # ------------------------------------------------------------------
+    def migrate_fulltext(self):
+        """Create the ngram FULLTEXT indexes if missing (InnoDB keeps them in sync on every write)."""
+        indexes = self._indexes()
+        for index, columns in FULLTEXT_FIELDS.values():
+            if index not in indexes:
+                print(f"[Storage] Migration: building FULLTEXT index {index} ({columns})...")
+                started = time.time()
+                self._alter_online(f"ADD FULLTEXT INDEX {index} ({columns}) WITH PARSER ngram")
+                print(f"[Storage] ✅ {index} ready ({time.time() - started:.0f}s).")
+
+    def search_text(self, query, field="scope", province_code=None, city=None, limit=20, offset=0):
+        """
+        (total, rows) for a full-text query: every term required, ranked by relevance then id.
+        Optional region filter on the geo columns; rows carry a 'score'.
+        """
+        if field not in FULLTEXT_FIELDS:
+            raise ValueError(f"Unknown search field '{field}' (expected one of {sorted(FULLTEXT_FIELDS)})")
+        required = boolean_query(query)
+        if not required:
+            return 0, []
+        index, columns = FULLTEXT_FIELDS[field]
+        where = [f"MATCH({columns}) AGAINST(%s IN BOOLEAN MODE)"]
+        params = [required]
+        for col, value in (("province_code", province_code), ("city", city)):
+            if value:
+                where.append(f"{col} = %s")
+                params.append(value)
+        where = " AND ".join(where)
+
+        self._ensure_tunnel_alive()
+        self.conn.ping(reconnect=True)
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) AS n FROM {self.table} WHERE {where}", params)
+            total = cursor.fetchone()['n']
+            if not total or offset >= total:
+                return total, []
+            cursor.execute(
+                f"""SELECT id, enterprise_name, license_number, scope, address, operation_address,
+                       province, city, district,
+                       MATCH({columns}) AGAINST(%s IN NATURAL LANGUAGE MODE) AS score
+                FROM {self.table} WHERE {where}
+                ORDER BY score DESC, id LIMIT %s OFFSET %s""",
+                [natural_query(query)] + params + [limit, offset])
+            return total, cursor.fetchall()
+
+    def _keys_ready(self):
+        """True when every row carries its normalized keys (migration finished)."""
+        try:
+            if not {k for k, _ in DB_KEY_COLUMNS} <= self._columns():
+                return False
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    f"""SELECT 1 FROM {self.table}
+                    WHERE (license_key IS NULL AND license_number IS NOT NULL)
+                       OR (name_key IS NULL AND enterprise_name IS NOT NULL)
+                    LIMIT 1""")
+                return cursor.fetchone() is None
+        except Exception:
+            return False
 
     def save_batch(self, data_list):
         if not data_list:
@@ -144,9 +362,10 @@ class Storage:
 
         with self.conn.cursor() as cursor:
             sql = f"""
-            INSERT INTO {TABLE_NAME} 
-            (enterprise_name, legal_representative, actual_controller, responsible_person, contact_phone, operation_mode, scope, address, operation_address, filing_department, license_number, filing_date)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            INSERT INTO {self.table} 
+            (enterprise_name, legal_representative, actual_controller, responsible_person, contact_phone, operation_mode, scope, address, operation_address, filing_department, license_number, filing_date,
+             license_key, name_key, province_code, province, city, district)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             ON DUPLICATE KEY UPDATE
             enterprise_name = VALUES(enterprise_name),
             legal_representative = VALUES(legal_representative),
@@ -160,30 +379,20 @@ class Storage:
             filing_department = VALUES(filing_department),
             license_number = VALUES(license_number),
             filing_date = VALUES(filing_date),
+            license_key = VALUES(license_key),
+            name_key = VALUES(name_key),
+            province_code = VALUES(province_code),
+            province = VALUES(province),
+            city = VALUES(city),
+            district = VALUES(district),
             crawled_at = CURRENT_TIMESTAMP
             """
             
-            values = []
-            for item in data_list:
-                # Helper to convert empty strings to None (NULL) for cleaner DB
-                def get_val(key):
-                    val = item.get(key, '').strip()
-                    return val if val else None
-
-                values.append((
-                    get_val('entName') or get_val('enterprise_name'),
-                    get_val('legalRep') or get_val('legal_representative'),
-                    get_val('actualController') or get_val('actual_controller'),
-                    get_val('resPerson') or get_val('responsible_person'),
-                    get_val('contactPhone') or get_val('contact_phone'),
-                    get_val('opMode') or get_val('operation_mode'),
-                    get_val('scope'),
-                    get_val('entAddress') or get_val('address'),
-                    get_val('opAddress') or get_val('operation_address'),
-                    get_val('filingDept') or get_val('filing_department'),
-                    get_val('licenseNum') or get_val('license_number'),
-                    get_val('filingDate') or get_val('filing_date')
-                ))
+            # 列式转换：空字符串 → NULL，scraper 键名优先、兼容旧键名；末尾附带规范化去重键（engine/normalize.py）
+            values = db_rows(data_list, keys=True)
+            # 地区列（engine/geo.py）：地址 → 省 / 市 / 区县，入库即可按 idx_region 查询
+            geo = get_parser()
+            values = [row + geo.db_values(row[_ADDRESS], row[_OP_ADDRESS], row[_NAME]) for row in values]
             
             cursor.executemany(sql, values)
             self.conn.commit()
@@ -196,7 +405,7 @@ class Storage:
         """Delete a record by enterprise name (for replacing truncated names)."""
         try:
             with self.conn.cursor() as cursor:
-                sql = f"DELETE FROM {TABLE_NAME} WHERE enterprise_name = %s"
+                sql = f"DELETE FROM {self.table} WHERE enterprise_name = %s"
                 cursor.execute(sql, (enterprise_name,))
                 self.conn.commit()
                 return cursor.rowcount
@@ -205,18 +414,50 @@ class Storage:
             return 0
 
 
+    def find_by_license(self, license_number):
+        """Rows whose normalized license equals this one (idx_license_key lookup)."""
+        key = db_key(license_number)
+        if not key:
+            return []
+        self._ensure_tunnel_alive()
+        self.conn.ping(reconnect=True)
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"SELECT * FROM {self.table} WHERE license_key = %s", (key,))
+            return cursor.fetchall()
+
+    def iter_identities(self, batch_size=10000):
+        """Stream (id, license_number, enterprise_name) in id order (entity-resolution index build)."""
+        last_id = 0
+        while True:
+            self._ensure_tunnel_alive()
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT id, license_number, enterprise_name FROM {self.table} WHERE id > %s ORDER BY id LIMIT %s",
+                    (last_id, batch_size))
+                rows = cursor.fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row['id'], row['license_number'], row['enterprise_name']
+            last_id = rows[-1]['id']
+
     def get_existing_records(self):
         """Fetch only COMPLETE (license_num, ent_name) pairs for deduplication using Streaming Cursor."""
         # 🔧 FIX: Use SSCursor (Server Side Cursor) to prevent "read_bytes" hang on large datasets over SSH
         # This streams rows one by one instead of loading all 50k+ rows into RAM/Network buffer at once
         existing = set()
+        # 迁移完成后直接读规范化键列，不再逐行 compact()
+        keys_ready = self._keys_ready()
         try:
             # Create a new connection specifically for this streaming operation to avoid cursor conflicts
             # We use the internal _get_connection logic but ensure it's a fresh handle
             stream_conn = self._get_connection()
             
             with stream_conn.cursor(pymysql.cursors.SSCursor) as cursor:
-                cursor.execute(f"SELECT license_number, enterprise_name FROM {TABLE_NAME}")
+                if keys_ready:
+                    cursor.execute(f"SELECT license_key, name_key FROM {self.table}")
+                else:
+                    cursor.execute(f"SELECT license_number, enterprise_name FROM {self.table}")
                 
                 while True:
                     row = cursor.fetchone() # Stream one row
@@ -229,10 +470,11 @@ class Storage:
                     lic = row[0] if row and len(row) > 0 else ''
                     name = row[1] if row and len(row) > 1 else ''
                     
-                    if lic or name:
-                        clean_lic = lic.replace(" ", "").replace("\t", "").replace("\n", "") if lic else ''
-                        clean_name = name.replace(" ", "").replace("\t", "").replace("\n", "") if name else ''
-                        existing.add((clean_lic, clean_name))
+                    if keys_ready:
+                        if lic or name:
+                            existing.add((lic or '', name or ''))
+                    elif lic or name:
+                        existing.add((compact(lic), compact(name)))
             
             stream_conn.close()
             return existing
@@ -253,7 +495,7 @@ class Storage:
             # But `scope` and `address` are almost always present for valid records.
             sql_empty = f"""
             SELECT enterprise_name 
-            FROM {TABLE_NAME} 
+            FROM {self.table} 
             WHERE ((scope IS NULL OR scope = '') 
                AND (address IS NULL OR address = ''))
                AND enterprise_name IS NOT NULL 
@@ -263,7 +505,7 @@ class Storage:
             # Query 2: Truncated names
             sql_truncated = f"""
             SELECT enterprise_name 
-            FROM {TABLE_NAME} 
+            FROM {self.table} 
             WHERE enterprise_name LIKE '%...'
             """
             
@@ -287,6 +529,6 @@ class Storage:
     def close(self):
         if hasattr(self, 'conn') and self.conn:
             self.conn.close()
-        if hasattr(self, 'tunnel') and self.tunnel:
-            self.tunnel.stop()
-            print("[Storage] SSH Tunnel closed.")
+        if getattr(self, 'supervisor', None):
+            self.supervisor.release()
+            self.supervisor = None
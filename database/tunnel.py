@@ -0,0 +1,456 @@
+"""
+Tunnel Supervisor - 常驻后台线程维护 SSH 隧道（keepalive + 健康检查 + 提前重连）
+
+原先 Storage._ensure_tunnel_alive() 在每次 save_batch 开头同步检查隧道，断开时按 10/30/60 秒重试，
+整个爬虫跟着卡住，_get_connection 每次重连都打印一遍。这里：
+- 独立线程负责建立 / 探测 / 重建隧道；SSH 层 keepalive，定时测 RTT（keepalive@openssh.com 往返）
+- 隧道断开后立即在后台重建（退避 1/2/5/10/30 秒），不等下一次写库才发现
+- RTT 探测在单独线程里跑、带超时（TUNNEL_PING_TIMEOUT）：服务器不回包的半开连接按断线处理，不会卡住监护线程
+- 重建时沿用同一个本地端口：已有的 pymysql 连接 ping(reconnect=True) 即可恢复
+- 同一进程内所有 Storage / 流式连接共用一条隧道（sshtunnel 对每个 TCP 连接开一个 SSH channel，天然多路复用）
+- 写路径只调用 endpoint()：隧道就绪时立即返回，未就绪时等待 ready 事件（不再自己 sleep 重试）
+
+forwarder_factory 可替换为本地 sshd 或纯 socket 转发的替身，只需实现 start/stop/alive/ping/local_port；
+SocketForwarder 就是这样的替身（纯 TCP 转发），--self-test 用它对本地回显服务跑一遍 建立 → 断线 → 同端口重建 → 探测超时。
+
+自检:
+    python -m database.tunnel --seconds 60
+    python -m database.tunnel --self-test      # 不需要 SSH / MySQL
+"""
+import argparse
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+import config
+
+try:
+    from sshtunnel import SSHTunnelForwarder
+except ImportError:
+    SSHTunnelForwarder = None
+
+BACKOFF = (1, 2, 5, 10, 30)
+
+
+class TunnelUnavailable(Exception):
+    """The tunnel did not become ready within the wait timeout."""
+
+
+class SSHForwarder:
+    """sshtunnel adapter: the interface TunnelSupervisor drives."""
+
+    def __init__(self, ssh_host, ssh_port, ssh_user, ssh_password, remote, local_port=0, keepalive=15):
+        if SSHTunnelForwarder is None:
+            raise RuntimeError("sshtunnel is not installed (pip install sshtunnel)")
+        self.forwarder = SSHTunnelForwarder(
+            (ssh_host, ssh_port),
+            ssh_username=ssh_user,
+            ssh_password=ssh_password,
+            remote_bind_address=remote,
+            local_bind_address=('127.0.0.1', local_port),
+            set_keepalive=keepalive,
+        )
+
+    def start(self):
+        self.forwarder.start()
+
+    def stop(self):
+        self.forwarder.stop()
+
+    @property
+    def local_port(self):
+        return self.forwarder.local_bind_port
+
+    def alive(self):
+        transport = getattr(self.forwarder, '_transport', None)
+        return bool(self.forwarder.is_active and transport and transport.is_active())
+
+    def ping(self):
+        """SSH round trip in seconds (global request, answered by the server even when rejected).
+
+        Blocks until the server answers; TunnelSupervisor runs it under a deadline."""
+        transport = self.forwarder._transport
+        started = time.perf_counter()
+        transport.global_request("keepalive@openssh.com", wait=True)
+        return time.perf_counter() - started
+
+
+def _close_listener(server):
+    """Close a listening socket and wake a thread blocked in accept() (plain close() keeps the port bound)."""
+    try: server.shutdown(socket.SHUT_RDWR)
+    except OSError: pass
+    server.close()
+
+
+class SocketForwarder:
+    """Plain TCP forwarder 127.0.0.1:local_port → remote (no SSH): stand-in for TunnelSupervisor tests."""
+
+    def __init__(self, remote, local_port=0, connect_timeout=5):
+        self.remote = remote
+        self.requested_port = local_port
+        self.connect_timeout = connect_timeout
+        self.server = None
+        self.closed = threading.Event()
+        self.sockets = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        socket.create_connection(self.remote, timeout=self.connect_timeout).close()  # 远端不可达时像 SSH 一样启动失败
+        self.server = socket.create_server(('127.0.0.1', self.requested_port))
+        threading.Thread(target=self._accept_loop, name="socket-forwarder", daemon=True).start()
+
+    def stop(self):
+        self.closed.set()
+        if self.server:
+            _close_listener(self.server)
+        with self._lock:
+            sockets, self.sockets = self.sockets, set()
+        for sock in sockets:
+            try: sock.close()
+            except OSError: pass
+
+    @property
+    def local_port(self):
+        return self.server.getsockname()[1]
+
+    def alive(self):
+        return self.server is not None and not self.closed.is_set()
+
+    def ping(self):
+        """TCP connect round trip to the remote in seconds."""
+        started = time.perf_counter()
+        socket.create_connection(self.remote, timeout=self.connect_timeout).close()
+        return time.perf_counter() - started
+
+    def _accept_loop(self):
+        while not self.closed.is_set():
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            try:
+                upstream = socket.create_connection(self.remote, timeout=self.connect_timeout)
+                upstream.settimeout(None)
+            except OSError:
+                client.close()
+                continue
+            with self._lock:
+                self.sockets.update((client, upstream))
+            for src, dst in ((client, upstream), (upstream, client)):
+                threading.Thread(target=self._pump, args=(src, dst), daemon=True).start()
+
+    def _pump(self, src, dst):
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                dst.sendall(data)
+        except OSError:
+            pass
+        for sock in (src, dst):
+            try: sock.close()
+            except OSError: pass
+            with self._lock:
+                self.sockets.discard(sock)
+
+
+class TunnelSupervisor(threading.Thread):
+    def __init__(self, ssh_host, ssh_port, ssh_user, ssh_password, remote=('127.0.0.1', 3306),
+                 local_port=0, keepalive=15, check_interval=5, ping_timeout=10, forwarder_factory=None):
+        super().__init__(name="tunnel-supervisor", daemon=True)
+        self.ssh_host = ssh_host
+        self.ssh_port = ssh_port
+        self.ssh_user = ssh_user
+        self.ssh_password = ssh_password
+        self.remote = remote
+        self.local_port = local_port
+        self.keepalive = keepalive
+        self.check_interval = check_interval
+        self.ping_timeout = ping_timeout
+        self.forwarder_factory = forwarder_factory or self._ssh_forwarder
+        self.forwarder = None
+        self.generation = 0  # 每次重建隧道 +1（本地端口变化时 Storage 据此重连）
+        self.rtt = deque(maxlen=120)
+        self.stats = {"starts": 0, "failures": 0, "drops": 0, "probes": 0}
+        self.last_error = None
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._users = 0
+        self._lock = threading.Lock()
+
+    def _ssh_forwarder(self, local_port):
+        return SSHForwarder(self.ssh_host, self.ssh_port, self.ssh_user, self.ssh_password,
+                            self.remote, local_port=local_port, keepalive=self.keepalive)
+
+    # ------------------------------------------------------------------
+    # Supervisor thread
+    # ------------------------------------------------------------------
+    def run(self):
+        attempt = 0
+        while not self._stop_event.is_set():
+            if not self._ready.is_set():
+                if self._open():
+                    attempt = 0
+                else:
+                    delay = BACKOFF[min(attempt, len(BACKOFF) - 1)]
+                    attempt += 1
+                    self._stop_event.wait(delay)
+                    continue
+            elif not self._probe():
+                self.stats["drops"] += 1
+                print(f"[Tunnel] ⚠️ Tunnel to {self.ssh_host} dropped ({self.last_error}). Reconnecting in background...")
+                self._close_forwarder()
+                continue
+            self._stop_event.wait(self.check_interval)
+        self._close_forwarder()
+
+    def _open(self):
+        try:
+            forwarder = self.forwarder_factory(self.local_port)
+            forwarder.start()
+        except Exception as e:
+            if self.local_port and "address" in str(e).lower():
+                # 固定端口被占用：换随机端口，已有连接会按 generation 重连
+                self.local_port = 0
+            self.stats["failures"] += 1
+            if str(e) != str(self.last_error):
+                print(f"[Tunnel] ❌ Could not open tunnel to {self.ssh_host}:{self.ssh_port}: {e}")
+            self.last_error = e
+            return False
+        self.forwarder = forwarder
+        if forwarder.local_port != self.local_port or self.generation == 0:
+            self.generation += 1
+        self.local_port = forwarder.local_port
+        self.stats["starts"] += 1
+        self.last_error = None
+        self._probe()
+        self._ready.set()
+        print(f"[Tunnel] ✅ Tunnel ready: 127.0.0.1:{self.local_port} → {self.ssh_host} ({self.describe_rtt()})")
+        return True
+
+    def _probe(self):
+        self.stats["probes"] += 1
+        try:
+            if not self.forwarder.alive():
+                self.last_error = "transport inactive"
+                return False
+            self.rtt.append(self._ping_with_deadline())
+            return True
+        except Exception as e:
+            self.last_error = e
+            return False
+
+    def _ping_with_deadline(self):
+        """forwarder.ping() in a helper thread; a probe the server never answers counts as a drop."""
+        result = {}
+
+        def target():
+            try:
+                result["rtt"] = forwarder.ping()
+            except Exception as e:
+                result["error"] = e
+
+        forwarder = self.forwarder
+        probe = threading.Thread(target=target, name="tunnel-ping", daemon=True)
+        probe.start()
+        probe.join(self.ping_timeout)
+        if probe.is_alive():
+            # 关闭 forwarder 时 transport 失效，挂住的 global_request 随之返回
+            raise TimeoutError(f"ping unanswered after {self.ping_timeout}s")
+        if "error" in result:
+            raise result["error"]
+        return result["rtt"]
+
+    def _close_forwarder(self):
+        self._ready.clear()
+        if self.forwarder:
+            try: self.forwarder.stop()
+            except: pass
+            self.forwarder = None
+
+    # ------------------------------------------------------------------
+    # Client side
+    # ------------------------------------------------------------------
+    def endpoint(self, timeout=120):
+        """(host, port) of a ready tunnel; waits for the supervisor instead of reconnecting inline."""
+        if not self._ready.wait(timeout):
+            raise TunnelUnavailable(f"SSH tunnel not ready after {timeout}s: {self.last_error}")
+        return '127.0.0.1', self.local_port
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def describe_rtt(self):
+        if not self.rtt:
+            return "rtt n/a"
+        ordered = sorted(self.rtt)
+        return (f"rtt last {self.rtt[-1] * 1000:.0f} ms, p50 {ordered[len(ordered) // 2] * 1000:.0f} ms, "
+                f"max {ordered[-1] * 1000:.0f} ms")
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+            if self.ident is None:
+                self.start()
+        return self
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            if self._users > 0:
+                return
+        self.stop()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=10)
+        else:
+            self._close_forwarder()
+        print(f"[Tunnel] Closed. {self.stats}, {self.describe_rtt()}")
+
+
+_supervisor = None
+_supervisor_lock = threading.Lock()
+
+
+def get_supervisor():
+    """The process-wide supervisor (started on first use). Pair every call with supervisor.release()."""
+    global _supervisor
+    with _supervisor_lock:
+        if _supervisor is None or _supervisor._stop_event.is_set():
+            _supervisor = TunnelSupervisor(
+                config.SSH_HOST, config.SSH_PORT, config.SSH_USER, config.SSH_PASSWORD,
+                remote=('127.0.0.1', 3306),
+                local_port=getattr(config, 'TUNNEL_LOCAL_PORT', 0),
+                keepalive=getattr(config, 'TUNNEL_KEEPALIVE', 15),
+                check_interval=getattr(config, 'TUNNEL_CHECK_INTERVAL', 5),
+                ping_timeout=getattr(config, 'TUNNEL_PING_TIMEOUT', 10),
+            )
+        return _supervisor.acquire()
+
+
+class _EchoServer:
+    """Local TCP echo backend for --self-test; can be stopped and restarted on the same port."""
+
+    def __init__(self, port=0):
+        self.port = port
+        self.server = None
+
+    def start(self):
+        self.server = socket.create_server(('127.0.0.1', self.port))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._serve, args=(self.server,), daemon=True).start()
+
+    def stop(self):
+        _close_listener(self.server)
+
+    @staticmethod
+    def _serve(server):
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            threading.Thread(target=_EchoServer._echo, args=(conn,), daemon=True).start()
+
+    @staticmethod
+    def _echo(conn):
+        with conn:
+            try:
+                while True:
+                    data = conn.recv(65536)
+                    if not data:
+                        return
+                    conn.sendall(data)
+            except OSError:
+                pass
+
+
+def _wait_for(predicate, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+def self_test():
+    """Drive TunnelSupervisor through SocketForwarder against a local echo server; True when every step passed."""
+    backend = _EchoServer()
+    backend.start()
+    stall = threading.Event()
+    unstall = threading.Event()
+
+    class StallingForwarder(SocketForwarder):
+        def ping(self):
+            if stall.is_set():
+                unstall.wait()  # 模拟服务器不回 keepalive 的半开连接
+            return super().ping()
+
+    supervisor = TunnelSupervisor('127.0.0.1', backend.port, None, None, remote=('127.0.0.1', backend.port),
+                                  check_interval=0.2, ping_timeout=1,
+                                  forwarder_factory=lambda port: StallingForwarder(('127.0.0.1', backend.port), port))
+
+    def echo():
+        host, port = supervisor.endpoint(timeout=5)
+        with socket.create_connection((host, port), timeout=5) as conn:
+            conn.sendall(b"tunnel-self-test")
+            return conn.recv(64) == b"tunnel-self-test"
+
+    results = []
+
+    def check(name, ok):
+        results.append(ok)
+        print(f"[Tunnel] {'✅' if ok else '❌'} {name}")
+
+    supervisor.acquire()
+    try:
+        check("forwards traffic", echo())
+        port = supervisor.local_port
+        backend.stop()
+        check("backend loss detected as a drop", _wait_for(lambda: supervisor.stats["drops"] >= 1, 5))
+        backend = _EchoServer(backend.port)
+        backend.start()
+        check("rebuilt on the same local port", _wait_for(supervisor.is_ready, 10)
+              and supervisor.local_port == port and echo())
+        drops = supervisor.stats["drops"]
+        stall.set()
+        check("unanswered ping times out as a drop",
+              _wait_for(lambda: supervisor.stats["drops"] > drops, supervisor.ping_timeout + 3))
+        stall.clear()
+        unstall.set()
+        check("recovers after the stall", _wait_for(lambda: supervisor.is_ready() and echo(), 15))
+    finally:
+        unstall.set()
+        supervisor.release()
+        backend.stop()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open the configured SSH tunnel and report health / RTT")
+    parser.add_argument("--seconds", type=int, default=60)
+    parser.add_argument("--self-test", action="store_true",
+                        help="Exercise the supervisor with a plain-socket forwarder against a local echo server")
+    args = parser.parse_args()
+    if args.self_test:
+        sys.exit(0 if self_test() else 1)
+    supervisor = get_supervisor()
+    try:
+        host, port = supervisor.endpoint(timeout=getattr(config, 'TUNNEL_WAIT_TIMEOUT', 120))
+        print(f"[Tunnel] Endpoint {host}:{port}")
+        deadline = time.time() + args.seconds
+        while time.time() < deadline:
+            time.sleep(supervisor.check_interval)
+            print(f"[Tunnel] ready={supervisor.is_ready()} gen={supervisor.generation} {supervisor.describe_rtt()}")
+    finally:
+        supervisor.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""
+Site API Client - 直接重放站点自己的 /datasearch/ 接口（不经过浏览器渲染）
+
+浏览器只是用来驱动站点的列表 / 详情 XHR，而 handle_response 本来就能看到这些请求：
+- observe(): 从浏览器流量里学习列表接口（哪个参数是关键词、哪个是页码）和详情接口（哪个参数取自列表记录的哪个字段）
+- learn_fields(): 浏览器成功提取一条记录后，对照接口 JSON 学习 "我们的字段名 → JSON 路径"
+- borrow() / refresh(): 从真实浏览器 context 借 cookie + 请求头（token 等），过期后重新借
+学习完成后用带连接池的 httpx.Client（keep-alive，装了 h2 时走 HTTP/2）直接请求；
+被拒（封锁状态码 / WAF 响应）先刷新凭据重试一次，仍被拒则抛 ApiRejected，由 scraper 退回浏览器引擎。
+
+依赖: pip install "httpx[http2]"（未安装时 API 模式自动关闭）
+"""
+import json
+import os
+import time
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+from engine.block_signals import classify_response
+from engine.detail_tabs import find_record
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  (httpx 的 HTTP/2 支持)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# 不从浏览器请求里照搬的头（由 HTTP 客户端自己生成）
+SKIP_HEADERS = {"cookie", "content-length", "host", "connection", "accept-encoding"}
+REJECT_STATUSES = {401}
+TOTAL_KEYS = ("total", "totalcount", "totalelements", "totalrecords", "count")
+SIZE_KEY_HINTS = ("size", "limit", "rows", "perpage", "per_page")  # 每页条数参数的常见命名
+MIN_MATCH_LEN = 2
+
+
+class ApiRejected(Exception):
+    """The site refused a direct API call (block status, WAF body, expired token...)."""
+
+
+def _squash(value):
+    return "".join(str(value).split())
+
+
+def flatten(node, prefix="", out=None, max_depth=6):
+    """{"data": {"a": 1}} -> {"data.a": 1}; lists are not descended (rows are handled separately)."""
+    out = {} if out is None else out
+    if isinstance(node, dict) and max_depth >= 0:
+        for k, v in node.items():
+            path = f"{prefix}.{k}" if prefix else str(k)
+            if isinstance(v, dict):
+                flatten(v, path, out, max_depth - 1)
+            elif not isinstance(v, list):
+                out[path] = v
+    return out
+
+
+def find_rows(payload):
+    """Largest list of dicts inside a list-API payload."""
+    best = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            dicts = [x for x in node if isinstance(x, dict)]
+            if len(dicts) > len(best):
+                best = dicts
+            stack.extend(x for x in node if isinstance(x, (dict, list)))
+    return best
+
+
+def find_total(payload):
+    """First integer field that looks like a total record count (0 if none)."""
+    for path, value in flatten(payload).items():
+        if path.rsplit(".", 1)[-1].lower() in TOTAL_KEYS:
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                continue
+    return 0
+
+
+def _split_params(url, post_data):
+    """-> (url without query, query dict, body dict, body format)"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query, keep_blank_values=True))
+    bare = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    body, body_format = {}, None
+    if post_data:
+        try:
+            parsed = json.loads(post_data)
+            if isinstance(parsed, dict):
+                body, body_format = parsed, "json"
+        except ValueError:
+            body, body_format = dict(parse_qsl(post_data, keep_blank_values=True)), "form"
+    return bare, query, body, body_format
+
+
+class ApiRecipe:
+    """A captured XHR that can be replayed with some parameters swapped."""
+
+    def __init__(self, method, url, query, body, body_format, headers):
+        self.method = method
+        self.url = url
+        self.query = query
+        self.body = body
+        self.body_format = body_format
+        self.headers = headers
+
+    @classmethod
+    def from_request(cls, request):
+        url, query, body, body_format = _split_params(request.url, request.post_data)
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in SKIP_HEADERS and not k.startswith(":")}
+        return cls(request.method, url, query, body, body_format, headers)
+
+    def find_param(self, value):
+        """Name of the query/body parameter carrying `value` (whitespace-insensitive)."""
+        target = _squash(value)
+        if not target:
+            return None
+        for params in (self.query, self.body):
+            for k, v in params.items():
+                if isinstance(v, (str, int)) and _squash(v) == target:
+                    return k
+        return None
+
+    def build(self, **overrides):
+        query = {k: overrides.get(k, v) for k, v in self.query.items()}
+        body = {k: overrides.get(k, v) for k, v in self.body.items()}
+        return query, body
+
+    def to_dict(self):
+        return {"method": self.method, "url": self.url, "query": self.query, "body": self.body,
+                "body_format": self.body_format, "headers": self.headers}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["method"], d["url"], d.get("query", {}), d.get("body", {}), d.get("body_format"), d.get("headers", {}))
+
+
+class SiteApiClient:
+    def __init__(self, recipe_file=None, field_map=None, timeout=15, suspend_seconds=600, page_size=None):
+        self.recipe_file = recipe_file
+        self.page_size = page_size  # 直接请求时使用的每页条数（None = 沿用浏览器请求里的值）
+        self.timeout = timeout
+        self.suspend_seconds = suspend_seconds
+        self.list_recipe = None
+        self.detail_recipe = None
+        self.keyword_key = None   # 列表接口里的关键词参数
+        self.page_key = None      # 列表接口里的页码参数
+        self.size_key = None      # 列表接口里的每页条数参数
+        self.detail_key = None    # 详情接口里标识记录的参数
+        self.detail_field = None  # ...它的值取自列表记录的哪个字段
+        self.field_map = {}       # 我们的字段名 -> 详情 JSON 路径
+        self.list_map = {}        # licenseNum / entName -> 列表记录里的路径
+        self.manual_map = dict(field_map or {})
+        self.last_detail_payload = None
+        self._last_list = None    # (keyword, query+body) 用于识别页码参数
+        self.suspended_until = 0.0
+        self.client = None
+        self.stats = {"list_calls": 0, "detail_calls": 0, "rejected": 0, "refreshes": 0, "fallbacks": 0}
+        self.load()
+
+    # ------------------------------------------------------------------
+    # Learning from browser traffic
+    # ------------------------------------------------------------------
+    def available(self):
+        return httpx is not None
+
+    def ready(self):
+        if not self.available() or time.time() < self.suspended_until:
+            return False
+        fields = {**self.field_map, **self.manual_map}
+        # map_row 只靠 list_map：列表行缺编号 / 名称列时得到空行，去重会全部放行
+        return bool(self.list_recipe and self.keyword_key and self.page_key
+                    and self.detail_recipe and self.detail_key and self.detail_field
+                    and "licenseNum" in self.list_map and "entName" in self.list_map
+                    and "licenseNum" in fields and "entName" in fields
+                    and ("legalRep" in fields or "resPerson" in fields))
+
+    def observe(self, request, data, keyword=None, row=None):
+        """Feed one intercepted /datasearch/ JSON exchange (called from handle_response)."""
+        try:
+            recipe = ApiRecipe.from_request(request)
+        except Exception:
+            return
+        key = recipe.find_param(keyword) if keyword else None
+        if key and find_rows(data):
+            self._observe_list(recipe, key, keyword)
+            self._observe_size(recipe, len(find_rows(data)))
+            return
+        if row:
+            for field, value in row.items():
+                if not isinstance(value, (str, int)) or len(str(value).strip()) < MIN_MATCH_LEN:
+                    continue
+                param = recipe.find_param(value)
+                if param:
+                    if self.detail_recipe is None or self.detail_recipe.url != recipe.url:
+                        print(f"[API] Learned detail endpoint: {recipe.method} {recipe.url} ({param} <- {field})")
+                    self.detail_recipe, self.detail_key, self.detail_field = recipe, param, field
+                    self.last_detail_payload = data
+                    return
+
+    def _observe_list(self, recipe, keyword_key, keyword):
+        params = {**recipe.query, **recipe.body}
+        if self._last_list and self._last_list[0] == keyword and not self.page_key:
+            # 同一关键词的相邻两次列表请求：值 +1 的那个参数就是页码
+            for k, v in params.items():
+                try:
+                    if int(v) == int(self._last_list[1].get(k)) + 1:
+                        self.page_key = k
+                        print(f"[API] Learned list endpoint: {recipe.method} {recipe.url} (keyword={keyword_key}, page={k})")
+                        break
+                except (TypeError, ValueError):
+                    continue
+        self._last_list = (keyword, params)
+        self.list_recipe, self.keyword_key = recipe, keyword_key
+
+    def _observe_size(self, recipe, row_count):
+        """The integer parameter named like a page size whose value is at least the rows returned."""
+        if self.size_key:
+            return
+        for k, v in {**recipe.query, **recipe.body}.items():
+            if k in (self.keyword_key, self.page_key) or not any(h in k.lower() for h in SIZE_KEY_HINTS):
+                continue
+            try:
+                if int(v) >= row_count > 0:
+                    self.size_key = k
+                    print(f"[API] Learned page-size parameter: {k} (browser used {v})")
+                    return
+            except (TypeError, ValueError):
+                continue
+
+    def learn_fields(self, item, list_payloads=()):
+        """After a browser capture: map our field names onto the API JSON paths holding the same values."""
+        if self.last_detail_payload is not None:
+            self.field_map.update(self._match_paths(flatten(self.last_detail_payload), item))
+        record = find_record(list_payloads, item.get("licenseNum"))
+        if record:
+            self.list_map.update(self._match_paths(flatten(record), item, keys=("licenseNum", "entName")))
+
+    @staticmethod
+    def _match_paths(flat, item, keys=None):
+        found = {}
+        for our_key, value in item.items():
+            if keys and our_key not in keys:
+                continue
+            target = _squash(value) if value else ""
+            if len(target) < MIN_MATCH_LEN:
+                continue
+            exact = [p for p, v in flat.items() if isinstance(v, (str, int)) and _squash(v) == target]
+            # 清洗后的值（如去掉 "(负责人)" 前缀）只能做包含匹配
+            loose = [p for p, v in flat.items() if isinstance(v, str) and target in _squash(v)]
+            paths = exact or loose
+            if paths:
+                found[our_key] = min(paths, key=len)
+        return found
+
+    # ------------------------------------------------------------------
+    # Credentials
+    # ------------------------------------------------------------------
+    def borrow(self, context):
+        """(Re)build the pooled client with the browser's current cookies and request headers."""
+        if not self.available():
+            return
+        cookies = {}
+        try:
+            for c in context.cookies(self.list_recipe.url if self.list_recipe else None):
+                cookies[c["name"]] = c["value"]
+        except Exception as e:
+            print(f"[API] Could not read browser cookies: {e}")
+        headers = dict(self.list_recipe.headers) if self.list_recipe else {}
+        if self.client:
+            try: self.client.close()
+            except: pass
+        self.client = httpx.Client(http2=HTTP2, headers=headers, cookies=cookies, timeout=self.timeout,
+                                   follow_redirects=True,
+                                   limits=httpx.Limits(max_keepalive_connections=4, max_connections=8))
+        print(f"[API] Borrowed {len(cookies)} cookie(s) from the browser (HTTP/2: {HTTP2})")
+
+    def refresh(self, context):
+        self.stats["refreshes"] += 1
+        self.borrow(context)
+
+    def suspend(self):
+        """Stop using the API for a while (the browser engine takes over and re-learns)."""
+        self.stats["fallbacks"] += 1
+        self.suspended_until = time.time() + self.suspend_seconds
+
+    # ------------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------------
+    def _call(self, recipe, **overrides):
+        if self.client is None:
+            raise ApiRejected("no client (call borrow() first)")
+        query, body = recipe.build(**overrides)
+        kwargs = {"params": query or None, "headers": recipe.headers}
+        if recipe.body_format == "json":
+            kwargs["json"] = body
+        elif recipe.body_format == "form":
+            kwargs["data"] = body
+        try:
+            resp = self.client.request(recipe.method, recipe.url, **kwargs)
+        except Exception as e:
+            self.stats["rejected"] += 1
+            raise ApiRejected(f"network error: {e}")
+        reason = classify_response(str(resp.url), resp.status_code, resp.text, "xhr")
+        if reason is None and resp.status_code in REJECT_STATUSES:
+            reason = f"HTTP {resp.status_code}"
+        if reason is None:
+            try:
+                return resp.json()
+            except ValueError:
+                reason = "non-JSON response"
+        self.stats["rejected"] += 1
+        raise ApiRejected(reason)
+
+    def fetch_list(self, keyword, page):
+        """-> (rows, total records)"""
+        self.stats["list_calls"] += 1
+        overrides = {self.keyword_key: keyword, self.page_key: page}
+        if self.size_key and self.page_size:
+            overrides[self.size_key] = self.page_size
+        data = self._call(self.list_recipe, **overrides)
+        return find_rows(data), find_total(data)
+
+    def fetch_detail(self, row, base_info=None):
+        """base_info: the row already mapped to our names (the detail key may be e.g. licenseNum)."""
+        self.stats["detail_calls"] += 1
+        value = flatten(row).get(self.detail_field)
+        if value is None and base_info:
+            value = base_info.get(self.detail_field)
+        if value is None:
+            raise ApiRejected(f"list row has no '{self.detail_field}'")
+        return self._call(self.detail_recipe, **{self.detail_key: value})
+
+    def map_row(self, row):
+        """licenseNum / entName of a list row, whitespace removed like the browser list parser does."""
+        flat = flatten(row)
+        return {k: _squash(flat[p]) for k, p in self.list_map.items() if flat.get(p) not in (None, "")}
+
+    def map_detail(self, payload):
+        """Raw (uncleaned) values keyed by our field names."""
+        flat = flatten(payload)
+        out = {}
+        for our_key, path in {**self.field_map, **self.manual_map}.items():
+            if flat.get(path) not in (None, ""):
+                out[our_key] = str(flat[path]).strip()
+        return out
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self):
+        if not self.recipe_file or not self.list_recipe:
+            return
+        state = {
+            "list": self.list_recipe.to_dict(), "keyword_key": self.keyword_key, "page_key": self.page_key,
+            "size_key": self.size_key,
+            "detail": self.detail_recipe.to_dict() if self.detail_recipe else None,
+            "detail_key": self.detail_key, "detail_field": self.detail_field,
+            "field_map": self.field_map, "list_map": self.list_map,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.recipe_file) or ".", exist_ok=True)
+            tmp = self.recipe_file + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.recipe_file)
+        except Exception as e:
+            print(f"[API] Could not save recipes: {e}")
+
+    def load(self):
+        if not self.recipe_file or not os.path.exists(self.recipe_file):
+            return
+        try:
+            with open(self.recipe_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.list_recipe = ApiRecipe.from_dict(state["list"])
+            self.keyword_key, self.page_key = state.get("keyword_key"), state.get("page_key")
+            self.size_key = state.get("size_key")
+            if state.get("detail"):
+                self.detail_recipe = ApiRecipe.from_dict(state["detail"])
+            self.detail_key, self.detail_field = state.get("detail_key"), state.get("detail_field")
+            self.field_map = state.get("field_map", {})
+            self.list_map = state.get("list_map", {})
+            print(f"[API] Loaded recipes from {self.recipe_file} (ready: {self.ready()})")
+        except Exception as e:
+            print(f"[API] Ignoring unreadable recipe file: {e}")
+
+    def close(self):
+        self.save()
+        if self.client:
+            try: self.client.close()
+            except: pass
+            self.client = None
@@ -0,0 +1,160 @@
+"""
+Response Archive - 压缩、按内容寻址的本地采集归档（按许可证编号索引）
+
+- 每条详情（标签/值对、列表行信息，API 模式下还有原始 JSON）与每页列表行都存为
+  objects/<sha256 前 2 位>/<sha256>.json.gz，内容相同只存一份
+- SQLite 索引 captures(license_key, kind, digest, keyword, category, captured_at) 记录每个许可证编号的全部快照
+  category = 采集时的类别 id（engine/categories.py）；旧归档没有该列，视为主类别
+- engine/replay.py 读取每个编号的最新快照，用当前解析/清洗规则重新生成记录并写入所属类别的表（零网络）
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+DEFAULT_ARCHIVE = "resources/archive"
+
+
+def license_key(license_num):
+    return "".join(str(license_num or "").split())
+
+
+class ResponseArchive:
+    def __init__(self, root=DEFAULT_ARCHIVE):
+        self.root = root
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS captures (
+                license_key TEXT NOT NULL,
+                kind        TEXT NOT NULL,      -- detail / list
+                digest      TEXT NOT NULL,
+                keyword     TEXT,
+                category    TEXT,               -- 类别 id；NULL = 主类别（加列之前的旧归档）
+                captured_at REAL NOT NULL,
+                PRIMARY KEY (license_key, kind, digest)
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(captures)")}
+        if "category" not in columns:
+            self.conn.execute("ALTER TABLE captures ADD COLUMN category TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_captures_kind ON captures (kind, captured_at)")
+        self.conn.commit()
+        self.written = 0
+        self.deduped = 0
+
+    # ------------------------------------------------------------------
+    # Blobs
+    # ------------------------------------------------------------------
+    def _blob_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest + ".json.gz")
+
+    def put(self, obj):
+        """Store a JSON-able object; returns its sha256 digest (no-op if already stored)."""
+        raw = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._blob_path(digest)
+        if os.path.exists(path):
+            self.deduped += 1
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        # mtime=0: 相同内容压缩后字节也相同
+        with gzip.GzipFile(tmp, "wb", compresslevel=6, mtime=0) as f:
+            f.write(raw)
+        os.replace(tmp, path)
+        self.written += 1
+        return digest
+
+    def get(self, digest):
+        with gzip.open(self._blob_path(digest), "rb") as f:
+            return json.loads(f.read().decode("utf-8"))
+
+    # ------------------------------------------------------------------
+    # Capture
+    # ------------------------------------------------------------------
+    def _index(self, keys, kind, digest, keyword, category=None):
+        now = time.time()
+        try:
+            self.conn.executemany(
+                "INSERT INTO captures (license_key, kind, digest, keyword, category, captured_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(license_key, kind, digest) DO UPDATE SET captured_at=excluded.captured_at, category=excluded.category",
+                [(k, kind, digest, keyword, category, now) for k in keys if k])
+            self.conn.commit()
+        except Exception as e:
+            print(f"[Archive] Index write failed: {e}")
+
+    def record_detail(self, license_num, base_info, pairs=None, fields=None, payload=None, keyword=None, category=None):
+        """
+        pairs:    raw (label, value) cells from the detail table (browser engine)
+        fields:   raw values already keyed by our field names (API engine)
+        payload:  the detail JSON as received (API engine / intercepted)
+        category: category id the capture belongs to (replay writes it to that category's table)
+        """
+        try:
+            digest = self.put({"base_info": base_info, "pairs": pairs, "fields": fields, "payload": payload})
+            self._index([license_key(license_num or base_info.get("licenseNum"))], "detail", digest, keyword, category)
+        except Exception as e:
+            print(f"[Archive] Could not archive detail for {license_num}: {e}")
+
+    def record_list(self, rows, keyword=None, category=None):
+        """One list page: [{"licenseNum", "entName"}, ...] including rows skipped as duplicates."""
+        try:
+            digest = self.put({"rows": rows})
+            self._index([license_key(r.get("licenseNum")) for r in rows], "list", digest, keyword, category)
+        except Exception as e:
+            print(f"[Archive] Could not archive list page: {e}")
+
+    # ------------------------------------------------------------------
+    # Replay side
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _category_filter(category, primary):
+        """SQL fragment + params selecting one category (the primary one also owns pre-category captures)."""
+        if category is None:
+            return "", ()
+        if primary:
+            return " AND (category = ? OR category IS NULL)", (category,)
+        return " AND category = ?", (category,)
+
+    def iter_latest(self, kind="detail", since=0.0, category=None, primary=False):
+        """(license_key, blob) for the most recent capture of each license number (optionally of one category)."""
+        where, params = self._category_filter(category, primary)
+        cur = self.conn.execute(
+            "SELECT c.license_key, c.digest FROM captures c "
+            "JOIN (SELECT license_key, MAX(captured_at) AS ts FROM captures "
+            f"WHERE kind = ? AND captured_at >= ?{where} GROUP BY license_key) m "
+            f"ON c.license_key = m.license_key AND c.captured_at = m.ts AND c.kind = ?{where.replace('category', 'c.category')} "
+            "ORDER BY c.license_key", (kind, since) + params + (kind,) + params)
+        seen = set()
+        for key, digest in cur:
+            if key in seen:
+                continue
+            seen.add(key)
+            try:
+                yield key, self.get(digest)
+            except Exception as e:
+                print(f"[Archive] Missing / corrupt blob {digest[:12]} for {key}: {e}")
+
+    def iter_blobs(self, kind="list", category=None, primary=False):
+        """Every distinct blob of a kind (list pages are shared by all their licenses)."""
+        where, params = self._category_filter(category, primary)
+        for (digest,) in self.conn.execute(f"SELECT DISTINCT digest FROM captures WHERE kind = ?{where}", (kind,) + params):
+            try:
+                yield self.get(digest)
+            except Exception:
+                continue
+
+    def stats(self):
+        out = {kind: n for kind, n in self.conn.execute(
+            "SELECT kind, COUNT(DISTINCT license_key) FROM captures GROUP BY kind")}
+        out["written"] = self.written
+        out["deduped"] = self.deduped
+        return out
+
+    def close(self):
+        try: self.conn.close()
+        except: pass
@@ -0,0 +1,126 @@
+"""
+Block Signals - 基于网络响应的封锁快速判定
+
+handle_response 能看到每个响应的状态码 / URL / JSON 体。
+WAF 拦截通常表现为：
+1. 4xx/5xx 状态码（403/429/503...）
+2. 跳转到验证 / challenge 页面
+3. /datasearch/ 接口返回空体，或提示字段（msg / message ...）里带 "访问过于频繁" 之类的 JSON
+在这些信号出现的瞬间就通知限速器，而不是等 DOM 轮询 10 秒后才发现白屏。
+只看页面本身和数据接口（document / xhr / fetch）：图片、脚本、样式等静态资源的 403 / 503 与封锁无关。
+"""
+import json
+import re
+import time
+from urllib.parse import urlparse
+
+BLOCK_STATUSES = {403, 405, 412, 418, 429, 503, 521}
+# 参与判定的资源类型（None = 调用方未知类型，如 API 客户端自己发的请求）
+SIGNAL_RESOURCE_TYPES = ("document", "xhr", "fetch", None)
+# 按路径分段匹配（不看查询串，避免关键词等参数误触发）
+CHALLENGE_URL_MARKERS = ("captcha", "verify", "challenge", "waf", "antibot", "blocked")
+WAF_BODY_MARKERS = ("访问过于频繁", "请求过于频繁", "安全验证", "验证码", "拒绝访问", "非法请求",
+                    "access denied", "forbidden", "too many requests", "captcha", "waf")
+# 接口 JSON 里的提示字段：WAF 短语只在这些字段里找，数据字段（企业名称、经营范围...）里出现不算
+MESSAGE_FIELDS = ("msg", "message", "errmsg", "errMsg", "error", "errorMsg", "error_msg", "tip", "tips", "reason")
+# 详情接口 URL 特征（与小写化的 URL 比较）：详情接口返回空数据 = 被静默丢包（列表接口查无结果是正常的）
+DETAIL_URL_MARKERS = ("detail", "info")
+RE_PATH_TOKEN = re.compile(r'[a-z]+')
+RE_TITLE = re.compile(r'<title[^>]*>(.*?)</title>', re.I | re.S)
+CHALLENGE_PAGE_MAX = 2000  # 拦截页通常很短；更长的正常页面只看 <title>
+
+
+def _challenge_path(lowered_url):
+    tokens = set(RE_PATH_TOKEN.findall(urlparse(lowered_url).path))
+    return any(m in tokens for m in CHALLENGE_URL_MARKERS)
+
+
+def _waf_message(data):
+    """WAF phrase in a known top-level message field of a JSON dict."""
+    for key in MESSAGE_FIELDS:
+        val = data.get(key)
+        if isinstance(val, str) and val:
+            lowered = val.lower()
+            if any(m in lowered for m in WAF_BODY_MARKERS):
+                return True
+    return False
+
+
+def classify_response(url, status, body_text=None, resource_type=None):
+    """
+    Return a short reason string if this response looks like a block, else None.
+    Only documents and XHR / fetch calls are judged; body_text is only inspected for /datasearch/ JSON
+    (message fields) and HTML documents (short pages, or the <title>).
+    """
+    if resource_type not in SIGNAL_RESOURCE_TYPES:
+        return None
+    lowered_url = (url or "").lower()
+    if status in BLOCK_STATUSES:
+        return f"HTTP {status}"
+    if _challenge_path(lowered_url):
+        return "challenge redirect"
+
+    if body_text is None:
+        return None
+
+    text = body_text.strip()
+    if "/datasearch/" in lowered_url and resource_type in ("xhr", "fetch", None):
+        if text in ("", "{}", "[]", "null", '""'):
+            return "empty JSON body"
+        try:
+            data = json.loads(text)
+        except ValueError:
+            # JSON 接口却返回了 HTML → 被 WAF 替换成拦截页
+            if text.startswith("<"):
+                return "HTML instead of JSON"
+            return None
+        if isinstance(data, dict):
+            if _waf_message(data):
+                return "WAF-shaped JSON"
+            if any(m in lowered_url for m in DETAIL_URL_MARKERS) and not _has_payload(data):
+                return "empty detail payload"
+        return None
+
+    if resource_type == "document":
+        if len(text) < CHALLENGE_PAGE_MAX:
+            checked = text.lower()
+        else:
+            title = RE_TITLE.search(text[:20000])
+            checked = title.group(1).lower() if title else ""
+        if any(m in checked for m in WAF_BODY_MARKERS):
+            return "WAF challenge page"
+    return None
+
+
+def _has_payload(data):
+    """True if any common data key carries a non-empty value."""
+    for key in ("data", "result", "rows", "list", "records"):
+        if key in data:
+            val = data[key]
+            if isinstance(val, dict):
+                return any(v not in (None, "", [], {}) for v in val.values())
+            return val not in (None, "", [], {})
+    # 没有常见数据键时不判定为空（未知接口结构）
+    return True
+
+
+class BlockSignal:
+    """Latest network-level block signal, shared between handle_response and the detail loop."""
+
+    def __init__(self):
+        self.last_time = 0.0
+        self.last_reason = None
+        self.last_url = None
+        self.count = 0
+
+    def trip(self, reason, url):
+        self.last_time = time.time()
+        self.last_reason = reason
+        self.last_url = url
+        self.count += 1
+
+    def since(self, ts):
+        """Reason of a signal raised at/after `ts`, else None."""
+        if self.last_reason and self.last_time >= ts:
+            return self.last_reason
+        return None
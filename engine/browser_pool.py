@@ -0,0 +1,175 @@
+"""
+Browser Pool - 自启动的无头 Chromium 池（managed 模式）
+
+替代 "手动开 Chrome + 9222 端口" 的 CDP 附着模式，用于无桌面的 Linux 服务器长时间无人值守运行：
+- 每个实例使用独立的持久化 user-data-dir（cookie / 缓存跨重启保留）
+- 打开页面数超过 recycle_pages 或 JS 堆超过 recycle_memory_mb 时回收重启
+- 实例崩溃 / 被关闭时自动重启
+"""
+import os
+import time
+
+
+class ManagedBrowser:
+    """One persistent-context Chromium instance."""
+
+    def __init__(self, playwright, index, profile_dir, headless=True, proxy=None, extra_args=None):
+        self.playwright = playwright
+        self.index = index
+        self.profile_dir = profile_dir
+        self.headless = headless
+        self.proxy = proxy
+        self.extra_args = extra_args or []
+        self.context = None
+        self.pages_served = 0
+        self.started_at = 0.0
+        self.launches = 0
+        self.crashed = False
+
+    def launch(self):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        kwargs = dict(
+            headless=self.headless,
+            args=["--no-first-run", "--no-default-browser-check", "--disable-extensions",
+                  "--disable-popup-blocking", "--disable-dev-shm-usage"] + self.extra_args,
+            viewport={"width": 1366, "height": 900},
+            locale="zh-CN",
+        )
+        if self.proxy:
+            kwargs["proxy"] = {"server": self.proxy}
+        self.context = self.playwright.chromium.launch_persistent_context(self.profile_dir, **kwargs)
+        self.context.on("close", self._on_close)
+        self.context.on("page", self._on_page)
+        self.pages_served = 0
+        self.started_at = time.time()
+        self.launches += 1
+        self.crashed = False
+        print(f"[BrowserPool] Instance #{self.index} launched ({'headless' if self.headless else 'headed'}, profile: {self.profile_dir})")
+        return self.context
+
+    def _on_close(self, *_):
+        self.crashed = True
+
+    def _on_page(self, *_):
+        self.pages_served += 1
+
+    def is_alive(self):
+        if self.context is None or self.crashed:
+            return False
+        try:
+            _ = self.context.pages
+            return True
+        except Exception:
+            return False
+
+    def memory_mb(self):
+        """Sum of used JS heap over open pages (Chromium-only performance.memory)."""
+        total = 0
+        try:
+            for p in self.context.pages:
+                try:
+                    total += p.evaluate("() => (performance.memory && performance.memory.usedJSHeapSize) || 0")
+                except Exception:
+                    pass
+        except Exception:
+            return 0.0
+        return total / (1024 * 1024)
+
+    def close(self):
+        if self.context:
+            try: self.context.close()
+            except: pass
+        self.context = None
+
+
+class BrowserPool:
+    def __init__(self, playwright, size=1, profile_root="resources/browser_profiles", headless=True,
+                 recycle_pages=500, recycle_memory_mb=1500, proxies=None):
+        self.playwright = playwright
+        self.size = max(1, size)
+        self.profile_root = profile_root
+        self.headless = headless
+        self.recycle_pages = recycle_pages
+        self.recycle_memory_mb = recycle_memory_mb
+        proxies = proxies or []
+        self.instances = [
+            ManagedBrowser(playwright, i, os.path.abspath(os.path.join(profile_root, f"profile_{i}")),
+                           headless=headless, proxy=proxies[i % len(proxies)] if proxies else None)
+            for i in range(self.size)
+        ]
+        self.current = None
+        self.restarts = 0
+        self.recycles = 0
+
+    def start(self):
+        for inst in self.instances:
+            inst.launch()
+        self.current = self.instances[0]
+        return self.current.context
+
+    def acquire(self):
+        """Current healthy instance (restarting it first if it crashed)."""
+        if self.current is None:
+            return self.start()
+        if not self.current.is_alive():
+            print(f"[BrowserPool] Instance #{self.current.index} crashed. Restarting...")
+            self.current.close()
+            self.current.launch()
+            self.restarts += 1
+        return self.current.context
+
+    def note_pages(self, n=1):
+        """Count list-page navigations (new tabs are counted automatically)."""
+        if self.current:
+            self.current.pages_served += n
+
+    def needs_recycle(self):
+        inst = self.current
+        if inst is None:
+            return False
+        if self.recycle_pages and inst.pages_served >= self.recycle_pages:
+            return True
+        if self.recycle_memory_mb and inst.memory_mb() >= self.recycle_memory_mb:
+            return True
+        return False
+
+    def recycle(self):
+        """
+        Rotate to the next (already warm) instance and relaunch the old one.
+        Returns the new context; callers must re-attach handlers and restore their search.
+        """
+        old = self.current
+        print(f"[BrowserPool] Recycling instance #{old.index} (pages: {old.pages_served}, heap: {old.memory_mb():.0f} MB)")
+        old.close()
+        self.recycles += 1
+        if self.size > 1:
+            self.current = self.instances[(old.index + 1) % self.size]
+            if not self.current.is_alive():
+                self.current.launch()
+            old.launch()  # 关掉后立即重启，作为下一次轮换的热备
+        else:
+            old.launch()
+        return self.current.context
+
+    def supervise(self):
+        """Restart any crashed spare instances (call between pages)."""
+        for inst in self.instances:
+            if inst is not self.current and inst.context is not None and not inst.is_alive():
+                print(f"[BrowserPool] Spare instance #{inst.index} died. Restarting...")
+                inst.close()
+                inst.launch()
+                self.restarts += 1
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "current": self.current.index if self.current else None,
+            "pages_served": self.current.pages_served if self.current else 0,
+            "restarts": self.restarts,
+            "recycles": self.recycles,
+        }
+
+    def close(self):
+        for inst in self.instances:
+            inst.close()
+        print(f"[BrowserPool] Closed. {self.stats()}")
@@ -0,0 +1,108 @@
+"""
+Categories - 数据类别（经营备案 / 经营许可 / 生产许可）作为采集计划的一维
+
+原先类别 "医疗器械经营企业（备案）" 写死在 _ensure_category 里，表、checkpoint、去重集合、租约都默认只有这一类。
+config.CATEGORIES 列出要采的类别，每个类别一个分区：
+- 独立的表（Storage(table_name=...)）、checkpoint 文件、前缀表、近似重复索引、租约键
+- 独立的去重索引（Partition；scraper.use_category() 在关键词之间切换）
+- 第一个类别是主类别：沿用原有的表名 / checkpoint / 前缀表 / 租约键（裸关键词），已有进度与 fleet worker 照常兼容
+main.py 按类别轮流取关键词，所有类别共用同一个浏览器会话和同一个限速预算；CategoryStats 按类别统计吞吐。
+
+用法:
+    python -m engine.categories          # 列出已配置类别及各自的表 / checkpoint / 前缀表 / 租约键
+"""
+import os
+
+import config
+
+DEFAULT_CATEGORY = {"id": "filing", "label": "医疗器械经营企业（备案）"}
+DEFAULT_CHECKPOINT = "resources/scraper_checkpoint.json"
+DEFAULT_DISCOVERY_TABLE = "resources/prefix_table.db"
+DEFAULT_ENTITY_INDEX = "resources/entity_index.db"
+
+
+def _suffixed(path, category_id):
+    root, ext = os.path.splitext(path)
+    return f"{root}.{category_id}{ext}"
+
+
+def load_categories(checkpoint_file=DEFAULT_CHECKPOINT):
+    """config.CATEGORIES with defaults filled in (table / checkpoint / discovery table / entity index / primary flag)."""
+    raw = getattr(config, 'CATEGORIES', None) or [DEFAULT_CATEGORY]
+    discovery_table = getattr(config, 'DISCOVERY_TABLE', DEFAULT_DISCOVERY_TABLE)
+    entity_index = getattr(config, 'ENTITY_INDEX', DEFAULT_ENTITY_INDEX)
+    categories = []
+    for i, item in enumerate(raw):
+        cat = dict(item)
+        if not cat.get("id") or not cat.get("label"):
+            raise ValueError(f"CATEGORIES[{i}] needs an 'id' and a 'label': {item}")
+        primary = (i == 0)
+        cat["primary"] = primary
+        cat.setdefault("table", config.TABLE_NAME if primary else f"{config.TABLE_NAME}_{cat['id']}")
+        cat.setdefault("checkpoint", checkpoint_file if primary else _suffixed(checkpoint_file, cat["id"]))
+        cat.setdefault("discovery_table", discovery_table if primary else _suffixed(discovery_table, cat["id"]))
+        cat.setdefault("entity_index", entity_index if primary else _suffixed(entity_index, cat["id"]))
+        categories.append(cat)
+    ids = [c["id"] for c in categories]
+    if len(set(ids)) != len(ids) or len({c["table"] for c in categories}) != len(categories):
+        raise ValueError(f"CATEGORIES ids and tables must be unique: {ids}")
+    return categories
+
+
+def primary_category():
+    return load_categories()[0]
+
+
+def lease_key(category, keyword):
+    """Work-queue lease name: bare keyword for the primary category (fleet compatible), 'id:keyword' otherwise."""
+    return keyword if category.get("primary") else f"{category['id']}:{keyword}"
+
+
+class Partition:
+    """Per-category crawl state held by the scraper: dedupe index + prefix table + entity index + coverage prefix counts."""
+
+    def __init__(self, category, existing_records=None, discovery=None, resolver=None):
+        self.category = category
+        self.id = category["id"]
+        self.label = category["label"]
+        self.primary = category.get("primary", False)
+        # Set of (licenseNum, entName) already in this category's table
+        self.existing_records = existing_records if existing_records else set()
+        self.existing_licenses = {rec[0] for rec in self.existing_records if rec[0]}
+        self.existing_names = {rec[1] for rec in self.existing_records if rec[1]}
+        self.discovery = discovery
+        self.resolver = resolver   # engine/entity_resolution.py 的 EntityIndex（未启用时为 None）
+        self.prefix_counts = None  # CoverageEstimator 的按前缀计数缓存（切换类别时暂存）
+
+
+class CategoryStats:
+    """Per-category throughput over one session (keywords, pages, records saved, records/hour)."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def record(self, category_id, pages, saved, seconds):
+        row = self.rows.setdefault(category_id, {"keywords": 0, "pages": 0, "saved": 0, "seconds": 0.0})
+        row["keywords"] += 1
+        row["pages"] += pages
+        row["saved"] += saved
+        row["seconds"] += seconds
+
+    def summary(self):
+        parts = []
+        for cid, row in self.rows.items():
+            hours = max(row["seconds"] / 3600, 1e-6)
+            parts.append(f"{cid}: {row['keywords']} kw, {row['pages']} pages, {row['saved']} saved "
+                         f"({row['saved'] / hours:.0f}/h, {row['pages'] / hours:.0f} pages/h)")
+        return "; ".join(parts) or "no keywords finished"
+
+
+def main():
+    for cat in load_categories(os.environ.get("SCRAPER_CHECKPOINT", DEFAULT_CHECKPOINT)):
+        role = "primary" if cat["primary"] else "partition"
+        print(f"[Categories] {cat['id']} ({role}): '{cat['label']}' → table {cat['table']}, "
+              f"checkpoint {cat['checkpoint']}, prefixes {cat['discovery_table']}, lease e.g. '{lease_key(cat, '上海')}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Coverage Estimator - 按关键词估计剩余未采企业数，提前结束翻页
+
+search() 原先一直翻到 max_pages / 1000 页上限 / max_pages*5 次尝试；对已覆盖的城市重爬时，
+每一页都是全量去重命中，却仍要付出一次翻页加载 + 2 秒等待。这里对每个关键词维护一个新记录率的 Beta 后验：
+- 先验：库内已知数 / 站点总数（已知数来自去重快照：按发证机关前缀计数的编号侧 + 企业名包含匹配的名称侧）
+- 观测：逐行的去重命中 / 新记录
+- 判定：后续 horizon 页（不超过站点剩余可翻行数）内 "一条新记录都没有" 的概率（Beta-Binomial）
+  >= COVERAGE_CONFIDENCE 时停止翻页
+库内已知数低于站点总数时先验偏向 "还有新记录"，需要更多全重复页才会停；修复阶段（skip_dedupe）不启用。
+"""
+import math
+from collections import Counter
+
+from engine.normalize import extract_prefix
+
+SITE_PAGE_LIMIT = 1000
+PRIOR_NEW_FLOOR = 0.1  # 即使库内已全覆盖，也保留一点 "仍有新记录" 的先验
+
+
+def count_prefixes(licenses):
+    """{issuer prefix: number of DB license numbers with that prefix}."""
+    counts = Counter()
+    for lic in licenses:
+        prefix = extract_prefix(lic)
+        if prefix:
+            counts[prefix] += 1
+    return counts
+
+
+def _log_p_zero(a, b, n):
+    """log P(no success in n Beta(a, b)-Binomial draws) = log B(a, b + n) - log B(a, b)."""
+    return math.lgamma(b + n) + math.lgamma(a + b) - math.lgamma(b) - math.lgamma(a + b + n)
+
+
+class KeywordCoverage:
+    """Running state of one keyword search."""
+
+    def __init__(self, keyword, site_total, known, prior_strength, page_size):
+        self.keyword = keyword
+        self.site_total = site_total
+        self.known = known
+        self.page_size = page_size
+        self.coverage_prior = min(known / site_total, 1.0) if site_total else 0.0
+        self.prior_new = prior_strength * (1.0 - self.coverage_prior) + PRIOR_NEW_FLOOR
+        self.prior_dup = prior_strength * self.coverage_prior
+        self.rows = 0
+        self.new_rows = 0
+        self.dup_rows = 0
+        self.pages = 0
+        self.stopped = None  # 提前结束原因
+
+    def observe(self, duplicate):
+        self.rows += 1
+        if duplicate:
+            self.dup_rows += 1
+        else:
+            self.new_rows += 1
+
+    @property
+    def reachable(self):
+        return min(self.site_total, SITE_PAGE_LIMIT * self.page_size) if self.site_total else 0
+
+    @property
+    def remaining(self):
+        return max(self.reachable - self.rows, 0)
+
+    def new_rate(self):
+        a, b = self.prior_new + self.new_rows, self.prior_dup + self.dup_rows
+        return a / (a + b)
+
+    def expected_unseen(self):
+        """Expected new enterprises still behind the pages we have not loaded."""
+        return self.remaining * self.new_rate()
+
+    def p_no_new(self, horizon_rows):
+        n = min(horizon_rows, self.remaining)
+        if n <= 0:
+            return 1.0
+        a, b = self.prior_new + self.new_rows, self.prior_dup + self.dup_rows
+        return math.exp(_log_p_zero(a, b, n))
+
+    def describe(self):
+        return (f"{self.rows} rows seen ({self.new_rows} new / {self.dup_rows} in DB), "
+                f"site {self.site_total}, DB knows ~{self.known}, ~{self.expected_unseen():.1f} new expected in {self.remaining} unseen rows")
+
+
+class CoverageEstimator:
+    def __init__(self, existing_licenses, existing_names, confidence=0.95, horizon_pages=20,
+                 min_pages=3, prior_strength=20, page_size=10):
+        # 直接引用 scraper 的去重集合（会话内新增的记录同样可见）
+        self.existing_licenses = existing_licenses
+        self.existing_names = existing_names
+        self.confidence = confidence
+        self.horizon_pages = horizon_pages
+        self.min_pages = min_pages
+        self.prior_strength = prior_strength
+        self.page_size = page_size
+        self._prefix_counts = None
+        self.current = None
+        self.stats = {"keywords": 0, "stopped_early": 0, "pages_skipped": 0}
+
+    @property
+    def prefix_counts(self):
+        if self._prefix_counts is None:
+            self._prefix_counts = count_prefixes(self.existing_licenses)
+        return self._prefix_counts
+
+    def known_count(self, keyword):
+        """DB rows the site's contains-match would return for keyword (max of license side and name side)."""
+        by_prefix = sum(c for p, c in self.prefix_counts.items() if keyword in p)
+        by_name = sum(1 for n in self.existing_names if keyword in n)
+        return max(by_prefix, by_name)
+
+    def rebind(self, existing_licenses, existing_names, prefix_counts=None):
+        """Point the estimator at another category's dedupe sets. Returns the old prefix-count cache."""
+        old = self._prefix_counts
+        self.existing_licenses = existing_licenses
+        self.existing_names = existing_names
+        self._prefix_counts = prefix_counts
+        return old
+
+    def begin(self, keyword, site_total, page_size=None):
+        self.current = KeywordCoverage(keyword, site_total or 0, self.known_count(keyword),
+                                       self.prior_strength, page_size or self.page_size)
+        self.stats["keywords"] += 1
+        return self.current
+
+    def end(self):
+        self.current = None
+
+    def observe(self, duplicate):
+        """Count one list row (duplicate=None means dedupe was skipped → estimator inactive)."""
+        if self.current is not None and duplicate is not None:
+            self.current.observe(duplicate)
+
+    def should_stop(self):
+        """Call after each page. Returns (stop?, reason)."""
+        cov = self.current
+        if cov is None:
+            return False, None
+        cov.pages += 1
+        if cov.pages < self.min_pages or not cov.site_total or not cov.remaining:
+            return False, None
+        p = cov.p_no_new(self.horizon_pages * cov.page_size)
+        if p < self.confidence:
+            return False, None
+        cov.stopped = f"P(no new in next {self.horizon_pages} pages) = {p:.3f}; {cov.describe()}"
+        self.stats["stopped_early"] += 1
+        self.stats["pages_skipped"] += (cov.remaining + cov.page_size - 1) // cov.page_size
+        return True, cov.stopped
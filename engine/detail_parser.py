@@ -0,0 +1,71 @@
+"""
+Detail Parser - 纯函数的 标签/值 解析（不依赖浏览器）
+
+浏览器 / API / 归档回放三条路径共用同一套解析与清洗规则：
+- parse_detail_pairs(): 详情表格的 [(标签, 值), ...] → 记录 dict
+- clean_detail_value(): 字段级清洗（无效法人/负责人、无效地址）
+清洗规则本体在 engine/normalize.py；修改后用 python -m engine.replay 对本地归档重跑即可，无需重新爬取。
+"""
+from engine.normalize import compact, normalize_label, clean_value, is_valid_payload
+
+DETAIL_KEY_MAP = {
+    "编号": "licenseNum", "企业名称": "entName", "法定代表人": "legalRep",
+    "企业负责人": "resPerson", "住所": "entAddress", "经营场所": "opAddress",
+    "经营方式": "opMode", "经营范围": "scope",
+    "备案部门": "filingDept", "备案日期": "filingDate",
+    # 许可类别（经营许可 / 生产许可）的同义标签：落到同一套字段，分区表结构一致
+    "许可证编号": "licenseNum", "生产地址": "opAddress", "生产范围": "scope",
+    "发证部门": "filingDept", "发证日期": "filingDate",
+}
+
+# 浏览器端一次性取出所有 <tr> 的单元格文本（替代逐行 locator 往返）
+DETAIL_PAIRS_JS = """() => Array.from(document.querySelectorAll('tr'))
+    .map(r => Array.from(r.querySelectorAll('td')).map(c => c.innerText))
+    .filter(cells => cells.length >= 2)
+    .map(cells => [cells[0], cells[1]])"""
+
+# 规则本体在 engine/normalize.py（预编译正则 + 冻结查表）；这里保留解析层使用的名字
+clean_detail_value = clean_value
+compact_text = compact
+
+
+def parse_detail_pairs(pairs, clean=True):
+    """
+    [(raw label, raw value), ...] → record dict (later labels win, like the row-by-row DOM loop).
+    clean=False leaves values raw so a whole batch can be cleaned column-wise (normalize.clean_records).
+    """
+    item = {}
+    for raw_label, raw_val in pairs:
+        compact_label = normalize_label(raw_label or "")
+        if compact_label in DETAIL_KEY_MAP:
+            field_key = DETAIL_KEY_MAP[compact_label]
+            val = (raw_val or "").strip()
+            item[field_key] = clean_value(field_key, val) if clean else val
+    return item
+
+
+def is_complete(item):
+    """Validation: Require at least Name, License AND identity data"""
+    return bool(item.get("entName") and item.get("licenseNum") and (item.get("legalRep") or item.get("resPerson")))
+
+
+def has_detail_payload(item):
+    """要求至少存在法人、负责人或经营方式中任意一项，且非极短无效字符"""
+    return is_valid_payload(item.get('legalRep')) or is_valid_payload(item.get('resPerson')) or is_valid_payload(item.get('opMode'))
+
+
+def merge_list_info(detail_item, base_info):
+    """
+    Use DETAIL page data as authoritative (has full names, not truncated);
+    fill in any missing fields from the list page.
+    """
+    final_item = detail_item.copy()
+    for key, value in base_info.items():
+        if key not in final_item or not final_item.get(key):
+            final_item[key] = value
+    # IMPORTANT: Always use detail page entName if available (it's complete)
+    # List page names may be truncated with "..."
+    if detail_item.get('entName'):
+        final_item['entName'] = detail_item['entName']
+    return final_item
+
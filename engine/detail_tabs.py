@@ -0,0 +1,259 @@
+"""
+Detail Tab Pool - 常驻详情标签页（替代每行 点击 → 新标签 → 关闭）
+
+每开一个新标签页都要拉起一次渲染进程；复用模式下：
+- 详情 URL 从行内链接 href，或 URL 模板 + 拦截到的列表 JSON 记录解析出来
+- URL 模板可以在配置里指定，也可以在第一次走点击流程时从新标签页的 URL 自动学习
+- 在少量常驻标签页里 goto 该 URL；用完 goto about:blank 复位（不会残留上一条的 DOM）
+- 使用次数 / JS 堆超过阈值的标签页关闭重建
+DetailMetrics 在两种模式下都记录 "每 1000 条记录新建的标签页数" 与每行耗时，便于前后对比。
+"""
+from urllib.parse import quote, urljoin, urlparse
+
+BLANK_URL = "about:blank"
+MIN_FIELD_LEN = 4  # 太短的字段值（如 "1"）在 URL 里出现纯属巧合，不参与模板学习
+
+
+def _squash(value):
+    return "".join(str(value).split())
+
+
+def find_record(payloads, needle, max_depth=6):
+    """Most recent dict in intercepted JSON payloads that has a scalar value equal to `needle` (whitespace-insensitive)."""
+    needle = _squash(needle) if needle else ""
+    if not needle:
+        return None
+
+    def walk(node, depth):
+        if depth > max_depth:
+            return None
+        if isinstance(node, dict):
+            for v in node.values():
+                if isinstance(v, (str, int)) and _squash(v) == needle:
+                    return node
+            children = node.values()
+        elif isinstance(node, list):
+            children = node
+        else:
+            return None
+        for child in children:
+            if isinstance(child, (dict, list)):
+                hit = walk(child, depth + 1)
+                if hit is not None:
+                    return hit
+        return None
+
+    for payload in reversed(list(payloads)):
+        hit = walk(payload, 0)
+        if hit is not None:
+            return hit
+    return None
+
+
+def learn_template(url, fields):
+    """
+    Turn a concrete detail URL into a template by replacing the longest field value
+    found in it with "{field}". Returns None if no field value appears in the URL.
+    """
+    best = None
+    for key, value in fields.items():
+        if not isinstance(value, (str, int)) or not str(key).isidentifier():
+            continue
+        text = str(value).strip()
+        if len(text) < MIN_FIELD_LEN:
+            continue
+        for form in (quote(text, safe=""), quote(text), text):
+            if form in url and (best is None or len(form) > len(best[1])):
+                best = (key, form)
+                break
+    if best is None:
+        return None
+    key, form = best
+    return url.replace("{", "{{").replace("}", "}}").replace(form, "{" + key + "}")
+
+
+def fill_template(template, fields):
+    """Format a learned / configured template; None if a placeholder has no value."""
+    try:
+        return template.format_map({k: quote(str(v).strip(), safe="") for k, v in fields.items() if v is not None})
+    except (KeyError, IndexError, ValueError):
+        return None
+
+
+class DetailMetrics:
+    """Tabs created + per-row latency for the detail stage (both click and reuse mode)."""
+
+    def __init__(self):
+        self.tabs_created = 0
+        self.records = 0
+        self.failures = 0
+        self.latencies = []
+        self.resolved = {"href": 0, "template": 0, "click": 0}
+
+    def note_tab(self, n=1):
+        self.tabs_created += n
+
+    def note_row(self, seconds, success=True):
+        if success:
+            self.records += 1
+        else:
+            self.failures += 1
+        self.latencies.append(seconds)
+        if len(self.latencies) > 5000:
+            del self.latencies[:1000]
+
+    def summary(self):
+        lat = sorted(self.latencies)
+        pick = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 2) if lat else 0.0
+        return {
+            "records": self.records,
+            "failures": self.failures,
+            "tabs_created": self.tabs_created,
+            "tabs_per_1000": round(self.tabs_created * 1000 / self.records, 1) if self.records else 0.0,
+            "latency_mean": round(sum(lat) / len(lat), 2) if lat else 0.0,
+            "latency_p50": pick(0.5),
+            "latency_p95": pick(0.95),
+            "resolved": dict(self.resolved),
+        }
+
+
+class DetailTabPool:
+    def __init__(self, context=None, size=1, recycle_uses=300, recycle_memory_mb=256,
+                 url_template=None, metrics=None):
+        self.size = max(1, size)
+        self.recycle_uses = recycle_uses
+        self.recycle_memory_mb = recycle_memory_mb
+        self.url_template = url_template
+        self.template_learned = False
+        self.metrics = metrics or DetailMetrics()
+        self.context = None
+        self.tabs = []      # [{"page", "uses", "busy"}]
+        self.recycled = 0
+        if context is not None:
+            self.bind(context)
+
+    def bind(self, context):
+        """Attach to a (new) browser context; tabs of the old context are dropped."""
+        if context is self.context:
+            return
+        self.context = context
+        self.tabs = []
+
+    # ------------------------------------------------------------------
+    # URL resolution
+    # ------------------------------------------------------------------
+    def resolve_url(self, btn, list_url, fields):
+        """Detail URL for a row: real link first, then template + list JSON fields. None = use click flow."""
+        try:
+            href = btn.get_attribute("href")
+        except Exception:
+            href = None
+        if href and not href.startswith(("javascript", "#")):
+            self.metrics.resolved["href"] += 1
+            return urljoin(list_url, href)
+        if self.url_template:
+            url = fill_template(self.url_template, fields)
+            if url:
+                self.metrics.resolved["template"] += 1
+                return urljoin(list_url, url)
+        return None
+
+    def learn(self, detail_url, fields):
+        """Learn the URL template from a tab opened by the click flow."""
+        if self.url_template or not detail_url or urlparse(detail_url).scheme not in ("http", "https"):
+            return False
+        template = learn_template(detail_url, fields)
+        if template:
+            self.url_template = template
+            self.template_learned = True
+            print(f"[DetailTabs] Learned detail URL template: {template}")
+            return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Tabs
+    # ------------------------------------------------------------------
+    def _new_tab(self):
+        page = self.context.new_page()
+        self.metrics.note_tab()
+        slot = {"page": page, "uses": 0, "busy": False}
+        self.tabs.append(slot)
+        return slot
+
+    def _slot_of(self, page):
+        for slot in self.tabs:
+            if slot["page"] is page:
+                return slot
+        return None
+
+    def owns(self, page):
+        return self._slot_of(page) is not None
+
+    def open(self, url, timeout=15000):
+        """Load `url` in an idle pooled tab (creating one if allowed). Returns the page."""
+        self.tabs = [s for s in self.tabs if not s["page"].is_closed()]
+        idle = [s for s in self.tabs if not s["busy"]]
+        if idle:
+            slot = min(idle, key=lambda s: s["uses"])
+        elif len(self.tabs) < self.size:
+            slot = self._new_tab()
+        else:
+            slot = min(self.tabs, key=lambda s: s["uses"])  # 全部占用：抢占最少使用的
+        slot["busy"] = True
+        slot["uses"] += 1
+        page = slot["page"]
+        page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+        return page
+
+    def release(self, page):
+        """Reset the tab to about:blank for the next row; recycle it if it is worn out."""
+        slot = self._slot_of(page)
+        if slot is None:
+            return
+        slot["busy"] = False
+        if self._worn_out(slot):
+            self._recycle(slot)
+            return
+        try:
+            if page.url != BLANK_URL:
+                page.goto(BLANK_URL)
+        except Exception:
+            self._recycle(slot)
+
+    def discard(self, page):
+        """Drop a tab that is in a bad state (e.g. blank / blocked); the next open() starts fresh."""
+        slot = self._slot_of(page)
+        if slot is not None:
+            self._recycle(slot)
+
+    def _worn_out(self, slot):
+        if self.recycle_uses and slot["uses"] >= self.recycle_uses:
+            return True
+        if self.recycle_memory_mb:
+            try:
+                heap = slot["page"].evaluate("() => (performance.memory && performance.memory.usedJSHeapSize) || 0")
+                return heap / (1024 * 1024) >= self.recycle_memory_mb
+            except Exception:
+                return True
+        return False
+
+    def _recycle(self, slot):
+        try: slot["page"].close()
+        except: pass
+        if slot in self.tabs:
+            self.tabs.remove(slot)
+        self.recycled += 1
+
+    def close(self):
+        for slot in list(self.tabs):
+            try: slot["page"].close()
+            except: pass
+        self.tabs = []
+
+    def stats(self):
+        return {
+            "open_tabs": len(self.tabs),
+            "recycled": self.recycled,
+            "template": self.url_template,
+            **self.metrics.summary(),
+        }
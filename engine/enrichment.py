@@ -0,0 +1,226 @@
+"""
+Enrichment Queue - 两阶段采集：列表快扫 + 按优先级补详情
+
+CRAWL_PHASE = "list" 时 scraper 只翻列表页：非重复行的编号 / 名称 / 发证机关前缀写入待补表，不开详情页，
+一页只需一次翻页加载，整个名录的覆盖情况几小时内可知。
+CRAWL_PHASE = "enrich" 时 main.py 跳过关键词队列，按优先级逐条补详情（按编号搜索 → 详情 → 入库），
+有自己的节奏（ENRICH_DELAY_RANGE），随时中断、重启后从剩余的待补记录继续。
+
+优先级（越大越先补）:
+- 新地区：前缀在库内一条记录都没有 +2
+- CRM 相关：名称 / 编号 / 来源关键词命中 ENRICH_PRIORITY_KEYWORDS +1
+失败的记录（attempts+1）排到所有尚未尝试过的记录之后再重试，最多 ENRICH_MAX_ATTEMPTS 次。
+
+用法:
+    python -m engine.enrichment              # 查看待补表统计
+"""
+import argparse
+import os
+import random
+import sqlite3
+import time
+
+import config
+from engine.normalize import compact
+
+DEFAULT_QUEUE = "resources/enrichment.db"
+NEW_REGION_BONUS = 2
+CRM_BONUS = 1
+
+
+class EnrichmentQueue:
+    def __init__(self, path=DEFAULT_QUEUE, prefix_counts=None, priority_keywords=(), max_attempts=3):
+        self.path = path
+        self.prefix_counts = prefix_counts if prefix_counts is not None else {}
+        self.priority_keywords = tuple(priority_keywords or ())
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_enrichment (
+                license_key TEXT PRIMARY KEY,       -- 规范化编号（无编号时为 name:企业名）
+                license_num TEXT,
+                ent_name    TEXT,
+                prefix      TEXT,
+                keyword     TEXT,                   -- 在哪个关键词下扫到
+                priority    INTEGER NOT NULL DEFAULT 0,
+                status      TEXT NOT NULL DEFAULT 'pending',  -- pending / done / failed
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                note        TEXT,
+                added_at    REAL NOT NULL,
+                updated_at  REAL NOT NULL
+            )
+        """)
+        # 领取顺序 attempts → priority → added_at：失败过的行排到同优先级的新记录之后，不会被立即重领
+        self.conn.execute("DROP INDEX IF EXISTS idx_enrich_claim")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_enrich_attempts "
+                          "ON pending_enrichment (status, attempts, priority DESC, added_at)")
+        self.conn.commit()
+        self._buffer = []
+
+    @staticmethod
+    def key_of(license_num, ent_name):
+        lic = compact(license_num)
+        return lic if lic else f"name:{compact(ent_name)}"
+
+    def priority_of(self, base_info, prefix, keyword):
+        priority = 0
+        if prefix and not self.prefix_counts.get(prefix):
+            priority += NEW_REGION_BONUS
+        text = f"{base_info.get('entName', '')}|{base_info.get('licenseNum', '')}|{keyword or ''}"
+        if any(k in text for k in self.priority_keywords):
+            priority += CRM_BONUS
+        return priority
+
+    # ------------------------------------------------------------------
+    # List phase
+    # ------------------------------------------------------------------
+    def add(self, base_info, keyword=None, prefix=None):
+        """Buffer one list row (written on flush(), once per page)."""
+        if not base_info.get('licenseNum') and not base_info.get('entName'):
+            return
+        now = time.time()
+        self._buffer.append((self.key_of(base_info.get('licenseNum'), base_info.get('entName')),
+                             base_info.get('licenseNum'), base_info.get('entName'), prefix, keyword,
+                             self.priority_of(base_info, prefix, keyword), now, now))
+
+    def flush(self):
+        if not self._buffer:
+            return 0
+        try:
+            cur = self.conn.executemany(
+                "INSERT OR IGNORE INTO pending_enrichment "
+                "(license_key, license_num, ent_name, prefix, keyword, priority, added_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._buffer)
+            self.conn.commit()
+            self._buffer = []
+            return cur.rowcount
+        except Exception as e:
+            print(f"[Enrichment] Could not write pending rows: {e}")
+            return 0
+
+    # ------------------------------------------------------------------
+    # Enrichment phase
+    # ------------------------------------------------------------------
+    def claim(self):
+        row = self.conn.execute(
+            "SELECT license_key, license_num, ent_name, prefix, keyword, priority, attempts FROM pending_enrichment "
+            "WHERE status='pending' ORDER BY attempts, priority DESC, added_at LIMIT 1").fetchone()
+        if not row:
+            return None
+        keys = ("license_key", "license_num", "ent_name", "prefix", "keyword", "priority", "attempts")
+        return dict(zip(keys, row))
+
+    def mark_done(self, keys, note=None):
+        now = time.time()
+        self.conn.executemany(
+            "UPDATE pending_enrichment SET status='done', note=?, updated_at=? WHERE license_key=?",
+            [(note, now, k) for k in keys])
+        self.conn.commit()
+
+    def mark_failed(self, key, note=None):
+        """Count a failed attempt; give up after max_attempts (the row stays for inspection)."""
+        self.conn.execute(
+            "UPDATE pending_enrichment SET attempts=attempts+1, note=?, updated_at=?, "
+            "status=CASE WHEN attempts+1 >= ? THEN 'failed' ELSE 'pending' END WHERE license_key=?",
+            (note, time.time(), self.max_attempts, key))
+        self.conn.commit()
+
+    def stats(self):
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) FROM pending_enrichment GROUP BY status").fetchall()
+        out = dict(rows)
+        out["by_priority"] = dict(self.conn.execute(
+            "SELECT priority, COUNT(*) FROM pending_enrichment WHERE status='pending' GROUP BY priority").fetchall())
+        return out
+
+    def close(self):
+        self.flush()
+        try: self.conn.close()
+        except: pass
+
+
+def open_queue(prefix_counts=None):
+    return EnrichmentQueue(
+        getattr(config, 'ENRICH_QUEUE', DEFAULT_QUEUE),
+        prefix_counts=prefix_counts,
+        priority_keywords=getattr(config, 'ENRICH_PRIORITY_KEYWORDS', ()),
+        max_attempts=getattr(config, 'ENRICH_MAX_ATTEMPTS', 3),
+    )
+
+
+def _name_prefix(ent_name):
+    """List-page names may be truncated with "..." (same rule as NMPAScraper._is_duplicate): (search text, truncated?)."""
+    name = (ent_name or "").strip()
+    if name.endswith('...'):
+        return name[:-3].strip(), True
+    return name, False
+
+
+def _item_captured(item, captured, keys):
+    """Whether the claimed row is among the captured detail rows (truncated names match by prefix)."""
+    if item["license_key"] in keys:
+        return True
+    if item["license_num"]:
+        return False
+    name, truncated = _name_prefix(item["ent_name"])
+    if not truncated or not name:
+        return False
+    return any((r.get('entName') or '').strip().startswith(name) for r in captured)
+
+
+def run_enrichment(scraper, db, queue, limit=None):
+    """Fetch details for pending rows in priority order (search by license number → detail → save)."""
+    delay_range = getattr(config, 'ENRICH_DELAY_RANGE', (1.0, 3.0))
+    print(f"\n=== Enrichment Stage: {queue.stats()} ===")
+    done = saved_total = 0
+    started = time.time()
+    while limit is None or done < limit:
+        item = queue.claim()
+        if not item:
+            print("[Enrichment] Queue drained.")
+            break
+        lic = (item["license_num"] or "").strip()
+        if lic and lic in scraper.existing_licenses:
+            queue.mark_done([item["license_key"]], note="already in DB")
+            continue
+
+        print(f">>> [Enrichment p{item['priority']}] {item['ent_name']} ({lic or 'no license'})")
+        captured = []
+        term = lic or _name_prefix(item["ent_name"])[0]  # 截断名去掉 "..." 再搜
+        try:
+            for batch_data, _ in scraper.search(keyword=term, max_pages=1):
+                if batch_data:
+                    saved_total += db.save_batch(batch_data)
+                    captured.extend(batch_data)
+        except Exception as e:
+            print(f"[Enrichment] Error on '{term}': {e}")
+        # 包含匹配可能顺带补到其它待补记录：一并标记完成
+        keys = {EnrichmentQueue.key_of(r.get('licenseNum'), r.get('entName')) for r in captured}
+        if _item_captured(item, captured, keys):
+            queue.mark_done(keys | {item["license_key"]})
+        else:
+            if keys:
+                queue.mark_done(keys)
+            queue.mark_failed(item["license_key"], note="no detail captured")
+        done += 1
+        if done % 20 == 0:
+            hours = max((time.time() - started) / 3600, 1e-6)
+            print(f"[Enrichment] {done} processed, {saved_total} rows saved ({done / hours:.0f}/h). {queue.stats()}")
+        time.sleep(random.uniform(*delay_range))
+    print(f"=== Enrichment Stage done: {done} processed, {saved_total} rows saved. ===\n")
+    return saved_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pending-enrichment table statistics")
+    parser.add_argument("--queue", default=getattr(config, 'ENRICH_QUEUE', DEFAULT_QUEUE))
+    args = parser.parse_args()
+    queue = EnrichmentQueue(args.queue)
+    print(f"[Enrichment] {args.queue}: {queue.stats()}")
+    queue.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""
+Entity Resolution - 企业名称变体的近似重复识别（MinHash LSH 分桶 + 编号分块）
+
+去重原本只有精确的编号 / 名称比对（外加对 "..." 截断名的前缀扫描），库里仍会积累近似重复：
+全角 / 半角括号、"有限公司 / 有限责任公司 / 股份有限公司" 后缀变体、分公司 / 门店后缀、同一编号下改名的企业。
+这里维护一个持久化的分块索引（SQLite，每个类别一个文件）：
+- canonical_name(): NFKC（全角 → 半角）、统一括号、去空白标点、去公司形式后缀，分离分支机构后缀
+- 分块：规范名字二元组的 MinHash 签名按 bands × rows 分桶（LSH）+ 规范化编号分块（改名企业）
+- 核验 judge(): 同编号 / 同规范名 / 母公司-分支 / 二元组 Jaccard >= 阈值（模糊匹配要求发证机关前缀一致）
+- build(): 按 id 分段流式读全表 → 签名 → 按桶聚合 → 并查集成簇；每个桶内只比对桶内成员，超大桶跳过，近线性
+- lookup(): 采集时查询单条（每个 band 一次索引查询），scraper 在精确去重未命中时调用
+NumPy 可选：装了就向量化计算签名，结果与纯 Python 完全一致（同一个索引可以混用）。
+
+用法:
+    python -m engine.entity_resolution --build                 # 从数据库重建索引并聚类
+    python -m engine.entity_resolution --clusters 20           # 列出最大的若干簇
+    python -m engine.entity_resolution --query "上海某某医疗器械有限公司"
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import time
+import unicodedata
+import zlib
+
+import config
+from engine.normalize import extract_prefix
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_INDEX = "resources/entity_index.db"
+PRIME = (1 << 31) - 1   # 签名取模用的梅森素数：a*h+b < 2^63，NumPy uint64 不溢出
+SEED = 20240607
+MAX_BUCKET = 200        # 成员超过该数的桶（通用名称）不做两两比对
+KEY_MASK = (1 << 63) - 1
+
+_BRACKETS = str.maketrans({"〔": "(", "〕": ")", "［": "(", "］": ")", "【": "(", "】": ")", "[": "(", "]": ")",
+                           "﹝": "(", "﹞": ")", "〈": "(", "〉": ")", "《": "(", "》": ")"})
+RE_NOISE = re.compile(r'[\s()·•.,，。、;；:："\'“”‘’_/\\-]+')
+ORG_SUFFIXES = ("股份有限公司", "有限责任公司", "有限公司", "集团公司", "公司")
+RE_BRANCH = re.compile(r'^(.+?(?:公司|企业|中心|厂))(.+?(?:分公司|分店|门店|营业部|经营部|办事处|分部))$')
+
+
+# ---------------------------------------------------------------------------
+# Normalization
+# ---------------------------------------------------------------------------
+def canonical_name(name):
+    """(core, branch suffix) of an enterprise name, e.g. 上海甲乙医疗器械有限公司（浦东分公司） → (上海甲乙医疗器械, 浦东分公司)."""
+    text = RE_NOISE.sub("", unicodedata.normalize("NFKC", name or "").translate(_BRACKETS).upper())
+    branch = ""
+    match = RE_BRANCH.match(text)
+    if match:
+        text, branch = match.group(1), match.group(2)
+    for suffix in ORG_SUFFIXES:
+        if text.endswith(suffix) and len(text) > len(suffix) + 1:
+            text = text[:-len(suffix)]
+            break
+    return text, branch
+
+
+def license_key(lic):
+    """License number with width / bracket / whitespace variants folded (沪浦食药监械经营备２０１５０１２３号 → ...20150123号)."""
+    return RE_NOISE.sub("", unicodedata.normalize("NFKC", lic or "").translate(_BRACKETS).upper())
+
+
+def shingles(core, n=2):
+    if len(core) < n:
+        return {core} if core else set()
+    return {core[i:i + n] for i in range(len(core) - n + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def judge(a, b, threshold=0.85):
+    """(reason, score) if two prepared rows look like the same enterprise, else None."""
+    if a["license_key"] and a["license_key"] == b["license_key"]:
+        return "same_license", 1.0
+    if not a["core"] or not b["core"]:
+        return None
+    if a["core"] == b["core"]:
+        if a["branch"] == b["branch"]:
+            return "same_name", 1.0
+        if not a["branch"] or not b["branch"]:
+            return "branch", 0.9
+        return None  # 同一母公司的两个不同分支机构
+    # 模糊匹配只在同一发证机关前缀内成立（两边都有编号时）
+    if a["prefix"] and b["prefix"] and a["prefix"] != b["prefix"]:
+        return None
+    score = jaccard(shingles(a["core"]), shingles(b["core"]))
+    return ("similar", score) if score >= threshold else None
+
+
+# ---------------------------------------------------------------------------
+# MinHash LSH
+# ---------------------------------------------------------------------------
+class MinHasher:
+    def __init__(self, num_perm, seed=SEED):
+        rng = random.Random(seed)
+        self.a = [rng.randrange(1, PRIME) for _ in range(num_perm)]
+        self.b = [rng.randrange(0, PRIME) for _ in range(num_perm)]
+        if np is not None:
+            self._a = np.array(self.a, dtype=np.uint64)[:, None]
+            self._b = np.array(self.b, dtype=np.uint64)[:, None]
+
+    @staticmethod
+    def hashes(grams):
+        return [zlib.crc32(g.encode("utf-8")) % PRIME for g in grams]
+
+    def signature(self, hashes):
+        if not hashes:
+            return None
+        if np is not None and len(hashes) > 3:
+            h = np.array(hashes, dtype=np.uint64)[None, :]
+            return ((self._a * h + self._b) % PRIME).min(axis=1).tolist()
+        return [min((a * h + b) % PRIME for h in hashes) for a, b in zip(self.a, self.b)]
+
+
+def band_keys(signature, bands, rows):
+    """One bucket key per band (stable across processes, fits a signed SQLite INTEGER)."""
+    keys = []
+    for i in range(bands):
+        key = i + 1
+        for v in signature[i * rows:(i + 1) * rows]:
+            key = (key * 1000003 + v) & KEY_MASK
+        keys.append(key)
+    return keys
+
+
+class EntityIndex:
+    def __init__(self, path=DEFAULT_INDEX, bands=8, rows=4, threshold=0.85, max_bucket=MAX_BUCKET):
+        self.path = path
+        self.threshold = threshold
+        self.max_bucket = max_bucket
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_tables()
+        # 已建好的索引沿用建索引时的分桶参数（否则查询与桶对不上）
+        stored = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        self.bands = int(stored.get("bands", bands))
+        self.rows = int(stored.get("rows", rows))
+        self.hasher = MinHasher(self.bands * self.rows)
+        self._buffer = []
+        self.stats = {"lookups": 0, "matches": 0, "added": 0}
+
+    def _create_tables(self):
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS entities (
+                row_id      INTEGER PRIMARY KEY,   -- 建索引时 = 数据库 id；采集期间新增的行自动分配
+                db_id       INTEGER,
+                license     TEXT,
+                name        TEXT,
+                license_key TEXT,
+                core        TEXT,
+                branch      TEXT,
+                prefix      TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_entity_license ON entities (license_key);
+            CREATE TABLE IF NOT EXISTS buckets (
+                band   INTEGER NOT NULL,
+                key    INTEGER NOT NULL,
+                row_id INTEGER NOT NULL,
+                PRIMARY KEY (band, key, row_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS clusters (
+                row_id  INTEGER PRIMARY KEY,
+                cluster INTEGER NOT NULL,
+                reason  TEXT                       -- 把该行并入簇的那条边的判定
+            );
+            CREATE INDEX IF NOT EXISTS idx_cluster ON clusters (cluster);
+            CREATE TABLE IF NOT EXISTS matches (       -- 采集时命中的近似重复（供人工复核）
+                at          REAL,
+                name        TEXT,
+                license     TEXT,
+                keyword     TEXT,
+                matched_row INTEGER,
+                matched     TEXT,
+                reason      TEXT,
+                score       REAL
+            );
+        """)
+        self.conn.commit()
+
+    def prepare(self, name, license=None):
+        core, branch = canonical_name(name)
+        lic = (license or "").strip()
+        row = {"name": name, "license": lic, "license_key": license_key(lic), "core": core, "branch": branch,
+               "prefix": extract_prefix(lic) if lic else None}
+        signature = self.hasher.signature(MinHasher.hashes(shingles(core)))
+        row["keys"] = band_keys(signature, self.bands, self.rows) if signature else []
+        return row
+
+    # ------------------------------------------------------------------
+    # Ingest-time API
+    # ------------------------------------------------------------------
+    def lookup(self, name, license=None):
+        """Best near-duplicate of (name, license) already in the index: {row_id, name, license, reason, score} or None."""
+        self.stats["lookups"] += 1
+        probe = self.prepare(name, license)
+        candidates = set()
+        if probe["license_key"]:
+            candidates.update(r for (r,) in self.conn.execute(
+                "SELECT row_id FROM entities WHERE license_key = ? LIMIT ?", (probe["license_key"], self.max_bucket)))
+        for band, key in enumerate(probe["keys"]):
+            candidates.update(r for (r,) in self.conn.execute(
+                "SELECT row_id FROM buckets WHERE band = ? AND key = ? LIMIT ?", (band, key, self.max_bucket)))
+        best = None
+        for row in self._fetch(candidates).values():
+            verdict = judge(probe, row, self.threshold)
+            if verdict and (best is None or verdict[1] > best["score"]):
+                best = {"row_id": row["row_id"], "name": row["name"], "license": row["license"],
+                        "reason": verdict[0], "score": verdict[1]}
+        if best:
+            self.stats["matches"] += 1
+        return best
+
+    def add(self, name, license=None):
+        """Buffer a newly captured record (written on flush(), once per page)."""
+        if name or license:
+            self._buffer.append((name, license))
+
+    def flush(self):
+        if not self._buffer:
+            return 0
+        try:
+            for name, lic in self._buffer:
+                row = self.prepare(name, lic)
+                cur = self.conn.execute(
+                    "INSERT INTO entities (license, name, license_key, core, branch, prefix) VALUES (?, ?, ?, ?, ?, ?)",
+                    (row["license"], name, row["license_key"], row["core"], row["branch"], row["prefix"]))
+                self.conn.executemany("INSERT OR IGNORE INTO buckets (band, key, row_id) VALUES (?, ?, ?)",
+                                      [(b, k, cur.lastrowid) for b, k in enumerate(row["keys"])])
+            self.conn.commit()
+            added, self._buffer = len(self._buffer), []
+            self.stats["added"] += added
+            return added
+        except Exception as e:
+            print(f"[Entity] Could not update the index: {e}")
+            return 0
+
+    def record_match(self, name, license, keyword, match):
+        self.conn.execute("INSERT INTO matches VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                          (time.time(), name, license, keyword, match["row_id"], match["name"],
+                           match["reason"], match["score"]))
+        self.conn.commit()
+
+    def _fetch(self, row_ids):
+        rows = {}
+        ids = list(row_ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for r in self.conn.execute(
+                    f"SELECT row_id, name, license, license_key, core, branch, prefix FROM entities "
+                    f"WHERE row_id IN ({','.join('?' * len(chunk))})", chunk):
+                rows[r[0]] = dict(zip(("row_id", "name", "license", "license_key", "core", "branch", "prefix"), r))
+        return rows
+
+    # ------------------------------------------------------------------
+    # Offline build + clustering
+    # ------------------------------------------------------------------
+    def build(self, identities, bands=None, rows=None, batch_size=5000):
+        """Rebuild from (db_id, license_number, enterprise_name) rows, then cluster. Returns the cluster stats."""
+        self.bands, self.rows = bands or self.bands, rows or self.rows
+        self.hasher = MinHasher(self.bands * self.rows)
+        self.conn.executescript("DROP TABLE IF EXISTS entities; DROP TABLE IF EXISTS buckets; "
+                                "DROP TABLE IF EXISTS clusters; DELETE FROM meta;")
+        self._create_tables()
+        self.conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                              [("bands", str(self.bands)), ("rows", str(self.rows)), ("built_at", str(time.time()))])
+        started, total = time.time(), 0
+        entity_rows, bucket_rows = [], []
+
+        def _write():
+            self.conn.executemany("INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?, ?, ?)", entity_rows)
+            self.conn.executemany("INSERT OR IGNORE INTO buckets (band, key, row_id) VALUES (?, ?, ?)", bucket_rows)
+            self.conn.commit()
+            entity_rows.clear()
+            bucket_rows.clear()
+
+        for db_id, lic, name in identities:
+            row = self.prepare(name, lic)
+            entity_rows.append((db_id, db_id, row["license"], name, row["license_key"], row["core"], row["branch"], row["prefix"]))
+            bucket_rows.extend((b, k, db_id) for b, k in enumerate(row["keys"]))
+            total += 1
+            if len(entity_rows) >= batch_size:
+                _write()
+                if total % (batch_size * 20) == 0:
+                    print(f"[Entity] Indexed {total} rows ({total / max(time.time() - started, 1e-6):.0f}/s)...")
+        _write()
+        print(f"[Entity] Indexed {total} rows in {time.time() - started:.1f}s "
+              f"(bands={self.bands}, rows={self.rows}, numpy={'yes' if np is not None else 'no'}).")
+        return self.cluster()
+
+    def cluster(self):
+        """Union-find over verified candidate pairs from the license blocks and the LSH buckets."""
+        parent, reason_of = {}, {}
+        stats = {"pairs_checked": 0, "links": 0, "skipped_buckets": 0}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        def link_block(ids):
+            if len(ids) > self.max_bucket:
+                stats["skipped_buckets"] += 1
+                return
+            rows = self._fetch(ids)
+            ids = sorted(rows)
+            for i, x in enumerate(ids):
+                for y in ids[i + 1:]:
+                    rx, ry = find(x), find(y)
+                    if rx == ry:
+                        continue
+                    stats["pairs_checked"] += 1
+                    verdict = judge(rows[x], rows[y], self.threshold)
+                    if verdict:
+                        parent[max(rx, ry)] = min(rx, ry)
+                        reason_of.setdefault(y, verdict[0])
+                        stats["links"] += 1
+
+        blocks = self.conn.execute(
+            "SELECT group_concat(row_id) FROM entities WHERE license_key != '' "
+            "GROUP BY license_key HAVING COUNT(*) > 1").fetchall()
+        for (ids,) in blocks:
+            link_block([int(x) for x in ids.split(",")])
+        for band in range(self.bands):
+            blocks = self.conn.execute(
+                "SELECT group_concat(row_id) FROM buckets WHERE band = ? GROUP BY key HAVING COUNT(*) > 1", (band,)).fetchall()
+            for (ids,) in blocks:
+                link_block([int(x) for x in ids.split(",")])
+
+        # 只保存多于一行的簇（单行不是重复）
+        members = {}
+        for x in list(parent):
+            members.setdefault(find(x), []).append(x)
+        rows = [(x, root, reason_of.get(x)) for root, xs in members.items() if len(xs) > 1 for x in xs]
+        self.conn.execute("DELETE FROM clusters")
+        self.conn.executemany("INSERT INTO clusters (row_id, cluster, reason) VALUES (?, ?, ?)", rows)
+        self.conn.commit()
+        stats["clustered_rows"] = len(rows)
+        stats["clusters"] = sum(1 for xs in members.values() if len(xs) > 1)
+        print(f"[Entity] Clusters: {stats}")
+        return stats
+
+    def top_clusters(self, limit=20):
+        """[(cluster id, [(name, license, reason), ...]), ...] largest first."""
+        out = []
+        for cluster, _ in self.conn.execute(
+                "SELECT cluster, COUNT(*) AS n FROM clusters GROUP BY cluster ORDER BY n DESC LIMIT ?", (limit,)).fetchall():
+            members = self.conn.execute(
+                "SELECT e.name, e.license, c.reason FROM clusters c JOIN entities e ON e.row_id = c.row_id "
+                "WHERE c.cluster = ? ORDER BY e.row_id", (cluster,)).fetchall()
+            out.append((cluster, members))
+        return out
+
+    def close(self):
+        self.flush()
+        try: self.conn.close()
+        except: pass
+
+
+def open_index(category=None):
+    """The entity index of a category (config.ENTITY_* settings)."""
+    path = (category or {}).get("entity_index") or getattr(config, 'ENTITY_INDEX', DEFAULT_INDEX)
+    return EntityIndex(
+        path,
+        bands=getattr(config, 'ENTITY_LSH_BANDS', 8),
+        rows=getattr(config, 'ENTITY_LSH_ROWS', 4),
+        threshold=getattr(config, 'ENTITY_MATCH_THRESHOLD', 0.85),
+        max_bucket=getattr(config, 'ENTITY_MAX_BUCKET', MAX_BUCKET),
+    )
+
+
+def main():
+    from engine.categories import load_categories
+
+    parser = argparse.ArgumentParser(description="Entity-resolution index (MinHash LSH over normalized names + license blocks)")
+    parser.add_argument("--category", default=None, help="category id from config.CATEGORIES (default: primary)")
+    parser.add_argument("--build", action="store_true", help="rebuild the index from the category's table and cluster it")
+    parser.add_argument("--clusters", type=int, default=0, help="print the N largest clusters")
+    parser.add_argument("--query", default=None, help="look up one enterprise name")
+    parser.add_argument("--license", default=None, help="license number for --query")
+    args = parser.parse_args()
+
+    categories = load_categories()
+    category = next((c for c in categories if c["id"] == args.category), None) if args.category else categories[0]
+    if category is None:
+        parser.error(f"unknown category '{args.category}' (configured: {[c['id'] for c in categories]})")
+    index = open_index(category)
+    try:
+        if args.build:
+            from database.storage import Storage
+            db = Storage(table_name=category["table"])
+            try:
+                index.build(db.iter_identities())
+            finally:
+                db.close()
+        if args.query:
+            print(f"[Entity] {canonical_name(args.query)} → {index.lookup(args.query, args.license)}")
+        for cluster, members in index.top_clusters(args.clusters):
+            print(f"\n[Cluster {cluster}] {len(members)} rows")
+            for name, lic, reason in members:
+                print(f"    {name} | {lic or '-'} | {reason or 'root'}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
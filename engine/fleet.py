@@ -0,0 +1,273 @@
+"""
+Crawl Fleet - 多会话 / 多出口 IP 协同采集
+
+一个 coordinator + N 个 worker 进程：
+- 每个 worker = 独立 CDP 端点 + 独立 Chrome profile + 独立代理 + 独立限速器（行为日志/状态文件按 worker 分开）
+- 关键词通过共享的 SQLite 租约队列 (engine/work_queue.py) 领取，worker 挂掉后租约过期自动被别人接手
+- 结果各自写入同一个 Storage（ON DUPLICATE KEY UPDATE 天然可合并）
+- 新发现的前缀 / 超 1000 页的年份、数字拆分子任务都作为新租约入队，由任意 worker 领取
+
+用法:
+    python -m engine.fleet                      # 使用 config.FLEET_WORKERS
+    python -m engine.fleet --workers 3 --base-url http://127.0.0.1:8000/datasearch/search-result.html
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import time
+from urllib.parse import urlparse
+
+import config
+from config import MAX_PAGES
+from engine.work_queue import WorkQueue, LeaseKeeper
+
+CHECKPOINT_FILE = os.environ.get("SCRAPER_CHECKPOINT", "resources/scraper_checkpoint.json")  # 与 main.py 一致
+DEFAULT_TARGETS = "resources/city_targets.json"
+SITE_PAGE_LIMIT = 1000
+# 年份后缀 + 已追加的拆分数字："上海2024" → ""，"上海20241" → "1"
+SPLIT_SUFFIX = re.compile(r'20\d\d(\d*)$')
+MAX_SPLIT_DIGITS = 2  # 年份后最多再拆两位数字（2024 → 20241 → 202412），再往下不拆
+
+
+def load_static_keywords(target_file=DEFAULT_TARGETS):
+    with open(target_file, 'r', encoding='utf-8') as f:
+        raw_targets = json.load(f)
+    keywords = []
+    for item in raw_targets:
+        if isinstance(item, dict): keywords.extend(item.get('keywords', []))
+        elif isinstance(item, str): keywords.append(item)
+    return keywords
+
+
+def seed_store(store, target_file=DEFAULT_TARGETS):
+    """Static plan + main.py checkpoint (completed -> done, pending -> dynamic)."""
+    added = store.add(load_static_keywords(target_file), kind="static")
+    if os.path.exists(CHECKPOINT_FILE):
+        try:
+            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            store.mark_done(checkpoint.get("completed", []))
+            added += store.add(checkpoint.get("pending", []), kind="dynamic", priority=1)
+        except Exception as e:
+            print(f"[Fleet] Could not import checkpoint: {e}")
+    print(f"[Fleet] Work store seeded (+{added} new items): {store.stats()}")
+
+
+def split_keywords(keyword):
+    """
+    Year split for a broad keyword; one more digit for a year-suffixed (or already digit-split) one.
+    [] once MAX_SPLIT_DIGITS digits follow the year: the keyword cannot be narrowed further.
+    """
+    m = SPLIT_SUFFIX.search(keyword)
+    if m:
+        if len(m.group(1)) >= MAX_SPLIT_DIGITS:
+            return []
+        return [f"{keyword}{d}" for d in range(10)]
+    current_year = datetime.datetime.now().year
+    return [f"{keyword}{year}" for year in range(2014, current_year + 1)]
+
+
+def launch_chrome(spec):
+    """Start a dedicated Chrome for a worker (own debug port, profile and proxy)."""
+    port = urlparse(spec["cdp"]).port or 9222
+    profile = spec.get("profile") or os.path.abspath(os.path.join("resources", "chrome_profiles", spec["id"]))
+    os.makedirs(profile, exist_ok=True)
+    args = [
+        spec.get("chrome_path") or config.CHROME_PATH,
+        f"--remote-debugging-port={port}",
+        f"--user-data-dir={profile}",
+        "--no-first-run", "--no-default-browser-check", "--disable-extensions", "--disable-popup-blocking",
+    ]
+    if spec.get("proxy"):
+        args.append(f"--proxy-server={spec['proxy']}")
+    print(f"[Fleet] Launching Chrome for {spec['id']} on port {port} (proxy: {spec.get('proxy') or 'direct'})")
+    proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(3)  # 等 CDP 端口就绪
+    return proc
+
+
+def _force_utf8():
+    # Windows 控制台默认 GBK，子进程同样需要
+    try:
+        sys.stdout.reconfigure(encoding='utf-8')
+        sys.stderr.reconfigure(encoding='utf-8')
+    except Exception:
+        pass
+
+
+def _crawl_item(scraper, db, store, item, worker_id, max_pages):
+    kw = item["keyword"]
+    saved = 0
+    pages = 0
+    print(f"\n[{worker_id}] >>> Claimed '{kw}' ({item['kind']}, attempt {item['attempts']})")
+    try:
+        for batch_data, new_prefixes in scraper.search(keyword=kw, max_pages=max_pages):
+            pages += 1
+            if batch_data:
+                saved += db.save_batch(batch_data)
+
+            discovered = [p for p in new_prefixes if p != kw]
+            if scraper.discovery:
+                # 样本里几乎全是库内重复的前缀不入队（重复入队由租约表的 INSERT OR IGNORE 去掉）
+                discovered = [p for p in discovered if scraper.discovery.worth_searching(p)]
+            if discovered:
+                n = store.add(discovered, kind="dynamic", priority=1, parent=kw)
+                if n: print(f"[{worker_id}] [📍 Discovery] {n} new keyword(s) queued")
+
+            # 心跳线程负责续租；这里只确认租约没有因长时间卡死而被别人接手
+            if not store.renew(kw, worker_id):
+                print(f"[{worker_id}] Lease on '{kw}' lost. Abandoning.")
+                return
+
+            # 第一页后检查：非静态关键词超 1000 页 → 拆分为子租约
+            if pages == 1 and item["kind"] != "static":
+                site_total = getattr(scraper, 'last_total_pages', 0)
+                if site_total > SITE_PAGE_LIMIT:
+                    subs = split_keywords(kw)
+                    if not subs:
+                        print(f"[{worker_id}] ⚠️ '{kw}' has {site_total} pages but cannot be split further. "
+                              f"Crawling the first {SITE_PAGE_LIMIT} pages only.")
+                        item["kind"] = "static"  # 不再尝试拆分
+                        continue
+                    store.add(subs, kind="split", priority=2, parent=kw)
+                    print(f"[{worker_id}] [🔀 AutoSplit] '{kw}' has {site_total} pages. Queued {len(subs)} sub-tasks.")
+                    store.complete(kw, worker_id, saved, pages, note=f"split:{len(subs)}")
+                    return
+
+        if pages >= max_pages and item["kind"] == "static":
+            print(f"[{worker_id}] ⚠️ '{kw}' hit the {max_pages}-page limit (static keyword, may be incomplete).")
+        store.complete(kw, worker_id, saved, pages)
+        print(f"[{worker_id}] >>> Finished '{kw}'. Saved: {saved} records, {pages} pages.")
+    except KeyboardInterrupt:
+        store.release(kw, worker_id, saved, pages)
+        raise
+    except Exception as e:
+        print(f"[{worker_id}] Error on '{kw}': {e}. Releasing lease.")
+        store.release(kw, worker_id, saved, pages)
+        time.sleep(10)
+
+
+def run_worker(spec, store_path, max_pages=MAX_PAGES):
+    """Worker process entry point (top-level so it can be spawned on Windows)."""
+    from database.storage import Storage
+    from engine.scraper import NMPAScraper
+
+    _force_utf8()
+    worker_id = spec["id"]
+    lease_seconds = getattr(config, 'LEASE_SECONDS', 90)
+    store = WorkQueue(store_path, lease_seconds=lease_seconds)
+    keeper = LeaseKeeper(store_path, worker_id, lease_seconds)
+    keeper.start()
+    db = Storage()
+    existing_records = db.get_existing_records()
+    scraper = NMPAScraper(
+        existing_records=existing_records,
+        cdp_endpoint=spec["cdp"],
+        base_url=spec.get("base_url"),
+        worker_id=worker_id,
+        limiter_log=f"logs/scraper_behavior_{worker_id}.jsonl",
+        limiter_state=f"resources/limiter_state_{worker_id}.json",
+    )
+    try:
+        scraper.start()
+        while True:
+            item = store.claim(worker_id)
+            if not item:
+                if store.outstanding() == 0:
+                    print(f"[{worker_id}] Queue drained. Exiting.")
+                    break
+                time.sleep(5)  # 其它 worker 还在跑，可能还会拆出新任务
+                continue
+            _crawl_item(scraper, db, store, item, worker_id, max_pages)
+            time.sleep(2)
+    except KeyboardInterrupt:
+        print(f"[{worker_id}] Interrupted.")
+    finally:
+        keeper.stop()
+        store.release_all(worker_id)
+        scraper.close()
+        db.close()
+        store.close()
+
+
+def run_fleet(workers, store_path=None, target_file=DEFAULT_TARGETS, max_pages=MAX_PAGES, seed=True):
+    from engine.process_lock import ProcessLock
+
+    store_path = store_path or getattr(config, 'WORK_STORE', "resources/work_queue.db")
+    # 只防止两个 coordinator 同时播种/调度同一个 store；关键词并发由租约控制
+    lock = ProcessLock(lock_file=store_path + ".lock")
+    if not lock.acquire():
+        return
+
+    chromes = []
+    procs = []
+    try:
+        store = WorkQueue(store_path)
+        if seed:
+            seed_store(store, target_file)
+
+        from database.storage import Storage
+        db = Storage()
+        db.init_db()
+        db.close()
+
+        chromes = [launch_chrome(w) for w in workers if w.get("launch")]
+        for w in workers:
+            p = multiprocessing.Process(target=run_worker, args=(w, store_path, max_pages), name=f"fleet-{w['id']}")
+            p.start()
+            procs.append(p)
+        print(f"[Fleet] {len(procs)} worker(s) started.")
+
+        started = time.time()
+        while any(p.is_alive() for p in procs):
+            for p in procs:
+                p.join(timeout=60 / max(len(procs), 1))
+            stats = store.stats()
+            hours = max((time.time() - started) / 3600, 1e-6)
+            print(f"[Fleet] live={stats['live_workers']} pending={stats['pending']} leased={stats['leased']} done={stats['done']} "
+                  f"saved={stats['saved']} ({stats['saved'] / hours:.0f} rows/h) by_worker={stats['by_owner']}")
+        store.close()
+    except KeyboardInterrupt:
+        print("\n[Fleet] Interrupted. Waiting for workers to release leases...")
+        for p in procs:
+            p.join(timeout=30)
+    finally:
+        for p in procs:
+            if p.is_alive(): p.terminate()
+        for c in chromes:
+            try: c.terminate()
+            except: pass
+        lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker NMPA crawl fleet")
+    parser.add_argument("--workers", type=int, default=None, help="use the first N entries of config.FLEET_WORKERS (or generate N on ports 9222+)")
+    parser.add_argument("--base-url", default=None, help="override BASE_URL (e.g. a local mock site)")
+    parser.add_argument("--store", default=None)
+    parser.add_argument("--targets", default=DEFAULT_TARGETS)
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--no-seed", action="store_true")
+    args = parser.parse_args()
+    _force_utf8()
+
+    workers = [dict(w) for w in getattr(config, 'FLEET_WORKERS', [])]
+    if args.workers:
+        while len(workers) < args.workers:
+            i = len(workers)
+            workers.append({"id": f"w{i + 1}", "cdp": f"http://localhost:{9222 + i}", "proxy": None, "launch": True})
+        workers = workers[:args.workers]
+    if args.base_url:
+        for w in workers:
+            w["base_url"] = args.base_url
+
+    run_fleet(workers, store_path=args.store, target_file=args.targets, max_pages=args.max_pages, seed=not args.no_seed)
+
+
+if __name__ == "__main__":
+    main()
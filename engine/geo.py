@@ -0,0 +1,282 @@
+"""
+Geo - 地址解析为省 / 市 / 区县列（入库时写入，建索引；存量数据分批回填）
+
+CRM 按地区筛选原先是 address / operation_address 上的 LIKE '%城市%'（TEXT 列全表扫描）。这里把地址解析成
+province_code / province / city / district 四列，入库时由 Storage.save_batch 一并写入，按地区查询走索引：
+- 行政区划词典 = resources/admin_divisions.json（GB/T 2260 省级代码与全称 / 简称）
+                + resources/city_targets.json（采集用的地级市关键词，按省归属）
+  编译成三条正则：省名、市名（各自按长度降序的交替）、区县（名称 + 区/县/旗/市 后缀）
+- 只从地址开头按 省 → 市 → 区县 依次匹配；"中国"、括号等前导字符先剥掉
+- 简称既是省又是市（吉林 / 海南）：后面跟 省 或不跟市级后缀时按省，跟 市 / 州 / 地区 / 盟 时按市
+- 市名后紧跟 区 / 县 / 路 / 街 等不算市（北京"朝阳区"不是辽宁朝阳市）
+- 地址缺省份时由市反推（市名唯一归属时）；address 解析不全时依次用 operation_address、企业名称补齐同省的缺项
+- 直辖市的市 = 省简称；区县不在词典里，按后缀截取最短的"名称 + 区/县/旗/市"，存名称
+- 未能定位的行 province_code 写 ''（回填不会反复选中）
+
+市 / 区县只存名称：仓库只附带省级代码表。admin_divisions.json 的条目可带
+"cities": [{"name": "杭州"}, ...] 补充 city_targets.json 里没有的地级名称。
+
+用法:
+    python -m engine.geo --parse "浙江省杭州市西湖区文三路 100 号"
+    python -m engine.geo --backfill [--batch-size 2000] [--all]
+    python -m engine.geo --stats [--province 浙江]
+    python -m engine.geo --self-test                       # 用 SELF_TEST_CASES 核对解析结果（不连库）
+    Storage.find_by_region(*get_parser().resolve_region("杭州"))   # 代码里按地区取行（走 idx_region）
+"""
+import argparse
+import json
+import re
+import sys
+import unicodedata
+
+import config
+
+DEFAULT_TARGETS = "resources/city_targets.json"
+DEFAULT_DIVISIONS = "resources/admin_divisions.json"
+
+GEO_COLUMNS = ("province_code", "province", "city", "district")
+MUNICIPALITIES = frozenset({"11", "12", "31", "50"})
+
+# 市级后缀："杭州市"、"大兴安岭地区"、"阿拉善盟"、"海南州"、"延边朝鲜族自治州"
+CITY_SUFFIX = r'(?:市|地区|盟|[一-鿿]{0,6}?自治州|州)'
+# 紧跟这些字说明前面的名字不是地级市，而是区县 / 道路 / 乡镇的一部分
+NOT_CITY_NEXT = frozenset("区县旗镇乡村路街道巷弄号")
+# 区县：1-7 个汉字 + 新区 / 区 / 县 / 旗 / 市（取最短匹配）
+RE_DISTRICT = re.compile(r'([一-鿿]{1,7}?)(?:新区|区|县|旗|市)')
+# 后缀前紧挨着道路 / 门牌用字说明是街道名（"中山北路市场"），不是区县；
+# 只看这一个字：鼓楼区、道里区、镇海区、路南区、路桥区这类名称里的同样用字不受影响（单字名如"道县"也放行）
+ROAD_ENDINGS = frozenset("路街道号巷弄")
+# --self-test 的样例：地址 → (province_code, city, district)
+SELF_TEST_CASES = (
+    ("浙江省杭州市西湖区文三路 100 号", ("33", "杭州", "西湖区")),
+    ("上海市浦东新区张江路", ("31", "上海", "浦东新区")),
+    ("上海市市辖区浦东新区张江路", ("31", "上海", "浦东新区")),
+    ("北京市市辖区海淀区", ("11", "北京", "海淀区")),
+    ("天津市市辖区和平区", ("12", "天津", "和平区")),
+    ("北京北京市朝阳区", ("11", "北京", "朝阳区")),
+    ("吉林市船营区", ("22", "吉林", "船营区")),
+    ("江苏省南京市鼓楼区", ("32", "南京", "鼓楼区")),
+    ("海南藏族自治州共和县", ("63", "海南", "共和县")),
+)
+RE_LEADING = re.compile(r'^(?:中华人民共和国|中国)?[\s\(（\[【]*')
+RE_SKIP = re.compile(r'[\s\)）\]】,，、]*')
+
+
+def _alternation(names):
+    return re.compile("|".join(re.escape(n) for n in sorted(names, key=len, reverse=True)))
+
+
+class GeoParser:
+    """Compiled admin-division dictionary: parse(address) → (province_code, province, city, district)."""
+
+    def __init__(self, targets_file=DEFAULT_TARGETS, divisions_file=DEFAULT_DIVISIONS):
+        with open(divisions_file, "r", encoding="utf-8") as f:
+            divisions = json.load(f)
+        with open(targets_file, "r", encoding="utf-8") as f:
+            targets = json.load(f)
+
+        self.province_short = {}   # code → 简称（入库的 province 列）
+        self.province_by_name = {} # 全称 / 简称 → code
+        self.cities = {}           # 地级名称 → [province codes]
+        for item in divisions:
+            code = item["code"]
+            self.province_short[code] = item["short"]
+            self.province_by_name[item["name"]] = code
+            self.province_by_name[item["short"]] = code
+            for city in item.get("cities", ()):
+                self._add_city(city["name"], code)
+        for entry in targets:
+            code = self.province_by_name.get(entry.get("province"))
+            if not code:
+                continue
+            for kw in entry.get("keywords", [])[1:]:  # 第一个关键词是省名本身
+                self._add_city(kw, code)
+
+        self.re_province = _alternation(self.province_by_name)
+        self.re_city = _alternation(self.cities)
+        self.re_city_suffix = re.compile(CITY_SUFFIX)
+        self.re_repeat = {code: re.compile(r'(?:' + re.escape(self.province_short[code]) + r'市?|市辖区)+')
+                          for code in MUNICIPALITIES if code in self.province_short}
+        self._cache = {}
+
+    def _add_city(self, name, code):
+        codes = self.cities.setdefault(name, [])
+        if code not in codes:
+            codes.append(code)
+
+    def __len__(self):
+        return len(self.province_by_name) + len(self.cities)
+
+    # ------------------------------------------------------------------
+    # Parsing
+    # ------------------------------------------------------------------
+    def _match_city(self, text, pos, province):
+        """(name, province code, end) of a prefecture at text[pos:], or None."""
+        m = self.re_city.match(text, pos)
+        if not m:
+            return None
+        name = m.group(0)
+        candidates = self.cities[name]
+        if province:
+            if province not in candidates:
+                return None
+            code = province
+        elif len(candidates) == 1:
+            code = candidates[0]
+        else:
+            return None  # 同名地级市分属多个省且地址没写省：不猜
+        end = m.end()
+        suffix = self.re_city_suffix.match(text, end)
+        if suffix:
+            end = suffix.end()
+        elif end < len(text) and text[end] in NOT_CITY_NEXT:
+            return None
+        return name, code, end
+
+    def parse(self, text):
+        """Locate one address (or enterprise name); missing levels are None."""
+        if not text:
+            return None, None, None
+        cached = self._cache.get(text)
+        if cached is not None:
+            return cached
+        s = unicodedata.normalize("NFKC", text).strip()
+        pos = RE_LEADING.match(s).end()
+        province = city = district = None
+
+        m = self.re_province.match(s, pos)
+        if m:
+            name = m.group(0)
+            code = self.province_by_name[name]
+            end = m.end()
+            if s.startswith("省", end) or (code in MUNICIPALITIES and name == self.province_short[code]
+                                           and s.startswith("市", end)):
+                # 只有简称后面的 "市" 属于省名；全称 "上海市" 后面的 "市" 是 "市辖区" 的第一个字
+                end += 1
+            elif s.startswith("市", end) and name == self.province_short[code]:
+                city, end = name, end + 1  # 与省同名的地级市（吉林市）
+            elif name in self.cities and self.re_city_suffix.match(s, end):
+                code = None  # "海南藏族自治州"：是市不是省，交给下面的市匹配
+            elif s.startswith("自治区", end):
+                end += 3
+            if code:
+                province, pos = code, end
+        pos = RE_SKIP.match(s, pos).end()
+
+        if province in MUNICIPALITIES:
+            city = self.province_short[province]
+            # "北京市北京市朝阳区"、"上海市市辖区"：跳过重复的市名
+            again = self.re_repeat[province].match(s, pos)
+            if again:
+                pos = again.end()
+        elif province and not city and s.startswith(self.province_short[province] + "市", pos):
+            city = self.province_short[province]
+            pos += len(city) + 1
+        elif not city:
+            found = self._match_city(s, pos, province)
+            if found:
+                city, province, pos = found
+        pos = RE_SKIP.match(s, pos).end()
+
+        if province or city:
+            d = RE_DISTRICT.match(s, pos)
+            if d and not (len(d.group(1)) > 1 and d.group(1)[-1] in ROAD_ENDINGS):
+                district = d.group(0)
+        result = (province, city, district)
+        if len(self._cache) < 200000:
+            self._cache[text] = result
+        return result
+
+    def locate(self, address=None, operation_address=None, name=None):
+        """Best location from address, then operation address, then enterprise name (same-province gaps only)."""
+        province = city = district = None
+        for source in (address, operation_address, name):
+            if not source:
+                continue
+            p, c, d = self.parse(source)
+            if not p:
+                continue
+            if source is name:
+                d = None  # 企业名称里"XX超市"之类会被误当作区县
+            if not province:
+                province, city, district = p, c, d
+            elif p == province and (not city or c == city):
+                city = city or c
+                if c == city and not district:
+                    district = d
+            if city and district:
+                break
+        return province, city, district
+
+    def db_values(self, address=None, operation_address=None, name=None):
+        """GEO_COLUMNS values; '' province_code marks a row that could not be located."""
+        province, city, district = self.locate(address, operation_address, name)
+        if not province:
+            return '', None, None, None
+        return province, self.province_short[province], city, district
+
+    def resolve_region(self, region):
+        """'浙江' / '浙江省' / '33' / '杭州' → (province_code, city) for index lookups."""
+        region = (region or "").strip()
+        if region in self.province_short:
+            return region, None
+        p, c, _ = self.parse(region)
+        if p and not c and region.rstrip("市州盟") in self.cities:
+            c = region.rstrip("市州盟")
+        return p, c
+
+
+_parser = None
+
+
+def get_parser():
+    """The process-wide parser (dictionary compiled on first use)."""
+    global _parser
+    if _parser is None:
+        _parser = GeoParser(getattr(config, 'GEO_TARGETS', DEFAULT_TARGETS),
+                            getattr(config, 'GEO_DIVISIONS', DEFAULT_DIVISIONS))
+    return _parser
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Address → province / city / district parsing and backfill")
+    parser.add_argument("--parse", action="append", default=[], help="Parse an address and print the result")
+    parser.add_argument("--backfill", action="store_true", help="Fill the geo columns of existing rows in batches")
+    parser.add_argument("--all", action="store_true", help="With --backfill: re-parse every row, not just unfilled ones")
+    parser.add_argument("--batch-size", type=int, default=getattr(config, 'GEO_BACKFILL_BATCH', 2000))
+    parser.add_argument("--stats", action="store_true", help="Row counts per province (or per city with --province)")
+    parser.add_argument("--province", default=None)
+    parser.add_argument("--table", default=None, help="Table name (default config.TABLE_NAME)")
+    parser.add_argument("--self-test", action="store_true", help="Check the parser against SELF_TEST_CASES")
+    args = parser.parse_args()
+
+    geo = get_parser()
+    if args.self_test:
+        failed = 0
+        for text, expected in SELF_TEST_CASES:
+            got = geo.parse(text)
+            failed += got != expected
+            print(f"[Geo] {'✅' if got == expected else '❌'} {text} → {got}" + ("" if got == expected else f" (expected {expected})"))
+        sys.exit(1 if failed else 0)
+    for text in args.parse:
+        print(f"[Geo] {text} → {dict(zip(GEO_COLUMNS, geo.db_values(text)))}")
+    if not (args.backfill or args.stats):
+        if not args.parse:
+            print(f"[Geo] Dictionary: {len(geo.province_short)} provinces, {len(geo.cities)} prefecture names")
+        return
+
+    from database.storage import Storage
+    db = Storage(table_name=args.table)
+    try:
+        if args.backfill:
+            db.backfill_geo(batch_size=args.batch_size, everything=args.all)
+        if args.stats:
+            code = geo.resolve_region(args.province)[0] if args.province else None
+            for name, count in db.count_by_region(code):
+                print(f"[Geo] {name or '(unlocated)'}: {count}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
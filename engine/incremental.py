@@ -0,0 +1,284 @@
+"""
+Incremental Re-crawl - 按关键词水位线只采新备案的企业
+
+全量重跑 city_targets.json 会让每个关键词都从第 1 页走一遍，而库里绝大部分记录早已存在。
+这里为每个关键词保存一条水位线（见过的最新编号年份/编号、最新备案日期），增量运行时：
+- 站点列表按备案时间倒序（前几页探测得出，结论持久化）→ 直接搜关键词，翻到
+  "整页都已在库且年份不晚于水位线" 即停止
+- 不是倒序 → 只搜带年份后缀的关键词（水位线年份 ~ 今年，通常只有今年），超 1000 页再按数字拆分
+第一次运行时水位线由库内已有记录（去重快照里与关键词包含匹配的编号）推出，无需先全量跑一遍。
+两种方式下 CoverageEstimator（engine/coverage.py）照常生效，全重复页会更早结束。
+
+用法:
+    python -m engine.incremental                    # 全部静态关键词
+    python -m engine.incremental --keywords 上海 北京
+    python -m engine.incremental --reprobe          # 重新探测站点排序
+"""
+import argparse
+import datetime
+import os
+import re
+import sqlite3
+import time
+
+import config
+from config import MAX_PAGES
+
+DEFAULT_STORE = "resources/watermarks.db"
+SITE_PAGE_LIMIT = 1000
+RE_LICENSE_KEY = re.compile(r'(20\d\d)(\d*)')
+
+
+def license_key(lic):
+    """(year, serial) embedded in a license number, e.g. 沪浦食药监械经营备20150123号 → (2015, 123)."""
+    match = RE_LICENSE_KEY.search(lic or "")
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2) or 0)
+
+
+class WatermarkStore:
+    def __init__(self, path=DEFAULT_STORE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                keyword      TEXT PRIMARY KEY,
+                license_year INTEGER,
+                license_num  TEXT,      -- 见过的最新编号
+                filing_date  TEXT,      -- 入库记录里最新的备案日期
+                mode         TEXT,      -- ordered / year / full
+                runs         INTEGER NOT NULL DEFAULT 0,
+                saved        INTEGER NOT NULL DEFAULT 0,
+                updated_at   REAL
+            )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+
+    def get(self, keyword):
+        row = self.conn.execute(
+            "SELECT license_year, license_num, filing_date, mode, runs FROM watermarks WHERE keyword=?", (keyword,)).fetchone()
+        if not row:
+            return None
+        return {"license_year": row[0], "license_num": row[1], "filing_date": row[2], "mode": row[3], "runs": row[4]}
+
+    def update(self, keyword, license_num=None, filing_date=None, mode=None, saved=0):
+        key = license_key(license_num)
+        self.conn.execute(
+            "INSERT INTO watermarks (keyword, license_year, license_num, filing_date, mode, runs, saved, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT(keyword) DO UPDATE SET "
+            "license_year=COALESCE(excluded.license_year, license_year), license_num=COALESCE(excluded.license_num, license_num), "
+            "filing_date=NULLIF(MAX(COALESCE(excluded.filing_date, ''), COALESCE(filing_date, '')), ''), "
+            "mode=COALESCE(excluded.mode, mode), runs=runs+1, saved=saved+excluded.saved, updated_at=excluded.updated_at",
+            (keyword, key[0] if key else None, license_num if key else None, filing_date, mode, saved, time.time()))
+        self.conn.commit()
+
+    def site_order(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key='site_order'").fetchone()
+        return row[0] if row else None
+
+    def set_site_order(self, order):
+        if order is None:
+            self.conn.execute("DELETE FROM meta WHERE key='site_order'")
+        else:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('site_order', ?)", (order,))
+        self.conn.commit()
+
+    def close(self):
+        try: self.conn.close()
+        except: pass
+
+
+def seed_watermark(keyword, existing_records):
+    """Newest license number in the DB snapshot that the site's contains-match would return for keyword."""
+    newest, newest_key = None, None
+    for lic, name in existing_records:
+        if not lic or (keyword not in lic and keyword not in (name or "")):
+            continue
+        key = license_key(lic)
+        if key and (newest_key is None or key > newest_key):
+            newest, newest_key = lic, key
+    return newest
+
+
+class IncrementalCursor:
+    """
+    Per-keyword row observer hooked into NMPAScraper (like the coverage estimator).
+    detect_order=True: probe the first pages for newest-first ordering, then stop at the watermark.
+    ordered=True: the stored site order is already newest-first; stop at the watermark from page 1.
+    """
+
+    def __init__(self, watermark_num=None, detect_order=True, probe_pages=2, order_ratio=0.9, ordered=None):
+        key = license_key(watermark_num)
+        self.watermark_year = key[0] if key else None
+        self.detect_order = detect_order
+        self.probe_pages = probe_pages
+        self.order_ratio = order_ratio
+        self.ordered = ordered  # None = 未判定；站点排序已持久化为 desc 时直接传 True
+        self.years = []      # 探测期内按页面顺序的编号年份
+        self.pages = 0
+        self.newest = None
+        self.newest_key = None
+        self._page_rows = 0
+        self._page_fresh = 0  # 本页里不在库 或 晚于水位线的行
+
+    def observe(self, base_info, duplicate=None):
+        key = license_key(base_info.get('licenseNum'))
+        self._page_rows += 1
+        if key is None:
+            self._page_fresh += 1
+            return
+        if self.newest_key is None or key > self.newest_key:
+            self.newest, self.newest_key = base_info.get('licenseNum'), key
+        if self.detect_order and self.ordered is None:
+            self.years.append(key[0])
+        if not duplicate or self.watermark_year is None or key[0] > self.watermark_year:
+            self._page_fresh += 1
+
+    def _judge_order(self):
+        pairs = list(zip(self.years, self.years[1:]))
+        if len(pairs) < 5:
+            return None
+        descending = sum(1 for prev, nxt in pairs if nxt <= prev) / len(pairs)
+        # 全部同一年的样本说明不了排序
+        if len(set(self.years)) == 1:
+            return None
+        return descending >= self.order_ratio
+
+    def end_page(self):
+        """Call after each page. Returns (stop?, reason)."""
+        self.pages += 1
+        rows, fresh = self._page_rows, self._page_fresh
+        self._page_rows = self._page_fresh = 0
+        if not self.detect_order:
+            return False, None
+        if self.ordered is None and self.pages >= self.probe_pages:
+            self.ordered = self._judge_order()
+            if self.ordered is False:
+                return True, f"list is not newest-first (years on first pages: {self.years[:20]})"
+        if self.ordered and rows and not fresh:
+            return True, f"reached watermark {self.watermark_year} (whole page already in DB)"
+        return False, None
+
+
+def _run_search(scraper, db, keyword, cursor, max_pages, split_overflow=False):
+    """Drive scraper.search() with the cursor attached. Returns (saved, pages, newest filing date, overflowed?)."""
+    saved, pages, newest_date = 0, 0, None
+    scraper.incremental = cursor
+    try:
+        for batch_data, _ in scraper.search(keyword=keyword, max_pages=max_pages):
+            pages += 1
+            if batch_data:
+                saved += db.save_batch(batch_data)
+                dates = [str(r['filingDate']) for r in batch_data if r.get('filingDate')]
+                if dates:
+                    newest_date = max(dates + ([newest_date] if newest_date else []))
+            if split_overflow and pages == 1 and getattr(scraper, 'last_total_pages', 0) > SITE_PAGE_LIMIT:
+                return saved, pages, newest_date, True
+    finally:
+        scraper.incremental = None
+    return saved, pages, newest_date, False
+
+
+def crawl_keyword(scraper, db, store, keyword, max_pages=MAX_PAGES, this_year=None):
+    """Incremental pass for one keyword. Returns records saved."""
+    from engine.fleet import split_keywords
+
+    this_year = this_year or datetime.datetime.now().year
+    mark = store.get(keyword)
+    watermark = (mark or {}).get("license_num") or seed_watermark(keyword, scraper.existing_records)
+    order = store.site_order()
+    saved, newest, newest_date = 0, None, None
+
+    if order != "unordered" and watermark:
+        cursor = IncrementalCursor(watermark, probe_pages=getattr(config, 'INCREMENTAL_PROBE_PAGES', 2),
+                                   order_ratio=getattr(config, 'INCREMENTAL_ORDER_RATIO', 0.9),
+                                   ordered=True if order == "desc" else None)
+        print(f"[Incremental] '{keyword}': newest-first pass down to watermark {watermark}")
+        s, pages, newest_date, _ = _run_search(scraper, db, keyword, cursor, max_pages)
+        saved += s
+        newest = cursor.newest
+        if cursor.ordered is not None and order is None:
+            order = "desc" if cursor.ordered else "unordered"
+            store.set_site_order(order)
+            print(f"[Incremental] Site list order detected: {order}")
+        if cursor.ordered:
+            store.update(keyword, newest or watermark, newest_date, mode="ordered", saved=saved)
+            return saved
+        if cursor.ordered is None and pages < max_pages:
+            # 行太少 / 全是同一年判定不了排序，但游标没有叫停：列表已翻到底，不必再按年份重搜
+            store.update(keyword, newest or watermark, newest_date, mode="full", saved=saved)
+            return saved
+
+    # 非倒序：只搜水位线年份 ~ 今年的年份后缀关键词
+    wm_year = license_key(watermark)[0] if watermark else this_year
+    years = range(min(max(wm_year, 2014), this_year), this_year + 1)
+    print(f"[Incremental] '{keyword}': year-suffixed pass {list(years)}")
+    for year in years:
+        subs = [f"{keyword}{year}"]
+        while subs:
+            sub = subs.pop(0)
+            cursor = IncrementalCursor(detect_order=False)
+            finer = split_keywords(sub)  # [] = 已拆到最细：超 1000 页也只能翻前 1000 页
+            s, pages, date, overflow = _run_search(scraper, db, sub, cursor, max_pages, split_overflow=bool(finer))
+            saved += s
+            if cursor.newest_key and (newest is None or cursor.newest_key > license_key(newest)):
+                newest = cursor.newest
+            if date and (newest_date is None or date > newest_date):
+                newest_date = date
+            if overflow:
+                print(f"[Incremental] '{sub}' exceeds {SITE_PAGE_LIMIT} pages. Splitting by digit.")
+                subs = finer + subs
+            time.sleep(1)
+    store.update(keyword, newest or watermark, newest_date, mode="year", saved=saved)
+    return saved
+
+
+def main():
+    from database.storage import Storage
+    from engine.fleet import load_static_keywords, DEFAULT_TARGETS, _force_utf8
+    from engine.scraper import NMPAScraper
+
+    parser = argparse.ArgumentParser(description="Incremental re-crawl (only enterprises newer than each keyword's watermark)")
+    parser.add_argument("--targets", default=DEFAULT_TARGETS)
+    parser.add_argument("--keywords", nargs="*", default=None, help="only these keywords (default: all static keywords)")
+    parser.add_argument("--store", default=getattr(config, 'INCREMENTAL_STORE', DEFAULT_STORE))
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--reprobe", action="store_true", help="forget the detected site order and probe again")
+    args = parser.parse_args()
+    _force_utf8()
+
+    store = WatermarkStore(args.store)
+    if args.reprobe:
+        store.set_site_order(None)
+    keywords = args.keywords or load_static_keywords(args.targets)
+
+    db = Storage()
+    db.init_db()
+    scraper = NMPAScraper(existing_records=db.get_existing_records())
+    started = time.time()
+    total = 0
+    try:
+        scraper.start()
+        for i, kw in enumerate(keywords, 1):
+            print(f"\n>>> [Incremental {i}/{len(keywords)}] {kw}")
+            try:
+                total += crawl_keyword(scraper, db, store, kw, max_pages=args.max_pages)
+            except Exception as e:
+                print(f"[Incremental] Error on '{kw}': {e}. Moving on.")
+                time.sleep(10)
+    except KeyboardInterrupt:
+        print("\n[Incremental] Interrupted.")
+    finally:
+        print(f"[Incremental] Saved {total} records in {(time.time() - started) / 3600:.2f} h.")
+        scraper.close()
+        db.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Offline Limiter Simulator - 离线限速策略仿真 & 参数调优
+
+从 logs/scraper_behavior.jsonl 的 BLOCK / heartbeat / recovery 事件拟合
+"封锁概率 ~ current_base" 模型，然后在虚拟时间中回放各限速策略，
+输出每个策略 / 参数组合的预期 records/hour 与封锁率。
+不发任何网络请求，不消耗 IP 信誉。
+
+用法:
+    python -m engine.limiter_simulator
+    python -m engine.limiter_simulator --requests 20000 --max-block-rate 0.5
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import statistics
+
+import config
+
+BEHAVIOR_LOG = "logs/scraper_behavior.jsonl"
+BUCKET_WIDTH = 0.5          # 秒，current_base 分桶宽度
+DEFAULT_ROW_OVERHEAD = 7.5  # 秒，单条详情的固定开销（开 tab + 2s 缓冲 + 2.5~4.5s 休眠）
+BLOCK_RECLICK_ATTEMPTS = 3  # 第 3 次白屏才 record_block()，之前的重试等待也计入耗时
+
+# 没有历史数据时的兜底模型：越快越容易被封
+FALLBACK_MODEL = {2.0: 0.020, 2.5: 0.010, 3.0: 0.006, 5.0: 0.003, 10.0: 0.001, 30.0: 0.0005}
+
+
+class BlockModel:
+    """Per-request block probability as a non-increasing step function of current_base."""
+
+    def __init__(self, buckets, row_overhead=DEFAULT_ROW_OVERHEAD, source="fallback"):
+        # buckets: {bucket_base: probability}
+        self.bases = sorted(buckets)
+        self.probs = [buckets[b] for b in self.bases]
+        self.row_overhead = row_overhead
+        self.source = source
+
+    def probability(self, base):
+        """Look up the bucket at or below `base` (slower than every bucket -> safest bucket)."""
+        if not self.bases:
+            return 0.0
+        prob = self.probs[0]
+        for b, p in zip(self.bases, self.probs):
+            if b <= base + 1e-9:
+                prob = p
+            else:
+                break
+        return prob
+
+    def describe(self):
+        lines = [f"[Model] Source: {self.source}, row overhead: {self.row_overhead:.2f}s"]
+        for b, p in zip(self.bases, self.probs):
+            lines.append(f"  base >= {b:6.2f}s : p(block) = {p:.4%}")
+        return "\n".join(lines)
+
+    @classmethod
+    def fit(cls, log_path=BEHAVIOR_LOG, prior_blocks=0.5, prior_requests=50):
+        """
+        Fit from behavior log.
+        - heartbeat: 10 requests succeeded at `current_base`
+        - BLOCK: one block at `old_base`
+        - recovery / speed_up / AGGRESSIVE_RESET: base changes (tracked for attribution)
+        """
+        if not os.path.exists(log_path):
+            return cls(dict(FALLBACK_MODEL))
+
+        requests = {}
+        blocks = {}
+        intervals = []
+        last_hb = None
+        try:
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        ev = json.loads(line)
+                    except ValueError:
+                        continue
+                    kind = ev.get("event")
+                    if kind == "session_start":
+                        last_hb = None
+                    elif kind == "heartbeat":
+                        base = float(ev.get("current_base", 0) or 0)
+                        bucket = _bucket(base)
+                        requests[bucket] = requests.get(bucket, 0) + 10
+                        # 两次心跳之间 = 10 次请求，可以反推单条真实耗时
+                        ts = ev.get("timestamp")
+                        if last_hb and ts and ev.get("total_req", 0) > last_hb[1]:
+                            per_req = (ts - last_hb[0]) / (ev["total_req"] - last_hb[1])
+                            if 0 < per_req < 120:
+                                intervals.append(max(0.0, per_req - base))
+                        last_hb = (ts, ev.get("total_req", 0)) if ts else None
+                    elif kind == "BLOCK":
+                        bucket = _bucket(float(ev.get("old_base", 0) or 0))
+                        blocks[bucket] = blocks.get(bucket, 0) + 1
+                        requests[bucket] = requests.get(bucket, 0) + 1
+                        last_hb = None
+        except Exception as e:
+            print(f"[Model] Failed to read {log_path}: {e}. Using fallback model.")
+            return cls(dict(FALLBACK_MODEL))
+
+        if not requests:
+            return cls(dict(FALLBACK_MODEL))
+
+        # Smoothed per-bucket estimate, then force monotonic (slower never riskier)
+        bases = sorted(requests)
+        raw = [(blocks.get(b, 0) + prior_blocks) / (requests[b] + prior_requests) for b in bases]
+        weights = [requests[b] for b in bases]
+        fitted = _pava_non_increasing(raw, weights)
+
+        overhead = statistics.median(intervals) if intervals else DEFAULT_ROW_OVERHEAD
+        return cls(dict(zip(bases, fitted)), row_overhead=overhead, source=log_path)
+
+
+def _bucket(base):
+    return round(int(base / BUCKET_WIDTH) * BUCKET_WIDTH, 2)
+
+
+def _pava_non_increasing(values, weights):
+    """Pool-adjacent-violators: weighted isotonic (non-increasing) regression."""
+    blocks = []  # [value, weight, count]
+    for v, w in zip(values, weights):
+        blocks.append([v, max(w, 1), 1])
+        while len(blocks) > 1 and blocks[-2][0] < blocks[-1][0]:
+            v2, w2, c2 = blocks.pop()
+            v1, w1, c1 = blocks.pop()
+            blocks.append([(v1 * w1 + v2 * w2) / (w1 + w2), w1 + w2, c1 + c2])
+    out = []
+    for v, _, c in blocks:
+        out.extend([v] * c)
+    return out
+
+
+def build_limiter(policy, params):
+    """Instantiate a limiter for simulation (no log file, no state file, no console noise)."""
+    from engine.rate_limiter import SmartRateLimiter, create_policy
+    return SmartRateLimiter(
+        default_base=params.get("default_base", config.RL_BASE_WAIT),
+        min_base=params.get("min_base", config.RL_MIN_WAIT),
+        max_base=params.get("max_base", config.RL_MAX_WAIT),
+        penalty_add=params.get("penalty_add", config.RL_PENALTY_ADD),
+        recovery_step=params.get("recovery_step", config.RL_RECOVERY_STEP),
+        log_path=os.devnull,
+        policy=create_policy(policy, **params.get("policy_options", {})),
+    )
+
+
+def simulate(policy, params, model, n_requests=10000, seed=42):
+    """
+    Replay `n_requests` detail requests in virtual time.
+    Each request costs model.row_overhead + limiter.get_delay(); a block costs the
+    re-click backoff waits (same formula as the scraper) and yields no record.
+    """
+    rng = random.Random(seed)
+    state = random.getstate()
+    random.seed(seed)  # limiter jitter uses the global RNG
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            limiter = build_limiter(policy, params)
+            virtual_time = 0.0
+            records = 0
+            blocks = 0
+            for _ in range(n_requests):
+                virtual_time += model.row_overhead + limiter.get_delay()
+                if rng.random() < model.probability(limiter.current_base):
+                    blocks += 1
+                    for attempt in range(1, BLOCK_RECLICK_ATTEMPTS + 1):
+                        if attempt == BLOCK_RECLICK_ATTEMPTS:
+                            limiter.record_block()
+                        virtual_time += limiter.get_backoff_wait(attempt)
+                else:
+                    records += 1
+                    limiter.record_success()
+    finally:
+        random.setstate(state)
+
+    hours = virtual_time / 3600 if virtual_time else 1
+    return {
+        "policy": policy,
+        "params": params,
+        "records": records,
+        "blocks": blocks,
+        "virtual_hours": round(hours, 2),
+        "records_per_hour": round(records / hours, 1),
+        "block_rate": round(100.0 * blocks / n_requests, 3),  # blocks per 100 requests
+        "final_base": round(limiter.current_base, 2),
+    }
+
+
+def default_grid():
+    """Parameter grid around the current config.py values."""
+    return {
+        "default_base": sorted({config.RL_BASE_WAIT, 2.5, 3.0, 4.0}),
+        "penalty_add": sorted({config.RL_PENALTY_ADD, 5, 20}),
+        "recovery_step": sorted({config.RL_RECOVERY_STEP, 1, 5}),
+    }
+
+
+def run_grid(model, policies=("gradual", "aggressive", "aimd"), grid=None, n_requests=10000, seed=42):
+    grid = grid or default_grid()
+    keys = sorted(grid)
+    results = []
+    for policy in policies:
+        for combo in itertools.product(*(grid[k] for k in keys)):
+            params = dict(zip(keys, combo))
+            params["min_base"] = min(config.RL_MIN_WAIT, params.get("default_base", config.RL_MIN_WAIT))
+            results.append(simulate(policy, params, model, n_requests=n_requests, seed=seed))
+    return results
+
+
+def print_report(results, max_block_rate=None, top=15):
+    safe = [r for r in results if max_block_rate is None or r["block_rate"] <= max_block_rate]
+    safe.sort(key=lambda r: r["records_per_hour"], reverse=True)
+    print(f"\n=== Limiter Simulation: {len(safe)}/{len(results)} configs within block-rate budget ===")
+    print(f"{'policy':<11}{'base':>6}{'pen':>5}{'step':>5}{'rec/h':>9}{'blk/100':>9}{'hours':>8}")
+    for r in safe[:top]:
+        p = r["params"]
+        print(f"{r['policy']:<11}{p.get('default_base', 0):>6.1f}{p.get('penalty_add', 0):>5}{p.get('recovery_step', 0):>5}"
+              f"{r['records_per_hour']:>9.1f}{r['block_rate']:>9.3f}{r['virtual_hours']:>8.1f}")
+    if safe:
+        best = safe[0]
+        print(f"\n[Best] {best['policy']} {best['params']} -> {best['records_per_hour']} rec/h, {best['block_rate']} blocks/100 req")
+    return safe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline limiter policy simulator")
+    parser.add_argument("--log", default=BEHAVIOR_LOG)
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-block-rate", type=float, default=None, help="blocks per 100 requests")
+    parser.add_argument("--policies", default="gradual,aggressive,aimd", help="registered policy names (engine/rate_limiter.py)")
+    args = parser.parse_args()
+
+    model = BlockModel.fit(args.log)
+    print(model.describe())
+    results = run_grid(model, policies=[p.strip() for p in args.policies.split(",") if p.strip()],
+                       n_requests=args.requests, seed=args.seed)
+    print_report(results, max_block_rate=args.max_block_rate)
+
+
+if __name__ == "__main__":
+    main()
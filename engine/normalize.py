@@ -0,0 +1,263 @@
+"""
+Normalize - 统一的清洗 / 规范化模块（预编译正则 + 冻结查表 + 列式批处理）
+
+原先分散在 _extract_detail_fields（每个字段每行重建无效值集合、循环内 import re）、
+_scrape_with_details（重复的 .replace(" ", "")... 链）和 Storage.save_batch（get_val）里的规则集中到这里：
+- 标量 API: compact / normalize_label / clean_value / extract_prefix（逐条解析时使用）
+- 列式 API: clean_records / db_rows —— 把一页或整个归档按列处理，每列只对去重后的取值各清洗一次
+纯 Python 实现，不依赖 pandas / NumPy。
+
+基准测试:
+    python -m engine.normalize --bench 200000
+"""
+import argparse
+import random
+import re
+import time
+
+# ---------------------------------------------------------------------------
+# Precompiled patterns & frozen lookup tables
+# ---------------------------------------------------------------------------
+RE_PAREN_PREFIX = re.compile(r'^[\(（][^)）]*[\)）]')   # "(负责人)陈泓" -> "陈泓"
+RE_PAREN_SUFFIX = re.compile(r'[\(（][^)）]*[\)）]$')   # "罗焯(总公司)" -> "罗焯"
+RE_LICENSE_PREFIX = re.compile(r'^([^0-9()（）〈〉﹝﹞\[\]【】<>《》]+)')  # 匹配到括号或数字就停止
+RE_YEAR = re.compile(r'20\d\d|20[012]\d')
+
+INVALID_PERSON = frozenset({"无", "无此项", "无法人", "-", "/", "\\", "——", "—", "暂无", "无数据", "空", "null", "NULL", "N/A", "n/a"})
+INVALID_ADDRESS = frozenset({"无", "无此项", "暂无", "无数据", "不适用", "未填写", "-", "/", "//", "\\", "——", "—", ".", "null", "NULL", "N/A", "n/a"})
+INVALID_PAYLOAD = frozenset({"无", "***", "暂无", "空"})
+
+PERSON_FIELDS = frozenset({"legalRep", "resPerson"})
+ADDRESS_FIELDS = frozenset({"entAddress", "opAddress"})
+
+_DROP_WS = str.maketrans("", "", " \t\n")
+_DROP_LABEL = str.maketrans("", "", " 　：:\n")
+_DROP_COLONS = str.maketrans("", "", "：:")
+
+# Storage 列 ← 记录里的候选键（scraper 键名优先，兼容旧的下划线键名）
+DB_COLUMNS = (
+    ("enterprise_name", ("entName", "enterprise_name")),
+    ("legal_representative", ("legalRep", "legal_representative")),
+    ("actual_controller", ("actualController", "actual_controller")),
+    ("responsible_person", ("resPerson", "responsible_person")),
+    ("contact_phone", ("contactPhone", "contact_phone")),
+    ("operation_mode", ("opMode", "operation_mode")),
+    ("scope", ("scope",)),
+    ("address", ("entAddress", "address")),
+    ("operation_address", ("opAddress", "operation_address")),
+    ("filing_department", ("filingDept", "filing_department")),
+    ("license_number", ("licenseNum", "license_number")),
+    ("filing_date", ("filingDate", "filing_date")),
+)
+
+# 规范化去重键列（应用写入，与 compact() 完全一致）：键列 ← 源列
+DB_KEY_COLUMNS = (
+    ("license_key", "license_number"),
+    ("name_key", "enterprise_name"),
+)
+
+
+# ---------------------------------------------------------------------------
+# Scalar API
+# ---------------------------------------------------------------------------
+def compact(text):
+    """Strip and drop every space / tab / newline (list-page cells, DB dedupe keys)."""
+    return (text or "").strip().translate(_DROP_WS)
+
+
+def normalize_label(raw_label):
+    """Normalize label: Remove spaces, colons, newlines"""
+    return raw_label.translate(_DROP_LABEL).strip()
+
+
+def clean_person(val):
+    # 1. 去除括号前缀 / 后缀
+    val = RE_PAREN_PREFIX.sub('', val).strip()
+    val = RE_PAREN_SUFFIX.sub('', val).strip()
+    # 2. 过滤无效值；只要包含*就不存
+    if val in INVALID_PERSON or "*" in val:
+        return ""
+    return val
+
+
+def clean_address(val):
+    if val in INVALID_ADDRESS:
+        return ""
+    # 地址如果全是星号，或者包含 "*" 且长度极短 (<5)
+    if set(val) == {'*'} or ("*" in val and len(val) < 5):
+        return ""
+    if "无" in val and len(val) < 4 and "市" not in val and "县" not in val:
+        return ""
+    return val
+
+
+def clean_value(field_key, val):
+    """Field-level cleaning of one value."""
+    if field_key in PERSON_FIELDS:
+        return clean_person(val)
+    if field_key in ADDRESS_FIELDS:
+        return clean_address(val)
+    return val
+
+
+def is_valid_payload(val):
+    return bool(val and len(str(val).strip()) > 1 and str(val).strip() not in INVALID_PAYLOAD)
+
+
+def extract_prefix(lic_text):
+    """Regulator identifier of a license number (e.g. 京朝食药监械经营备), or None."""
+    if not lic_text:
+        return None
+    match = RE_LICENSE_PREFIX.match(lic_text)
+    if not match:
+        return None
+    # 去除空白与 "备案号：" 前缀 (爬虫有时会误把标签抓进来)
+    prefix = match.group(1).strip().translate(_DROP_WS).replace("备案号", "").translate(_DROP_COLONS)
+    # 去掉可能残留的年份部分
+    prefix = RE_YEAR.split(prefix, 1)[0].strip()
+    # 最终验证：长度>1 且 不只是通用后缀
+    if len(prefix) > 1 and prefix.replace('药监械经营备', '').replace('食', '').replace('市监械经营备', ''):
+        return prefix
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Columnar API
+# ---------------------------------------------------------------------------
+_MISSING = object()
+
+COLUMN_CLEANERS = {
+    "legalRep": clean_person,
+    "resPerson": clean_person,
+    "entAddress": clean_address,
+    "opAddress": clean_address,
+}
+
+
+def _map_unique(fn, column):
+    """Apply fn once per distinct value (cleaning columns repeat heavily: "无", "批发", ...)."""
+    table = {v: fn(v) for v in set(column)}
+    return [table[v] for v in column]
+
+
+def to_columns(records, fields=None):
+    if fields is None:
+        fields = []
+        seen = set()
+        for r in records:
+            for k in r:
+                if k not in seen:
+                    seen.add(k)
+                    fields.append(k)
+    return {f: [r.get(f, _MISSING) for r in records] for f in fields}
+
+
+def from_columns(columns, n):
+    out = [{} for _ in range(n)]
+    for field, col in columns.items():
+        for rec, v in zip(out, col):
+            if v is not _MISSING:
+                rec[field] = v
+    return out
+
+
+def clean_columns(columns):
+    """Clean {field: [raw values]} in place (missing cells stay missing)."""
+    for field, cleaner in COLUMN_CLEANERS.items():
+        col = columns.get(field)
+        if col is None:
+            continue
+        stripped = [v if v is _MISSING else str(v).strip() for v in col]
+        columns[field] = _map_unique(lambda v: v if v is _MISSING else cleaner(v), stripped)
+    return columns
+
+
+def clean_records(records):
+    """Columnar cleaning of a whole page / archive batch. Returns new dicts; key sets are preserved."""
+    if not records:
+        return []
+    return from_columns(clean_columns(to_columns(records)), len(records))
+
+
+def db_key(value):
+    """Normalized dedupe key of a license number / enterprise name (None when empty)."""
+    return compact(value) or None
+
+
+def db_rows(records, keys=False):
+    """
+    Records → tuples in DB_COLUMNS order; empty strings become NULL, aliases fall back in order.
+    keys=True appends the DB_KEY_COLUMNS values.
+    """
+    columns = []
+    for _, aliases in DB_COLUMNS:
+        col = [None] * len(records)
+        for key in reversed(aliases):  # 优先键最后写入，覆盖兼容键
+            for i, rec in enumerate(records):
+                v = rec.get(key)
+                if v is not None:
+                    v = str(v).strip()
+                    if v:
+                        col[i] = v
+        columns.append(col)
+    if keys:
+        position = {name: i for i, (name, _) in enumerate(DB_COLUMNS)}
+        for _, source in DB_KEY_COLUMNS:
+            columns.append(_map_unique(db_key, columns[position[source]]))
+    return list(zip(*columns))
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+_SAMPLE = {
+    "legalRep": ["张三", "(负责人)陈泓", "罗焯(总公司)", "无", "***", "李四", "/", "王五"],
+    "resPerson": ["赵六", "无此项", "钱七", "孙八(法人)", "—"],
+    "entAddress": ["上海市浦东新区张江路 100 号", "无", "***", "暂无", "北京市朝阳区建国路 1 号", "无地址"],
+    "opAddress": ["上海市徐汇区漕溪北路 88 号", "不适用", "-", "广州市天河区天河路 385 号"],
+    "opMode": ["批发", "零售", "批零兼营"],
+    "scope": ["第二类医疗器械：6815 注射穿刺器械", "第二类医疗器械（不含体外诊断试剂）"],
+}
+
+
+def _synthetic(n, seed=7):
+    rng = random.Random(seed)
+    return [
+        {**{k: rng.choice(v) for k, v in _SAMPLE.items()},
+         "entName": f"测试医疗器械有限公司{i}", "licenseNum": f"沪浦食药监械经营备{2014 + i % 10}{i:05d}号"}
+        for i in range(n)
+    ]
+
+
+def bench(n=100000):
+    records = _synthetic(n)
+
+    t0 = time.perf_counter()
+    for r in records:
+        {k: clean_value(k, str(v).strip()) for k, v in r.items()}
+    per_record = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    clean_records(records)
+    columnar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    db_rows(records)
+    to_db = time.perf_counter() - t0
+
+    print(f"[Normalize] {n} records")
+    print(f"  per-record clean : {n / per_record:>12,.0f} records/s")
+    print(f"  columnar clean   : {n / columnar:>12,.0f} records/s")
+    print(f"  db_rows          : {n / to_db:>12,.0f} records/s")
+    return {"per_record": n / per_record, "columnar": n / columnar, "db_rows": n / to_db}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalization benchmark")
+    parser.add_argument("--bench", type=int, default=100000, help="number of synthetic records")
+    args = parser.parse_args()
+    bench(args.bench)
+
+
+if __name__ == "__main__":
+    main()
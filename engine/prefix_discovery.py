@@ -0,0 +1,205 @@
+"""
+Prefix Discovery - 发证机关前缀的发现、统计与入队裁剪
+
+原先每一行都跑两次正则 + 一串 replace，发现的前缀一律插到 main.py 队首，不知道能带来多少新记录。
+这里：
+- extract(): 预编译提取器（engine/normalize.py）+ LRU 缓存（同一页的编号前缀高度重复）
+- 持久化前缀表 prefixes(prefix, seen, new_rows, first_seen, last_seen, origin, status, folded_into)
+- should_enqueue(): 只放行 "预计能带来新覆盖" 的前缀
+    * 已被完整翻完的更短关键词覆盖（站点按包含匹配：搜 K 的结果包含所有含 K 的编号）→ 折叠，不入队
+      只有 search() 报告一直翻到最后一页的关键词才算（exhaustive 表）：被覆盖率估计 / 增量游标提前停、
+      按年份拆分（2014 年前的编号没搜）、超 1000 页的关键词都不算；还在队列里没搜的关键词也不算
+    * 样本足够且几乎全是库内重复 → 视为已覆盖，不入队
+- fold_supersets(): 新前缀入队后，队列中包含它的更长动态关键词（结果是其子集）暂时移出队列；
+  新前缀没能翻完时 unfold() 把它们放回队列
+"""
+import functools
+import json
+import os
+import sqlite3
+import time
+
+from engine.normalize import extract_prefix
+
+DEFAULT_TABLE = "resources/prefix_table.db"
+OVERFLOW_LOG = "logs/overflow_keywords.jsonl"
+MIN_COVER_LEN = 2  # 太短的关键词（单字）不作为覆盖依据
+
+
+class PrefixDiscovery:
+    def __init__(self, path=DEFAULT_TABLE, min_samples=20, skip_hit_ratio=0.98, overflow_log=OVERFLOW_LOG):
+        self.path = path
+        self.min_samples = min_samples
+        self.skip_hit_ratio = skip_hit_ratio
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # fleet 的多个 worker 共用同一个表
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS prefixes (
+                prefix      TEXT PRIMARY KEY,
+                seen        INTEGER NOT NULL DEFAULT 0,   -- 列表中出现的行数（含重复）
+                new_rows    INTEGER NOT NULL DEFAULT 0,   -- 其中不在库里的行数
+                dup_rows    INTEGER NOT NULL DEFAULT 0,
+                first_seen  REAL,
+                last_seen   REAL,
+                origin      TEXT,                         -- 第一次在哪个关键词下发现
+                status      TEXT NOT NULL DEFAULT 'candidate',  -- candidate / enqueued / covered / saturated / folded
+                folded_into TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS exhaustive (
+                keyword     TEXT PRIMARY KEY,             -- 一直翻到最后一页的关键词（可作为覆盖依据）
+                pages       INTEGER,
+                searched_at REAL
+            )
+        """)
+        self.conn.commit()
+        self.exhaustive = {row[0] for row in self.conn.execute("SELECT keyword FROM exhaustive")}
+        self.incomplete = self._load_incomplete(overflow_log)
+        self._pending = {}  # prefix -> [seen, new, dup, origin]
+        self.extract = functools.lru_cache(maxsize=4096)(extract_prefix)
+        self.decisions = {"enqueued": 0, "covered": 0, "saturated": 0, "folded": 0}
+
+    @staticmethod
+    def _load_incomplete(overflow_log):
+        """Keywords that hit the 1000-page limit: their results do not cover their supersets."""
+        out = set()
+        if os.path.exists(overflow_log):
+            try:
+                with open(overflow_log, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try: out.add(json.loads(line)["keyword"])
+                        except Exception: continue
+            except Exception:
+                pass
+        return out
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+    def observe(self, lic_text, keyword=None, duplicate=None):
+        """Count one list row. duplicate=None means unknown (dedupe skipped). Returns the prefix or None."""
+        prefix = self.extract(lic_text) if lic_text else None
+        if not prefix:
+            return None
+        entry = self._pending.setdefault(prefix, [0, 0, 0, keyword])
+        entry[0] += 1
+        if duplicate is False:
+            entry[1] += 1
+        elif duplicate:
+            entry[2] += 1
+        return prefix
+
+    def flush(self):
+        """Write accumulated counts (call once per page)."""
+        if not self._pending:
+            return
+        now = time.time()
+        rows = [(p, s, n, d, now, now, origin) for p, (s, n, d, origin) in self._pending.items()]
+        try:
+            self.conn.executemany(
+                "INSERT INTO prefixes (prefix, seen, new_rows, dup_rows, first_seen, last_seen, origin) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(prefix) DO UPDATE SET seen=seen+excluded.seen, new_rows=new_rows+excluded.new_rows, "
+                "dup_rows=dup_rows+excluded.dup_rows, last_seen=excluded.last_seen", rows)
+            self.conn.commit()
+            self._pending = {}
+        except Exception as e:
+            print(f"[Discovery] Could not update prefix table: {e}")
+
+    def stats_of(self, prefix):
+        row = self.conn.execute(
+            "SELECT seen, new_rows, dup_rows, status FROM prefixes WHERE prefix=?", (prefix,)).fetchone()
+        seen, new, dup, status = row if row else (0, 0, 0, None)
+        pending = self._pending.get(prefix)
+        if pending:
+            seen, new, dup = seen + pending[0], new + pending[1], dup + pending[2]
+        return {"seen": seen, "new": new, "dup": dup, "status": status}
+
+    def _set_status(self, prefix, status, folded_into=None):
+        try:
+            self.conn.execute(
+                "INSERT INTO prefixes (prefix, status, folded_into, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(prefix) DO UPDATE SET status=excluded.status, folded_into=excluded.folded_into",
+                (prefix, status, folded_into, time.time(), time.time()))
+            self.conn.commit()
+        except Exception:
+            pass
+        self.decisions[status] = self.decisions.get(status, 0) + 1
+
+    # ------------------------------------------------------------------
+    # Pruning
+    # ------------------------------------------------------------------
+    def mark_exhaustive(self, keyword, pages=None):
+        """Record that `keyword` was paged to its last page (only such keywords count as covering)."""
+        self.exhaustive.add(keyword)
+        try:
+            self.conn.execute(
+                "INSERT INTO exhaustive (keyword, pages, searched_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(keyword) DO UPDATE SET pages=excluded.pages, searched_at=excluded.searched_at",
+                (keyword, pages, time.time()))
+            self.conn.commit()
+        except Exception as e:
+            print(f"[Discovery] Could not record exhaustive keyword: {e}")
+
+    def covering_keyword(self, prefix):
+        """An exhaustively searched keyword contained in `prefix` (its results already include every row of prefix)."""
+        for kw in self.exhaustive:
+            if kw != prefix and len(kw) >= MIN_COVER_LEN and kw in prefix and kw not in self.incomplete:
+                return kw
+        return None
+
+    def worth_searching(self, prefix):
+        """Stats-only check: False if enough rows were sampled and nearly all were already in the DB."""
+        s = self.stats_of(prefix)
+        judged = s["new"] + s["dup"]
+        return not (judged >= self.min_samples and s["dup"] / judged >= self.skip_hit_ratio)
+
+    def should_enqueue(self, prefix, queue, searched):
+        """Decide for one harvested prefix. Returns (enqueue?, reason)."""
+        if prefix in searched or prefix in queue:
+            return False, "known"
+        cover = self.covering_keyword(prefix)
+        if cover:
+            self._set_status(prefix, "covered", cover)
+            return False, f"covered by '{cover}'"
+        if not self.worth_searching(prefix):
+            self._set_status(prefix, "saturated")
+            s = self.stats_of(prefix)
+            return False, f"saturated ({s['dup']}/{s['new'] + s['dup']} rows already in DB)"
+        self._set_status(prefix, "enqueued")
+        return True, "new"
+
+    def fold_supersets(self, prefix, queue, protected=()):
+        """
+        Take queued keywords that contain `prefix` out of the queue (searching prefix returns all their rows).
+        They stay recorded as folded into `prefix` until it is searched: call unfold() if it was not exhaustive.
+        """
+        folded = [k for k in queue if k != prefix and prefix in k and k not in protected]
+        for k in folded:
+            queue.remove(k)
+            self._set_status(k, "folded", prefix)
+        return folded
+
+    def unfold(self, prefix):
+        """Keywords folded into `prefix` (to be queued again because prefix stopped before its last page)."""
+        try:
+            rows = [r[0] for r in self.conn.execute(
+                "SELECT prefix FROM prefixes WHERE status='folded' AND folded_into=?", (prefix,))]
+            self.conn.execute(
+                "UPDATE prefixes SET status='enqueued', folded_into=NULL WHERE status='folded' AND folded_into=?", (prefix,))
+            self.conn.commit()
+            return rows
+        except Exception as e:
+            print(f"[Discovery] Could not restore folded keywords: {e}")
+            return []
+
+    def report(self):
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM prefixes GROUP BY status").fetchall()
+        return {"table": dict(rows), "session": dict(self.decisions), "extract_cache": self.extract.cache_info()._asdict()}
+
+    def close(self):
+        self.flush()
+        try: self.conn.close()
+        except: pass
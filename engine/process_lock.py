@@ -1,64 +1,97 @@
 """
-Process Lock Utility - Prevents Multiple Instances
+Process Lock Utility - OS-level exclusive file lock
 
-使用文件锁确保同一时间只有一个采集器实例运行
+使用 fcntl.flock（Windows 下用 msvcrt.locking）对锁文件加排他锁：
+- 加锁是原子的，不存在 "先检查是否存在再写入" 的竞争
+- 进程崩溃 / 被杀时操作系统自动释放锁，无需 2 小时僵尸锁判定
+- 长时间正常运行的进程永远不会被误删锁
+
+关键词级别的并发控制由 engine/work_queue.py 的租约负责，这里只保护单个文件（如 checkpoint）的独占写入。
 """
 import os
 import sys
 import time
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
 class ProcessLock:
     def __init__(self, lock_file="resources/scraper.lock"):
         self.lock_file = lock_file
         self.acquired = False
-        
+        self._fh = None
+
     def acquire(self):
-        """尝试获取锁"""
-        if os.path.exists(self.lock_file):
-            # 检查锁文件的创建时间
-            lock_time = os.path.getmtime(self.lock_file)
-            age = time.time() - lock_time
-            
-            # 如果锁文件超过 2 小时，认为是僵尸锁（程序异常退出）
-            if age > 7200:
-                print(f"[ProcessLock] Found stale lock file (age: {age:.0f}s). Removing...")
-                try:
-                    os.remove(self.lock_file)
-                except:
-                    pass
-            else:
-                print(f"[ERROR] Another scraper instance is already running!")
-                print(f"[ERROR] Lock file: {os.path.abspath(self.lock_file)}")
-                print(f"[ERROR] If you're sure no other instance is running, delete the lock file manually.")
-                return False
-        
-        # 创建锁文件
+        """尝试获取锁（非阻塞）"""
         try:
-            os.makedirs(os.path.dirname(self.lock_file), exist_ok=True)
-            with open(self.lock_file, 'w') as f:
-                f.write(f"PID: {os.getpid()}\n")
-                f.write(f"Started: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            self.acquired = True
-            print(f"[ProcessLock] Lock acquired: {self.lock_file}")
-            return True
+            os.makedirs(os.path.dirname(self.lock_file) or ".", exist_ok=True)
+            fh = open(self.lock_file, "a+")
         except Exception as e:
-            print(f"[ERROR] Failed to create lock file: {e}")
+            print(f"[ERROR] Failed to open lock file: {e}")
+            return False
+
+        try:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            holder = ""
+            try:
+                fh.seek(0)
+                holder = fh.read().strip().replace("\n", ", ")
+            except Exception:
+                pass
+            fh.close()
+            print(f"[ERROR] Another scraper instance is already running!")
+            print(f"[ERROR] Lock file: {os.path.abspath(self.lock_file)} ({holder or 'holder unknown'})")
             return False
-    
+
+        # 写入持有者信息（仅供排查，锁本身由 OS 维护）
+        try:
+            fh.seek(0)
+            fh.truncate()
+            fh.write(f"PID: {os.getpid()}\n")
+            fh.write(f"Started: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            fh.flush()
+        except Exception:
+            pass
+        self._fh = fh
+        self.acquired = True
+        print(f"[ProcessLock] Lock acquired: {self.lock_file}")
+        return True
+
     def release(self):
         """释放锁"""
-        if self.acquired and os.path.exists(self.lock_file):
-            try:
-                os.remove(self.lock_file)
-                print(f"[ProcessLock] Lock released: {self.lock_file}")
-            except Exception as e:
-                print(f"[Warning] Failed to remove lock file: {e}")
+        if not self.acquired or not self._fh:
+            return
+        try:
+            # 不删除锁文件：删除后其它进程可能锁住已被 unlink 的旧 inode
+            self._fh.seek(0)
+            self._fh.truncate()
+            if fcntl:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+            else:
+                self._fh.seek(0)
+                msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+            print(f"[ProcessLock] Lock released: {self.lock_file}")
+        except Exception as e:
+            print(f"[Warning] Failed to release lock file: {e}")
+        finally:
+            try: self._fh.close()
+            except: pass
+            self._fh = None
             self.acquired = False
-    
+
     def __enter__(self):
         if not self.acquire():
             sys.exit(1)
         return self
-    
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.release()
@@ -3,10 +3,213 @@ import random
 import json
 import os
 
+
+# ════════════════════════════════════════════════════════════════
+# Policy Registry
+# 限速核心 (SmartRateLimiter) 只负责状态/日志/持久化；
+# "成功后怎么提速、被封后怎么降速" 交给可插拔的 Policy。
+# ════════════════════════════════════════════════════════════════
+LIMITER_POLICIES = {}
+
+
+def register_policy(name):
+    """Class decorator: register a LimiterPolicy subclass under `name`."""
+    def decorator(cls):
+        cls.name = name
+        LIMITER_POLICIES[name] = cls
+        return cls
+    return decorator
+
+
+def create_policy(policy, **kwargs):
+    """Accept a registered name or an already-built policy object."""
+    if isinstance(policy, LimiterPolicy):
+        return policy
+    if policy not in LIMITER_POLICIES:
+        raise ValueError(f"Unknown limiter policy '{policy}'. Available: {sorted(LIMITER_POLICIES)}")
+    return LIMITER_POLICIES[policy](**kwargs)
+
+
+class LimiterPolicy:
+    """Base policy: linear penalty on block, no recovery."""
+    name = "base"
+
+    def __init__(self, first_penalty_floor=None):
+        # 首犯直接拉到该值（None = 不设下限，纯 penalty_add 步进）
+        self.first_penalty_floor = first_penalty_floor
+
+    @property
+    def label(self):
+        return self.name.upper()
+
+    def on_success(self, limiter):
+        pass
+
+    def on_block(self, limiter):
+        if self.first_penalty_floor and limiter.current_base < self.first_penalty_floor:
+            limiter.current_base = self.first_penalty_floor
+        else:
+            limiter.current_base = min(limiter.max_base, limiter.current_base + limiter.penalty_add)
+
+    def describe(self):
+        return {"policy": self.name, "first_penalty_floor": self.first_penalty_floor}
+
+
+@register_policy("gradual")
+class GradualPolicy(LimiterPolicy):
+    """渐进式恢复：每 10 次成功减 recovery_step×倍率，回到默认后再缓慢试探提速。"""
+
+    def on_success(self, limiter):
+        # 1. Elastic Recovery (Accelerated Healing)
+        # If we are currently slower than default (punished state)
+        if limiter.current_base > limiter.default_base and limiter.consecutive_success % 10 == 0:
+            old_base = limiter.current_base
+
+            # Dynamic Step: The longer we are safe, the bolder we get.
+            # We use the config value as the "Base Unit".
+            multiplier = 1
+            if limiter.consecutive_success >= 50:
+                multiplier = 5 # Aggressive healing
+            elif limiter.consecutive_success >= 20:
+                multiplier = 2 # Moderate healing
+
+            current_step = limiter.recovery_step * multiplier
+
+            limiter.current_base = max(limiter.default_base, limiter.current_base - current_step)
+            print(f"[RateLimiter] Elastic Recovery (Streak {limiter.consecutive_success}): Reducing base wait by {current_step}s ({multiplier}x speed) to {limiter.current_base:.2f}s")
+
+            limiter._log({
+                "event": "recovery",
+                "streak": limiter.consecutive_success,
+                "step_size": current_step,
+                "old_base": round(old_base, 2),
+                "new_base": round(limiter.current_base, 2)
+            })
+
+        # 2. Probing (Speed Up)
+        if limiter.current_base <= limiter.default_base and limiter.consecutive_success > 50 and limiter.consecutive_success % 20 == 0:
+            new_target = max(limiter.min_base, limiter.current_base - 0.5)
+            if new_target < limiter.current_base:
+                limiter.current_base = new_target
+                print(f"[RateLimiter] Speed Probe: Accelerating! New base wait: {limiter.current_base:.2f}s")
+                limiter._log({
+                    "event": "speed_up",
+                    "new_base": round(limiter.current_base, 2)
+                })
+
+
+@register_policy("aggressive")
+class AggressivePolicy(LimiterPolicy):
+    """🧪 激进恢复：连续成功 reset_streak 次后立即重置到默认速度；首犯直接拉到 30 秒。"""
+
+    def __init__(self, first_penalty_floor=30.0, reset_streak=10):
+        super().__init__(first_penalty_floor=first_penalty_floor)
+        self.reset_streak = reset_streak
+
+    def on_success(self, limiter):
+        # 快速恢复策略：连续成功10次后立即重置到默认速度
+        # 🚫 不做额外加速 - 2.2秒会触发Block，保持默认速度更安全
+        if limiter.current_base > limiter.default_base and limiter.consecutive_success >= self.reset_streak:
+            old_base = limiter.current_base
+            limiter.current_base = limiter.default_base
+            print(f"[🧪 Aggressive Recovery] {self.reset_streak} wins in a row! INSTANT reset: {old_base:.2f}s → {limiter.current_base:.2f}s")
+
+            limiter._log({
+                "event": "AGGRESSIVE_RESET",
+                "streak": limiter.consecutive_success,
+                "old_base": round(old_base, 2),
+                "new_base": round(limiter.current_base, 2)
+            })
+
+    def describe(self):
+        return {**super().describe(), "reset_streak": self.reset_streak}
+
+
+@register_policy("aimd")
+class AIMDPolicy(LimiterPolicy):
+    """
+    TCP 式 AIMD：每 `window` 次成功把等待减少 `decrease` 秒（加性提速），
+    被封时等待乘以 `factor`（乘性降速）。
+    """
+
+    def __init__(self, decrease=0.2, window=10, factor=2.0):
+        super().__init__()
+        self.decrease = decrease
+        self.window = window
+        self.factor = factor
+
+    def on_success(self, limiter):
+        if limiter.consecutive_success % self.window == 0 and limiter.current_base > limiter.min_base:
+            old_base = limiter.current_base
+            limiter.current_base = max(limiter.min_base, limiter.current_base - self.decrease)
+            limiter._log({
+                "event": "recovery",
+                "streak": limiter.consecutive_success,
+                "step_size": self.decrease,
+                "old_base": round(old_base, 2),
+                "new_base": round(limiter.current_base, 2)
+            })
+
+    def on_block(self, limiter):
+        limiter.current_base = min(limiter.max_base, max(limiter.current_base * self.factor, limiter.default_base + limiter.penalty_add))
+
+    def describe(self):
+        return {**super().describe(), "decrease": self.decrease, "window": self.window, "factor": self.factor}
+
+
+@register_policy("time_of_day")
+class TimeOfDayPolicy(LimiterPolicy):
+    """
+    按小时切换 default_base（schedule: {hour: base}），具体恢复/惩罚委托给 inner 策略。
+    未配置的小时使用构造时的 default_base。
+    """
+
+    def __init__(self, schedule=None, inner="gradual"):
+        super().__init__()
+        self.schedule = {int(h): float(b) for h, b in (schedule or {}).items()}
+        self.inner = create_policy(inner)
+        self._base_default = None
+
+    @property
+    def label(self):
+        return f"TOD/{self.inner.label}"
+
+    def apply_schedule(self, limiter, hour=None):
+        if self._base_default is None:
+            self._base_default = limiter.default_base
+        hour = time.localtime().tm_hour if hour is None else hour
+        target = self.schedule.get(hour, self._base_default)
+        if abs(target - limiter.default_base) > 1e-9:
+            old_default = limiter.default_base
+            limiter.default_base = target
+            # 当前未受罚（没比旧默认慢）时直接跟随新窗口的速度
+            if limiter.current_base <= old_default:
+                limiter.current_base = max(limiter.min_base, target)
+            limiter._log({"event": "schedule", "hour": hour, "old_default": round(old_default, 2), "new_default": round(target, 2)})
+
+    def on_success(self, limiter):
+        self.apply_schedule(limiter)
+        self.inner.on_success(limiter)
+
+    def on_block(self, limiter):
+        self.apply_schedule(limiter)
+        self.inner.on_block(limiter)
+
+    def describe(self):
+        return {**super().describe(), "inner": self.inner.describe(), "schedule": self.schedule}
+
+
 class SmartRateLimiter:
-    def __init__(self, default_base=45, min_base=20, max_base=120, penalty_add=20, recovery_step=1, log_path="logs/scraper_behavior.jsonl"):
+    def __init__(self, default_base=45, min_base=20, max_base=120, penalty_add=20, recovery_step=1, log_path="logs/scraper_behavior.jsonl",
+                 policy="gradual", state_file=None, state_max_age=6 * 3600, aggressive_recovery=None):
         """
         Smart Adaptive Rate Limiter (PID-like Control).
+
+        Args:
+            policy: registered policy name ("gradual" / "aggressive" / "aimd" / "time_of_day") or a LimiterPolicy object.
+            state_file: If set, state is restored from / persisted to this JSON file so a restart
+                        after a punished session does not start from default_base again.
+            aggressive_recovery: Legacy switch (True -> "aggressive" policy).
         """
         self.default_base = default_base
         self.current_base = default_base
@@ -15,21 +218,36 @@ class SmartRateLimiter:
         self.penalty_add = penalty_add
         self.recovery_step = recovery_step
         self.log_path = log_path
-        
+        self.state_file = state_file
+        self.state_max_age = state_max_age
+
+        if aggressive_recovery is not None:
+            policy = "aggressive" if aggressive_recovery else policy
+        self.policy = create_policy(policy)
+
         # State
         self.consecutive_success = 0
         self.total_requests = 0
         self.last_adjustment_time = time.time()
         self.blocks_today = 0
-        
+
         # Ensure log header
         self._log({
-            "event": "session_start", 
+            "event": "session_start",
             "config": {
-                "default": default_base, "penalty": penalty_add
+                "default": default_base,
+                "penalty": penalty_add,
+                **self.policy.describe()
             }
         })
 
+        if self.state_file:
+            self.load_state()
+
+    @property
+    def aggressive_recovery(self):
+        return self.policy.name == "aggressive"
+
     def _log(self, data):
         """Append structured log for future AI analysis."""
         try:
@@ -50,64 +268,38 @@ class SmartRateLimiter:
         # Jitter: +/- 10%
         jitter = random.uniform(0.9, 1.1)
         actual_delay = self.current_base * jitter
-        
-        # Log this sleep event (optional, might be too verbose, but good for analysis)
-        # self._log({"event": "sleep", "duration": round(actual_delay, 2), "base": round(self.current_base, 2)})
-        
+
         return actual_delay
 
+    def set_policy(self, policy, **kwargs):
+        """Hot-swap the recovery/penalty policy without losing current state."""
+        old_label = self.policy.label
+        self.policy = create_policy(policy, **kwargs)
+        print(f"[RateLimiter] Policy switched: {old_label} → {self.policy.label}")
+        self._log({"event": "policy_switch", "old": old_label, **self.policy.describe()})
+
     def record_success(self):
         """
         Call this when a page loads successfully.
         """
         self.consecutive_success += 1
         self.total_requests += 1
-        
+
         # Log basic heartbeat every 10 requests to keep file size manageable
         if self.total_requests % 10 == 0:
             self._log({
-                "event": "heartbeat", 
-                "total_req": self.total_requests, 
+                "event": "heartbeat",
+                "total_req": self.total_requests,
                 "current_base": round(self.current_base, 2),
-                "streak": self.consecutive_success
-            })
-        
-        # 1. Elastic Recovery (Accelerated Healing)
-        # If we are currently slower than default (punished state)
-        if self.current_base > self.default_base and self.consecutive_success % 10 == 0:
-            old_base = self.current_base
-            
-            # Dynamic Step: The longer we are safe, the bolder we get.
-            # We use the config value as the "Base Unit".
-            multiplier = 1
-            if self.consecutive_success >= 50:
-                multiplier = 5 # Aggressive healing
-            elif self.consecutive_success >= 20:
-                multiplier = 2 # Moderate healing
-                
-            current_step = self.recovery_step * multiplier
-            
-            self.current_base = max(self.default_base, self.current_base - current_step)
-            print(f"[RateLimiter] Elastic Recovery (Streak {self.consecutive_success}): Reducing base wait by {current_step}s ({multiplier}x speed) to {self.current_base:.2f}s")
-            
-            self._log({
-                "event": "recovery", 
                 "streak": self.consecutive_success,
-                "step_size": current_step,
-                "old_base": round(old_base, 2),
-                "new_base": round(self.current_base, 2)
+                "mode": self.policy.label
             })
 
-        # 2. Probing (Speed Up)
-        if self.current_base <= self.default_base and self.consecutive_success > 50 and self.consecutive_success % 20 == 0:
-            new_target = max(self.min_base, self.current_base - 0.5)
-            if new_target < self.current_base:
-                self.current_base = new_target
-                print(f"[RateLimiter] Speed Probe: Accelerating! New base wait: {self.current_base:.2f}s")
-                self._log({
-                    "event": "speed_up", 
-                    "new_base": round(self.current_base, 2)
-                })
+        old_base = self.current_base
+        self.policy.on_success(self)
+        if self.current_base != old_base:
+            self.last_adjustment_time = time.time()
+            self.save_state()
 
     def record_block(self):
         """
@@ -115,21 +307,23 @@ class SmartRateLimiter:
         """
         self.consecutive_success = 0
         self.blocks_today += 1
-        
+
         old_base = self.current_base
-        # Penalty: Add seconds
-        self.current_base = min(self.max_base, self.current_base + self.penalty_add)
-        
-        print(f"[RateLimiter] BLOCK DETECTED! Penalty applied.")
+        self.policy.on_block(self)
+        self.last_adjustment_time = time.time()
+
+        print(f"[RateLimiter {self.policy.label}] BLOCK DETECTED! Penalty applied.")
         print(f"[RateLimiter] Adjustment: {old_base:.2f}s -> {self.current_base:.2f}s")
-        
+
         self._log({
-            "event": "BLOCK", 
+            "event": "BLOCK",
             "old_base": round(old_base, 2),
             "new_base": round(self.current_base, 2),
-            "total_blocks": self.blocks_today
+            "total_blocks": self.blocks_today,
+            "mode": self.policy.label
         })
-        
+        self.save_state()
+
     def get_backoff_wait(self, attempt):
         """
         Calculates the specific wait time for the persistent retry loop.
@@ -140,3 +334,74 @@ class SmartRateLimiter:
         increment = attempt * 10
         jitter = random.uniform(0, 4)
         return base + increment + jitter
+
+    # ════════════════════════════════════════════════════════════════
+    # State API: reset / snapshot / restore (+ JSON persistence)
+    # ════════════════════════════════════════════════════════════════
+    def reset(self):
+        """Back to default speed (e.g. after a meltdown recovery with fresh cookies)."""
+        old_base = self.current_base
+        self.current_base = self.default_base
+        self.consecutive_success = 0
+        self.last_adjustment_time = time.time()
+        self._log({"event": "reset", "old_base": round(old_base, 2), "new_base": round(self.current_base, 2)})
+        self.save_state()
+
+    def snapshot(self):
+        return {
+            "saved_at": int(time.time()),
+            "policy": self.policy.name,
+            "default_base": self.default_base,
+            "current_base": self.current_base,
+            "consecutive_success": self.consecutive_success,
+            "total_requests": self.total_requests,
+            "blocks_today": self.blocks_today,
+            "last_adjustment_time": self.last_adjustment_time,
+        }
+
+    def restore(self, snap):
+        """Restore counters and current_base (policy/default_base stay as configured)."""
+        self.current_base = min(self.max_base, max(self.min_base, float(snap.get("current_base", self.default_base))))
+        self.consecutive_success = int(snap.get("consecutive_success", 0))
+        self.total_requests = int(snap.get("total_requests", 0))
+        self.blocks_today = int(snap.get("blocks_today", 0))
+        self.last_adjustment_time = float(snap.get("last_adjustment_time", time.time()))
+
+    def save_state(self, path=None):
+        path = path or self.state_file
+        if not path:
+            return
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(f"[RateLimiter] Failed to save state: {e}")
+
+    def load_state(self, path=None):
+        path = path or self.state_file
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                snap = json.load(f)
+        except Exception as e:
+            print(f"[RateLimiter] Failed to load state: {e}")
+            return False
+
+        age = time.time() - snap.get("saved_at", 0)
+        if age > self.state_max_age:
+            print(f"[RateLimiter] Saved state is {age/3600:.1f}h old. Starting fresh from {self.default_base:.2f}s.")
+            return False
+        if snap.get("default_base") != self.default_base:
+            # RL_BASE_WAIT changed since last run -> only carry over a punished base
+            snap["consecutive_success"] = 0
+        self.restore(snap)
+        # 当天的 blocks 计数跨天不继承
+        if time.strftime("%Y-%m-%d", time.localtime(snap.get("saved_at", 0))) != time.strftime("%Y-%m-%d"):
+            self.blocks_today = 0
+        print(f"[RateLimiter] Restored state from {path}: base {self.current_base:.2f}s (streak {self.consecutive_success}, saved {age/60:.0f} min ago)")
+        self._log({"event": "state_restored", "current_base": round(self.current_base, 2), "age_s": int(age)})
+        return True
@@ -0,0 +1,164 @@
+"""
+Archive Replay - 用当前解析/清洗规则重跑本地归档（零网络）
+
+修改 engine/normalize.py 的清洗规则或前缀正则后：
+- 对每个许可证编号的最新详情快照重新解析 → 合并列表信息 → 校验 → 批量写入所属类别的表（engine/categories.py）
+- 对全部列表页快照重新提取前缀，输出新发现的关键词（可选追加到该类别 checkpoint 的 pending）
+
+用法:
+    python -m engine.replay                      # 重解析并入库（逐个已配置类别）
+    python -m engine.replay --category licensed  # 只重放一个类别
+    python -m engine.replay --dry-run            # 只统计，不写库
+    python -m engine.replay --export out.jsonl   # 导出重解析结果
+    python -m engine.replay --prefixes --enqueue # 重新发现前缀并加入 checkpoint pending
+"""
+import argparse
+import json
+import os
+import time
+
+import config
+from engine.archive import ResponseArchive, DEFAULT_ARCHIVE
+from engine.categories import load_categories
+from engine.detail_parser import parse_detail_pairs, has_detail_payload, merge_list_info
+from engine.normalize import clean_records, extract_prefix
+
+CHECKPOINT_FILE = os.environ.get("SCRAPER_CHECKPOINT", "resources/scraper_checkpoint.json")
+
+
+def raw_record(blob):
+    """One archived detail capture → uncleaned detail dict (cleaning happens per batch, column-wise)."""
+    if blob.get("pairs"):
+        return parse_detail_pairs(blob["pairs"], clean=False)
+    return {k: v for k, v in (blob.get("fields") or {}).items()}
+
+
+def finish_records(blobs, detail_items):
+    """Validate + merge a cleaned batch exactly like the live scraper does. Returns (records, dropped)."""
+    records, dropped = [], 0
+    for blob, detail_item in zip(blobs, detail_items):
+        if blob.get("pairs") and not detail_item.get("legalRep") and not detail_item.get("resPerson"):
+            dropped += 1  # 与 _extract_detail_fields 的最终校验一致
+            continue
+        final_item = merge_list_info(detail_item, blob.get("base_info") or {})
+        if has_detail_payload(final_item):
+            records.append(final_item)
+        else:
+            dropped += 1
+    return records, dropped
+
+
+def replay_details(archive, sink=None, batch_size=500, since=0.0, category=None):
+    """Re-parse every license's latest detail capture (of one category); sink(batch) receives lists of records."""
+    stats = {"captures": 0, "records": 0, "dropped": 0, "saved": 0}
+    blobs = []
+    started = time.time()
+
+    def flush():
+        records, dropped = finish_records(blobs, clean_records([raw_record(b) for b in blobs]))
+        stats["records"] += len(records)
+        stats["dropped"] += dropped
+        if sink and records:
+            stats["saved"] += sink(records) or 0
+        blobs.clear()
+
+    cat_id, primary = (category["id"], category.get("primary", False)) if category else (None, False)
+    for _, blob in archive.iter_latest("detail", since=since, category=cat_id, primary=primary):
+        stats["captures"] += 1
+        blobs.append(blob)
+        if len(blobs) >= batch_size:
+            flush()
+            rate = stats["captures"] / max(time.time() - started, 1e-6)
+            print(f"[Replay] {stats['captures']} captures ({rate:.0f}/s), {stats['records']} records, {stats['dropped']} dropped")
+    if blobs:
+        flush()
+    stats["seconds"] = round(time.time() - started, 1)
+    return stats
+
+
+def replay_prefixes(archive, category=None):
+    """All regulator prefixes found in archived list pages (of one category) under the current regex."""
+    prefixes = set()
+    cat_id, primary = (category["id"], category.get("primary", False)) if category else (None, False)
+    for blob in archive.iter_blobs("list", category=cat_id, primary=primary):
+        for row in blob.get("rows", []):
+            prefix = extract_prefix(row.get("licenseNum"))
+            if prefix:
+                prefixes.add(prefix)
+    return prefixes
+
+
+def enqueue_prefixes(prefixes, checkpoint_file=CHECKPOINT_FILE):
+    """Append prefixes that were never searched to the main.py checkpoint's pending queue."""
+    checkpoint = {"completed": [], "pending": []}
+    if os.path.exists(checkpoint_file):
+        with open(checkpoint_file, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    known = set(checkpoint.get("completed", [])) | set(checkpoint.get("pending", []))
+    new = sorted(p for p in prefixes if p not in known)
+    checkpoint.setdefault("pending", []).extend(new)
+    tmp = checkpoint_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, checkpoint_file)
+    return new
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse the local response archive without touching the network")
+    parser.add_argument("--archive", default=getattr(config, 'ARCHIVE_DIR', DEFAULT_ARCHIVE))
+    parser.add_argument("--dry-run", action="store_true", help="parse only, do not write to the database")
+    parser.add_argument("--export", default=None, help="write re-parsed records to a JSONL file")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--since", type=float, default=0.0, help="only captures newer than this unix time")
+    parser.add_argument("--prefixes", action="store_true", help="re-discover keyword prefixes from list pages")
+    parser.add_argument("--enqueue", action="store_true", help="with --prefixes: add new ones to the checkpoint pending queue")
+    parser.add_argument("--category", default=None, help="category id (default: every configured category)")
+    args = parser.parse_args()
+
+    categories = load_categories(CHECKPOINT_FILE)
+    if args.category:
+        categories = [c for c in categories if c["id"] == args.category]
+        if not categories:
+            parser.error(f"unknown category '{args.category}'")
+
+    archive = ResponseArchive(args.archive)
+    print(f"[Replay] Archive {args.archive}: {archive.stats()}")
+
+    if args.prefixes:
+        for cat in categories:
+            prefixes = replay_prefixes(archive, category=cat)
+            print(f"[Replay] [{cat['id']}] {len(prefixes)} prefixes in archived list pages.")
+            if args.enqueue:
+                new = enqueue_prefixes(prefixes, checkpoint_file=cat["checkpoint"])
+                print(f"[Replay] [{cat['id']}] Queued {len(new)} new prefix(es): {new[:20]}{' ...' if len(new) > 20 else ''}")
+        archive.close()
+        return
+
+    export = open(args.export, "w", encoding="utf-8") if args.export else None
+    try:
+        for cat in categories:
+            db = None
+            if not args.dry_run:
+                from database.storage import Storage
+                db = Storage(table_name=cat["table"])
+                db.init_db()
+
+            def sink(batch, db=db):
+                if export:
+                    for record in batch:
+                        export.write(json.dumps(record, ensure_ascii=False) + "\n")
+                return db.save_batch(batch) if db else 0
+
+            try:
+                stats = replay_details(archive, sink=sink, batch_size=args.batch, since=args.since, category=cat)
+                print(f"[Replay] [{cat['id']}] Done → {cat['table']}: {stats}")
+            finally:
+                if db: db.close()
+    finally:
+        if export: export.close()
+        archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Resource Router - 拦截非必要资源，给列表页 / 详情页减负
+
+在 browser context 上注册 route("**/*")：
+- 按资源类型拦截（默认 image / media / font）
+- 拦截第三方域名（统计、CDN 广告等），站点自身域名 + ALLOWED_HOSTS 放行
+- RESOURCE_ALLOWLIST 中的 URL 片段永远放行（Vue 应用真正需要的东西）
+并按页面汇总：拦截了多少请求，估计省下多少流量 / 加载时间。
+"""
+from urllib.parse import urlparse
+
+# 还没观测到该类型的真实大小 / 耗时时使用的经验值
+DEFAULT_AVG_BYTES = {"image": 25_000, "media": 200_000, "font": 60_000, "stylesheet": 30_000, "script": 50_000, "other": 5_000}
+DEFAULT_AVG_MS = {"image": 120, "media": 400, "font": 150, "stylesheet": 120, "script": 150, "other": 80}
+PARALLEL_CONNECTIONS = 6  # 浏览器同域并发，用于把串行耗时折算成墙钟时间
+
+
+class ResourceRouter:
+    def __init__(self, site_host, blocked_types=("image", "media", "font"), block_third_party=True,
+                 allowed_hosts=(), allowlist=()):
+        self.site_host = site_host or ""
+        self.blocked_types = set(blocked_types)
+        self.block_third_party = block_third_party
+        self.allowed_hosts = tuple(h for h in (self.site_host,) + tuple(allowed_hosts) if h)
+        self.allowlist = tuple(allowlist)
+
+        self.totals = {"allowed": 0, "blocked": 0, "bytes_saved": 0, "ms_saved": 0.0}
+        self.blocked_by_reason = {}
+        self._page_mark = dict(self.totals)
+        # 放行请求的实测平均大小 / 耗时（按资源类型）
+        self._seen_bytes = {}
+        self._seen_ms = {}
+
+    def install(self, context):
+        context.route("**/*", self._handle)
+        context.on("response", self._observe)
+
+    # ------------------------------------------------------------------
+    def _is_allowed_host(self, host):
+        return any(host == h or host.endswith("." + h) for h in self.allowed_hosts)
+
+    def _block_reason(self, request):
+        url = request.url
+        if url.startswith("data:") or any(m in url for m in self.allowlist):
+            return None
+        rtype = request.resource_type
+        if rtype in self.blocked_types:
+            return rtype
+        if self.block_third_party and rtype != "document":
+            host = urlparse(url).hostname or ""
+            if host and not self._is_allowed_host(host):
+                return "third-party"
+        return None
+
+    def _handle(self, route):
+        try:
+            reason = self._block_reason(route.request)
+        except Exception:
+            reason = None
+        if reason is None:
+            self.totals["allowed"] += 1
+            try: route.continue_()
+            except: pass
+            return
+
+        rtype = route.request.resource_type
+        self.totals["blocked"] += 1
+        self.totals["bytes_saved"] += self._avg_bytes(rtype)
+        self.totals["ms_saved"] += self._avg_ms(rtype) / PARALLEL_CONNECTIONS
+        self.blocked_by_reason[reason] = self.blocked_by_reason.get(reason, 0) + 1
+        try: route.abort("blockedbyclient")
+        except: pass
+
+    def _observe(self, response):
+        """Learn real sizes / durations of allowed resources for better savings estimates."""
+        try:
+            rtype = response.request.resource_type
+            length = int(response.headers.get("content-length", 0) or 0)
+            if length:
+                n, total = self._seen_bytes.get(rtype, (0, 0))
+                self._seen_bytes[rtype] = (n + 1, total + length)
+            timing = response.request.timing
+            if timing and timing.get("responseEnd", -1) > 0:
+                n, total = self._seen_ms.get(rtype, (0, 0.0))
+                self._seen_ms[rtype] = (n + 1, total + timing["responseEnd"])
+        except Exception:
+            pass
+
+    def _avg_bytes(self, rtype):
+        n, total = self._seen_bytes.get(rtype, (0, 0))
+        return total / n if n else DEFAULT_AVG_BYTES.get(rtype, DEFAULT_AVG_BYTES["other"])
+
+    def _avg_ms(self, rtype):
+        n, total = self._seen_ms.get(rtype, (0, 0.0))
+        return total / n if n else DEFAULT_AVG_MS.get(rtype, DEFAULT_AVG_MS["other"])
+
+    # ------------------------------------------------------------------
+    def page_report(self, label="Page"):
+        """Print and return savings since the previous report."""
+        delta = {k: self.totals[k] - self._page_mark.get(k, 0) for k in self.totals}
+        self._page_mark = dict(self.totals)
+        if delta["blocked"]:
+            print(f"[Router] {label}: blocked {delta['blocked']} / {delta['blocked'] + delta['allowed']} requests, "
+                  f"~{delta['bytes_saved'] / 1024:.0f} KB and ~{delta['ms_saved'] / 1000:.1f}s saved")
+        return delta
+
+    def summary(self):
+        return {
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in self.totals.items()},
+            "by_reason": dict(self.blocked_by_reason),
+        }
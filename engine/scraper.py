@@ -3,200 +3,503 @@ import random
 import json
 import os
 import re
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from playwright.sync_api import sync_playwright
 import config
 from config import BASE_URL, HEADLESS, DELAY_RANGE
-from engine.rate_limiter import SmartRateLimiter
+from engine.rate_limiter import SmartRateLimiter, create_policy
+from engine.block_signals import BlockSignal, classify_response
+from engine.browser_pool import BrowserPool
+from engine.resource_router import ResourceRouter
+from engine.detail_tabs import DetailTabPool, DetailMetrics, find_record
+from engine.api_client import SiteApiClient, ApiRejected
+from engine.detail_parser import (DETAIL_PAIRS_JS, parse_detail_pairs, clean_detail_value, is_complete,
+                                  has_detail_payload, merge_list_info, compact_text)
+from engine.normalize import extract_prefix
+from engine.archive import ResponseArchive
+from engine.prefix_discovery import PrefixDiscovery
+from engine.coverage import CoverageEstimator, count_prefixes
+from engine.enrichment import open_queue
+from engine.categories import Partition, primary_category
+from engine.entity_resolution import open_index
+
+# 详情页"有实质数据"的白名单判定（初次检查与重新点击共用）
+# 🔧 FIX: 增加脏数据过滤，防止 Vue 吐出 "无" 或 "******" 被当做正常数据
+DETAIL_READY_JS = """() => {
+    const rows = Array.from(document.querySelectorAll('tr'));
+    if (rows.length <= 5) return false;
+    for (let row of rows) {
+        const cells = row.querySelectorAll('td');
+        if (cells.length >= 2) {
+            const label = cells[0].innerText.trim();
+            const value = cells[1].innerText.trim();
+            if ((label.includes("名称") || label.includes("代表人") || label.includes("范围") || label.includes("方式") || label.includes("部门")) && value.length > 2) {
+                // 排除无意义的高频空值
+                if (!value.includes("无") && !value.includes("***")) {
+                    return true;
+                }
+            }
+        }
+    }
+    return false;
+}"""
+
+RE_PAGE_SIZE = re.compile(r'(\d+)\s*条')  # el-pagination 每页条数选项，如 "50条/页"
+
+
+def _parse_page_size(text):
+    match = RE_PAGE_SIZE.search(text or "")
+    return int(match.group(1)) if match else None
+
 
 class NMPAScraper:
-    def __init__(self, existing_records=None):
+    def __init__(self, existing_records=None, cdp_endpoint=None, base_url=None, worker_id=None,
+                 limiter_log="logs/scraper_behavior.jsonl", limiter_state=None, category=None):
+        """
+        cdp_endpoint / base_url / limiter_*: per-worker overrides used by the fleet coordinator
+        (engine/fleet.py); the defaults keep the single-instance behaviour of main.py.
+        category: the category `existing_records` belongs to (default: the primary one in config.CATEGORIES);
+        more categories are registered with add_category() and switched with use_category().
+        """
+        self.cdp_endpoint = cdp_endpoint or getattr(config, 'CDP_ENDPOINT', "http://localhost:9222")
+        self.base_url = base_url or BASE_URL
+        self.worker_id = worker_id
         self.browser = None
+        self.pool = None  # managed 模式下的 BrowserPool
         self.context = None
         self.page = None
-        self.intercepted_data = []
+        self.intercepted_data = deque(maxlen=50)  # 只保留最近的接口 JSON，防止长时间运行内存增长
+        self.block_signal = BlockSignal()
+        self._site_host = urlparse(self.base_url).hostname or ""
+        self._last_signal_block = 0.0
+        self.router = None
+        if getattr(config, 'RESOURCE_BLOCKING', False):
+            self.router = ResourceRouter(
+                self._site_host,
+                blocked_types=getattr(config, 'BLOCK_RESOURCE_TYPES', ("image", "media", "font")),
+                block_third_party=getattr(config, 'BLOCK_THIRD_PARTY', True),
+                allowed_hosts=getattr(config, 'ALLOWED_HOSTS', ()),
+                allowlist=getattr(config, 'RESOURCE_ALLOWLIST', ()),
+            )
+        self.detail_metrics = DetailMetrics()
+        self.detail_tabs = None
+        if getattr(config, 'DETAIL_TAB_REUSE', False):
+            self.detail_tabs = DetailTabPool(
+                size=getattr(config, 'DETAIL_TAB_POOL_SIZE', 1),
+                recycle_uses=getattr(config, 'DETAIL_TAB_RECYCLE_USES', 300),
+                recycle_memory_mb=getattr(config, 'DETAIL_TAB_RECYCLE_MEMORY_MB', 256),
+                url_template=getattr(config, 'DETAIL_URL_TEMPLATE', None),
+                metrics=self.detail_metrics,
+            )
+        self.api = None
+        if getattr(config, 'API_MODE', False):
+            self.api = SiteApiClient(
+                recipe_file=getattr(config, 'API_RECIPE_FILE', None),
+                field_map=getattr(config, 'API_FIELD_MAP', None),
+                timeout=getattr(config, 'API_TIMEOUT', 15),
+                suspend_seconds=getattr(config, 'API_SUSPEND_SECONDS', 600),
+                page_size=getattr(config, 'API_PAGE_SIZE', 100),
+            )
+            if not self.api.available():
+                print("[API] httpx is not installed (pip install \"httpx[http2]\"). Using the browser engine only.")
+                self.api = None
+        self.archive = ResponseArchive(getattr(config, 'ARCHIVE_DIR', "resources/archive")) \
+            if getattr(config, 'ARCHIVE_ENABLED', False) else None
+        category = category or primary_category()
+        self.discovery = self._open_discovery(category)
+        # 近似重复索引 (engine/entity_resolution.py)：精确去重未命中时查询名称变体 / 同编号改名
+        self.resolver = self._open_resolver(category)
+        self.entity_action = getattr(config, 'ENTITY_MATCH_ACTION', 'log')
+        self._last_detail_pairs = []
+        self._current_keyword = None
+        self.last_search_exhaustive = False
+        self._detail_hint = None  # 当前正在打开详情的行（供 API 学习详情接口参数）
+        self.current_discovered = set()
+        self.page_size = 10  # 列表实际每页条数（_select_page_size 切换到最大档后更新）
         self.playwright = None
-        # Set of (licenseNum, entName) already in DB to avoid dupes
-        # Set of (licenseNum, entName) already in DB to avoid dupes
-        if existing_records:
-            self.existing_records = existing_records 
-            # Split into fast lookups
-            self.existing_licenses = {rec[0] for rec in existing_records if rec[0]}
-            self.existing_names = {rec[1] for rec in existing_records if rec[1]}
-        else:
-            self.existing_records = set()
-            self.existing_licenses = set()
-            self.existing_names = set()
+        # 类别分区 (engine/categories.py)：去重集合 / 前缀表按类别分开，use_category() 在关键词之间切换
+        # Set of (licenseNum, entName) already in DB to avoid dupes (split into fast lookups)
+        self.partition = Partition(category, existing_records, self.discovery, self.resolver)
+        self.partitions = {self.partition.id: self.partition}
+        self.category = self.partition.label
+        self.existing_records = self.partition.existing_records
+        self.existing_licenses = self.partition.existing_licenses
+        self.existing_names = self.partition.existing_names
+        self.coverage = CoverageEstimator(
+            self.existing_licenses, self.existing_names,
+            confidence=getattr(config, 'COVERAGE_CONFIDENCE', 0.95),
+            horizon_pages=getattr(config, 'COVERAGE_HORIZON_PAGES', 20),
+            min_pages=getattr(config, 'COVERAGE_MIN_PAGES', 3),
+            prior_strength=getattr(config, 'COVERAGE_PRIOR_STRENGTH', 20),
+        ) if getattr(config, 'COVERAGE_EARLY_STOP', False) else None
+        self.incremental = None  # engine/incremental.py 在增量运行时挂上 IncrementalCursor
+        # 两阶段采集 (engine/enrichment.py)：list 阶段只翻列表，新行写入待补表，不开详情
+        self.list_only = getattr(config, 'CRAWL_PHASE', 'full') == 'list'
+        self.enrichment = None
+        if self.list_only:
+            counts = self.coverage.prefix_counts if self.coverage else count_prefixes(self.existing_licenses)
+            self.enrichment = open_queue(prefix_counts=counts)
+            print("[Enrichment] List-only sweep: new rows go to the pending-enrichment table.")
+        # 列表预取：处理第 N 页详情时，影子标签页已在加载第 N+1 页
+        self.prefetch_enabled = getattr(config, 'LIST_PREFETCH', False) and not self.list_only
+        self.prefetch = False
+        self.shadow = None
+        self.shadow_target = None
+        self._prefetch_at = None
+        # API 模式：主线程的详情 / 列表请求与后台预取共用一个节拍（见 _api_paced）
+        self._api_pace_lock = threading.Lock()
+        self._api_last_at = 0.0
+        self.prefetch_stats = {"started": 0, "swapped": 0, "missed": 0}
+        # 关键词预热：当前关键词最后几页处理期间，备用标签页提前搜索下一个关键词（main.py 设置 next_keyword 提示）
+        self.warmup_enabled = getattr(config, 'KEYWORD_PREFETCH', False)
+        self.warmup_tail_pages = getattr(config, 'KEYWORD_PREFETCH_TAIL_PAGES', 2)
+        self.next_keyword = None      # 字符串，或返回字符串的函数（收尾时才求值，队列可能已变）
+        self.standby = None           # 备用列表标签页
+        self.standby_keyword = None   # 备用标签页里已提交搜索的关键词
+        self.standby_category = None
+        self._standby_at = None
+        self.warmup_stats = {"started": 0, "used": 0, "wasted": 0}
         
-        # Initialize the Brain (choose limiter based on config)
-        if config.USE_AGGRESSIVE_RECOVERY:
-            # 🧪 Experimental Mode: Use aggressive recovery limiter
-            from engine.rate_limiter_experimental import SmartRateLimiter as ExperimentalLimiter
-            self.limiter = ExperimentalLimiter(
-                default_base=config.RL_BASE_WAIT,
-                min_base=config.RL_MIN_WAIT,
-                max_base=config.RL_MAX_WAIT,
-                penalty_add=config.RL_PENALTY_ADD,
-                recovery_step=config.RL_RECOVERY_STEP,
-                aggressive_recovery=True
-            )
+        # Initialize the Brain (policy chosen via config.RL_POLICY, hot-swappable at runtime)
+        self.limiter = SmartRateLimiter(
+            default_base=config.RL_BASE_WAIT,
+            min_base=config.RL_MIN_WAIT,
+            max_base=config.RL_MAX_WAIT,
+            penalty_add=config.RL_PENALTY_ADD,
+            recovery_step=config.RL_RECOVERY_STEP,
+            log_path=limiter_log,
+            policy=create_policy(config.RL_POLICY, **getattr(config, 'RL_POLICY_OPTIONS', {})),
+            state_file=limiter_state or getattr(config, 'RL_STATE_FILE', None),
+            state_max_age=getattr(config, 'RL_STATE_MAX_AGE', 6 * 3600)
+        )
+        if self.limiter.aggressive_recovery:
             print("[🧪 EXPERIMENTAL MODE] Using Aggressive Recovery Limiter")
         else:
-            self.limiter = SmartRateLimiter(
-                default_base=config.RL_BASE_WAIT,
-                min_base=config.RL_MIN_WAIT,
-                max_base=config.RL_MAX_WAIT,
-                penalty_add=config.RL_PENALTY_ADD,
-                recovery_step=config.RL_RECOVERY_STEP
-            )
+            print(f"[RateLimiter] Policy: {self.limiter.policy.label}")
+
+    @staticmethod
+    def _open_discovery(category):
+        if not getattr(config, 'PREFIX_DISCOVERY', False):
+            return None
+        return PrefixDiscovery(
+            category.get("discovery_table") or getattr(config, 'DISCOVERY_TABLE', "resources/prefix_table.db"),
+            min_samples=getattr(config, 'DISCOVERY_MIN_SAMPLES', 20),
+            skip_hit_ratio=getattr(config, 'DISCOVERY_SKIP_HIT_RATIO', 0.98),
+        )
+
+    @staticmethod
+    def _open_resolver(category):
+        return open_index(category) if getattr(config, 'ENTITY_RESOLUTION', False) else None
+
+    def add_category(self, category, existing_records=None):
+        """Register another category partition (its own dedupe index, prefix table and entity index)."""
+        part = Partition(category, existing_records, self._open_discovery(category), self._open_resolver(category))
+        self.partitions[part.id] = part
+        return part
+
+    def use_category(self, category_id):
+        """Switch the active category between keywords (dedupe sets, prefix table, coverage prior, site category)."""
+        part = self.partitions[category_id]
+        if part is self.partition:
+            return part
+        if self.coverage:
+            self.partition.prefix_counts = self.coverage.rebind(part.existing_licenses, part.existing_names,
+                                                                part.prefix_counts)
+        self.partition = part
+        self.category = part.label
+        self.existing_records = part.existing_records
+        self.existing_licenses = part.existing_licenses
+        self.existing_names = part.existing_names
+        self.discovery = part.discovery
+        self.resolver = part.resolver
+        self._close_shadow()
+        print(f"[Category] Now crawling '{part.label}' ({part.id}).")
+        return part
 
     def start(self):
         self.playwright = sync_playwright().start()
         
-        print("[Scraper] Connecting to YOUR manually opened Chrome (Port 9222)...")
+        if getattr(config, 'BROWSER_MODE', 'cdp') == 'managed':
+            # 自启动无头 Chromium 池（Linux 服务器无人值守）
+            self.pool = BrowserPool(
+                self.playwright,
+                size=getattr(config, 'BROWSER_POOL_SIZE', 1),
+                profile_root=getattr(config, 'BROWSER_PROFILE_ROOT', "resources/browser_profiles"),
+                headless=HEADLESS,
+                recycle_pages=getattr(config, 'BROWSER_RECYCLE_PAGES', 500),
+                recycle_memory_mb=getattr(config, 'BROWSER_RECYCLE_MEMORY_MB', 1500),
+                proxies=getattr(config, 'BROWSER_PROXIES', None),
+            )
+            self._attach_context(self.pool.start())
+            print(f"[Scraper] Managed browser pool ready ({self.pool.size} instance(s), headless={HEADLESS}).")
+            return
+        
+        print(f"[Scraper] Connecting to YOUR manually opened Chrome ({self.cdp_endpoint})...")
         try:
             # Connect to the Chrome instance launched by the user
-            self.browser = self.playwright.chromium.connect_over_cdp("http://localhost:9222")
-            self.context = self.browser.contexts[0]
-            
-            # Use the active page
-            if self.context.pages:
-                self.page = self.context.pages[0]
-            else:
-                self.page = self.context.new_page()
-                
+            self.browser = self.playwright.chromium.connect_over_cdp(self.cdp_endpoint)
+            self._attach_context(self.browser.contexts[0])
             print("[Scraper] Connected successfully! Logic will now run on your open window.")
             
         except Exception as e:
-            print(f"[Error] Could not connect to Chrome on port 9222.")
+            print(f"[Error] Could not connect to Chrome at {self.cdp_endpoint}.")
             print("Please ensure you launched Chrome with this EXACT command:")
             print(r'"C:\Program Files\Google\Chrome\Application\chrome.exe" --remote-debugging-port=9222 --user-data-dir="C:\chrome_debug" --no-first-run --no-default-browser-check --disable-extensions --disable-popup-blocking')
             print(f"Details: {e}")
             raise e
 
+    def _attach_context(self, context):
+        """Bind to a browser context (initial start, or after a pool recycle / crash restart)."""
+        self.context = context
+        # 监听整个 context（含详情新标签页）的响应：收集接口数据 + 网络层封锁判定
+        self.context.on("response", self.handle_response)
+        # 轻量模式：拦截图片/字体/第三方等非必要资源（详情标签页同样生效）
+        if self.router:
+            self.router.install(self.context)
+        if self.detail_tabs:
+            self.detail_tabs.bind(self.context)
+
+        # Use the active page
+        if self.context.pages:
+            self.page = self.context.pages[0]
+        else:
+            self.page = self.context.new_page()
+
+    def _pool_maintenance(self, keyword, next_page):
+        """
+        Managed mode only: recycle / restart the browser between list pages.
+        Returns True if the browser was swapped and the search was restored at `next_page`.
+        """
+        if not self.pool:
+            return False
+        self.pool.note_pages(1)
+        self.pool.supervise()
+        if self.pool.current.is_alive() and not self.pool.needs_recycle():
+            return False
+        context = self.pool.recycle() if self.pool.current.is_alive() else self.pool.acquire()
+        self._attach_context(context)
+        self._restore_search(keyword, next_page)
+        return True
+
     def handle_response(self, response):
-        """Intercept network responses to find data JSONs."""
+        """Intercept network responses: collect data JSONs and classify block signals."""
         try:
-            if 'application/json' in response.headers.get('content-type', ''):
-                if '/datasearch/' in response.url:
-                    try:
-                        data = response.json()
-                        if isinstance(data, dict) or isinstance(data, list):
-                             self.intercepted_data.append(data)
-                    except:
-                        pass
+            url = response.url
+            if self._site_host not in url and '/datasearch/' not in url:
+                return  # 第三方资源的状态码与封锁无关
+            resource_type = response.request.resource_type
+            content_type = response.headers.get('content-type', '')
+
+            body_text = None
+            if ('/datasearch/' in url and resource_type in ('xhr', 'fetch')) or \
+               (resource_type == 'document' and 'text/html' in content_type and response.status < 300):
+                try: body_text = response.text()
+                except: body_text = None
+
+            reason = classify_response(url, response.status, body_text, resource_type)
+            if reason:
+                self._on_block_signal(reason, url)
+                return
+
+            if 'application/json' in content_type and '/datasearch/' in url and body_text:
+                try:
+                    data = json.loads(body_text)
+                    if isinstance(data, dict) or isinstance(data, list):
+                         self.intercepted_data.append(data)
+                         if self.api and self.partition.primary:
+                             self.api.observe(response.request, data, keyword=self._current_keyword, row=self._detail_hint)
+                except:
+                    pass
         except Exception:
             pass
 
+    def _on_block_signal(self, reason, url):
+        """Network-level block: tell the limiter right away (debounced so one burst = one penalty)."""
+        self.block_signal.trip(reason, url)
+        print(f"[BlockSignal] {reason}: {url[:120]}")
+        self.limiter._log({"event": "BLOCK_SIGNAL", "reason": reason, "url": url[:200]})
+        now = time.time()
+        if now - self._last_signal_block > getattr(config, 'BLOCK_SIGNAL_DEBOUNCE', 30):
+            self._last_signal_block = now
+            self.limiter.record_block()
+
+    def _wait_detail_ready(self, detail_page, opened_at, buffer_s=2.0, polls=20):
+        """
+        Poll the detail tab until DETAIL_READY_JS passes.
+        Returns (data_ready, block_reason); bails out as soon as a network block signal
+        newer than `opened_at` is seen instead of polling the full ~10s.
+        wait_for_timeout (not time.sleep) keeps Playwright dispatching response events.
+        """
+        # 柔性等待，模仿测试脚本的前置缓冲（分片等待，期间可被封锁信号打断）
+        waited = 0.0
+        while waited < buffer_s:
+            reason = self.block_signal.since(opened_at)
+            if reason: return False, reason
+            detail_page.wait_for_timeout(250)
+            waited += 0.25
+
+        # Content Polling (渐进式重试 10秒)
+        for _ in range(polls):
+            reason = self.block_signal.since(opened_at)
+            if reason: return False, reason
+            try:
+                if detail_page.evaluate(DETAIL_READY_JS):
+                    return True, None
+            except: pass
+            try: detail_page.wait_for_timeout(500)
+            except: time.sleep(0.5)
+        return False, self.block_signal.since(opened_at)
+
+    def _open_detail(self, btn, base_info):
+        """
+        Open the detail view for a row. Returns (detail_page, opened_at).
+        Reuse mode loads the resolved detail URL in a pooled tab; without a URL (or with
+        reuse off) it falls back to the original click → new tab flow.
+        """
+        fields = None
+        if self.detail_tabs or self.api:
+            record = find_record(self.intercepted_data, base_info.get('licenseNum'))
+            self._detail_hint = {**(record or {}), **base_info}
+        if self.detail_tabs:
+            fields = self._detail_hint
+            opened_at = time.time()
+            url = self.detail_tabs.resolve_url(btn, self.page.url, fields)
+            if url:
+                detail_page = self.detail_tabs.open(url)
+                detail_page.bring_to_front()
+                return detail_page, opened_at
+            self.detail_metrics.resolved["click"] += 1
+
+        initial_page_count = len(self.context.pages)
+        opened_at = time.time()
+        # 🔧 FIX: 不再用硬件鼠标模拟 —— 已确认会导致详情页白屏
+        # 也不再用 scroll_into_view —— 已确认会干扰 Vue 状态
+        with self.context.expect_page(timeout=10000) as new_page_info:
+            btn.click(force=True)
+        detail_page = new_page_info.value
+
+        if not detail_page and len(self.context.pages) > initial_page_count:
+            detail_page = self.context.pages[-1]
+        if detail_page:
+            self.detail_metrics.note_tab()
+            detail_page.bring_to_front()
+            detail_page.wait_for_load_state("domcontentloaded")
+            if fields is not None:
+                # 点击流程打开的真实 URL → 学习模板，后续行直接复用标签页
+                self.detail_tabs.learn(detail_page.url, fields)
+        return detail_page, opened_at
+
+    def _dispose_detail(self, detail_page, discard=False):
+        """Reset a pooled detail tab (and refocus the list), or close a click-flow tab.
+
+        discard=True drops a pooled tab that showed a blank / blocked page instead of reusing it."""
+        if detail_page is None:
+            return
+        if self.detail_tabs and self.detail_tabs.owns(detail_page):
+            if discard:
+                self.detail_tabs.discard(detail_page)
+            else:
+                self.detail_tabs.release(detail_page)
+            # 后台标签页的定时器会被节流，列表页必须回到前台
+            try: self.page.bring_to_front()
+            except: pass
+            return
+        try:
+            detail_page.close()
+            print(f"[Scraper]Detail page closed.")
+        except:
+            pass
+
     def search(self, keyword="上海", max_pages=5, skip_dedupe=False):
         """
         Main search entry point with tab-syncing and fallback search logic.
         skip_dedupe: If True, skip duplicate checking (used during repair phase to process all same-name records)
         """
+        self._current_keyword = keyword
+        # 本次搜索是否一直翻到了最后一页（提前停止 / 1000 页上限 / 出错都为 False）；前缀覆盖判断只信这种关键词
+        self.last_search_exhaustive = False
+        self._close_shadow()
+        self.prefetch = self.prefetch_enabled
+        if self.coverage:
+            self.coverage.end()
+        # 学到的接口配方属于主类别：其它类别只走浏览器
+        if self.api and self.api.ready() and self.partition.primary:
+            finished = yield from self._search_via_api(keyword, max_pages, skip_dedupe)
+            if finished:
+                return
+            print(f"[API] Falling back to the browser engine for '{keyword}'.")
         try:
-            # 1. SCAN FOR EXISTING RESULT TAB (User-first approach)
-            print("[Scraper] Scanning open tabs for 'search-result.html'...")
-            existing_target = None
-            for p in self.context.pages:
-                if "search-result.html" in p.url:
-                    existing_target = p
-                    break
-            
-            if existing_target:
-                self.page = existing_target
-                self.page.bring_to_front()
-                print(f"[Scraper] Found existing result tab: {self.page.url}")
+            # 0. 关键词预热：备用标签页已提前搜过这个关键词 → 直接接管，省掉导航 / 选类别 / 输入 / 5 秒等待
+            if self._take_standby(keyword):
+                print(f"[Warmup] '{keyword}' was already searched in the standby tab.")
             else:
-                # 2. FALLBACK: Normal Search Flow
-                print(f"[Scraper] No result tab found. Starting from {BASE_URL}...")
-                self.page.on("response", self.handle_response)
-                
-                try:
-                    self.page.goto(BASE_URL, timeout=60000)
-                    self.page.wait_for_load_state("networkidle")
-                except Exception as e_nav:
-                    print(f"[Scraper] Navigation issue: {e_nav}. Trying reload...")
-                    self.page.reload()
-                
-            self._close_overlays()
-            time.sleep(1)
-            # Select Category (User Request: Auto-Select)
-            category_target = "医疗器械经营企业（备案）"
-            try:
-                # 1. First, check if the category tag is ALREADY active (Best visual confirmation)
-                # The screenshot shows the tag below the search bar even if the dropdown says "请选择"
-                tag_exists = self.page.locator(f".el-tag:has-text('{category_target}')").count() > 0
-                
-                if tag_exists:
-                        print(f"[Scraper] Found active category tag '{category_target}'. Skipping selection.")
+                # 1. SCAN FOR EXISTING RESULT TAB (User-first approach)
+                print("[Scraper] Scanning open tabs for 'search-result.html'...")
+                existing_target = None
+                for p in self.context.pages:
+                    if "search-result.html" in p.url and p is not self.standby:
+                        existing_target = p
+                        break
+            
+                if existing_target:
+                    self.page = existing_target
+                    self.page.bring_to_front()
+                    print(f"[Scraper] Found existing result tab: {self.page.url}")
                 else:
-                    print(f"[Scraper] Tag missing. Checking dropdown value...")
-                    # 2. Check current value via JS (targeting the 'Select' input we identified as Input #0)
-                    current_cat = self.page.evaluate("""() => {
-                        const i = document.querySelector('input[placeholder="请选择"]'); 
-                        return i ? i.value : '';
-                    }""")
-                    
-                    if category_target not in current_cat:
-                        print(f"[Scraper] Category mismatch. actively selecting '{category_target}'...")
-                        self.page.click('input[placeholder="请选择"]', timeout=3000)
-                        time.sleep(1)
-                        # Wait and Click the option
-                        # Use locator with visible=True to avoid clicking hidden dropdowns
-                        self.page.locator(f".el-select-dropdown__item:has-text('{category_target}')").filter(has=self.page.locator(":visible")).first.click(timeout=5000)
-                        time.sleep(1)
-                    else:
-                        print(f"[Scraper] Category dropdown already set to '{current_cat}'. Skipping.")
-            except Exception as e_cat:
-                print(f"[Warning] Category selection failed: {e_cat}")
-
-            # Fill Keyword (Strict Validation Loop)
-            try:
-                print(f"[Scraper] Inputting keyword '{keyword}'...")
-                search_success = False
+                    # 2. FALLBACK: Normal Search Flow
+                    print(f"[Scraper] No result tab found. Starting from {self.base_url}...")
                 
-                # 🔧 对齐成功诊断脚本：使用 fill + 物理按键触发 Vue 同步
-                input_locator = self.page.locator('input[placeholder*="企业名称"]')
-                if input_locator.count() > 0:
-                    input_locator.fill(keyword)
-                    time.sleep(0.5)
-                    self.page.keyboard.press("End")
-                    self.page.keyboard.press("Space")
-                    self.page.keyboard.press("Backspace")
-                    time.sleep(0.5)
-                    self.page.keyboard.press("Enter")
-                    search_success = True
-                else:
-                    print(f"[Error] Could not find search input for '{keyword}'")
+                    try:
+                        self.page.goto(self.base_url, timeout=60000)
+                        self.page.wait_for_load_state("networkidle")
+                    except Exception as e_nav:
+                        print(f"[Scraper] Navigation issue: {e_nav}. Trying reload...")
+                        self.page.reload()
+                
+                self._close_overlays()
+                time.sleep(1)
+                # Select Category (User Request: Auto-Select)
+                if not self._ensure_category(self.page) and len(self.partitions) > 1:
+                    # 多类别时在错误类别下搜索会把别的类别的数据写进当前分区
+                    print(f"[Error] Could not select category '{self.category}'. Skipping '{keyword}'.")
                     return []
 
-                if not search_success:
-                    print(f"[Error] Failed to set search keyword to '{keyword}'. Abort.")
-                    try: self.page.screenshot(path="logs/debug_search_fail.png")
-                    except: pass
-                    return [] 
-                
-                
-                print("[Scraper] Search trigger sequence completed.")
-            except Exception as e_int:
-                print(f"[Scraper] Interaction sequence failed: {e_int}")
+                # Fill Keyword
+                try:
+                    print(f"[Scraper] Inputting keyword '{keyword}'...")
+                    if not self._submit_keyword(self.page, keyword):
+                        print(f"[Error] Could not find search input for '{keyword}'")
+                        return []
+                    print("[Scraper] Search trigger sequence completed.")
+                except Exception as e_int:
+                    print(f"[Scraper] Interaction sequence failed: {e_int}")
 
-            # 🔧 FIX: 不再用 wait_for_selector("tr") —— 已确认它会破坏 Vue 分页状态
-            print("[Scraper] Verifying search results...")
-            time.sleep(5)  # 等待搜索结果加载
+                # 🔧 FIX: 不再用 wait_for_selector("tr") —— 已确认它会破坏 Vue 分页状态
+                print("[Scraper] Verifying search results...")
+                time.sleep(5)  # 等待搜索结果加载
             if self.page.locator("text='暂无数据内容'").count() > 0 or self.page.locator("text='暂无数据'").count() > 0:
                  print("[Scraper] Search returned NO DATA. Stopping.")
+                 self.last_search_exhaustive = True
                  return []
 
         except Exception as e:
             print(f"[Scraper] search() method failed: {e}")
             return []
 
+        # 📏 切到分页栏提供的最大每页条数（同样 1000 页上限下单个关键词能覆盖更多记录）
+        self._select_page_size()
         # 🔧 读取网页上的总条数/总页数（用于超限记录）
         self._read_pagination_info()
+        if self.coverage and not skip_dedupe:
+            self.coverage.begin(keyword, self.last_total_records, page_size=self.page_size)
         
         # Yielding results loop (Smart Page Counting)
         effective_pages = 0
         total_attempts = 0 # Safety breaker
+        prefetched = False  # 当前页来自影子标签页（已加载完成，无需再等）
         self.current_discovered = set()
         
         # 🔧 FIX: 网站最多只允许翻1000页（即使数据显示有更多页）
@@ -215,27 +518,47 @@ class NMPAScraper:
                 break
                 
             print(f"[Scraper] Processing Page {total_attempts} (Effective: {effective_pages}/{max_pages})...")
-            time.sleep(2)
+            if not prefetched:
+                time.sleep(2)
             self._close_overlays()
+            # 详情处理期间让影子标签页加载下一页（已预取过的目标页不重复触发）
+            if self.prefetch and self.shadow_target != total_attempts + 1:
+                self._prefetch_list(keyword, total_attempts + 1)
+            # 关键词收尾：最后几页处理期间，备用标签页先搜下一个关键词
+            last_page = min(self.last_total_pages or 0, SITE_PAGE_LIMIT)
+            if last_page and last_page - total_attempts < self.warmup_tail_pages:
+                self._warm_up_next()
 
             # 🔧 FIX: 不再用 wait_for_selector("tr") —— 由 _scrape_with_details 内部的
             # wait_for_selector("详情"/".el-table__row") 来等待数据加载
             try:
-                current_batch = self._scrape_with_details(skip_dedupe=skip_dedupe)
+                current_batch = self._scrape_with_details(skip_dedupe=skip_dedupe, settled=prefetched)
+                prefetched = False
             except Exception as e:
                 # 捕获熔断信号，执行自动清Cookie并在同页码满血复活
                 if "ABORT:" in str(e):
                     print(f"\n🚨 [Anti-Ban] IP soft-blocked on attempt {total_attempts}. Executing MELTDOWN RECOVERY...")
                     self._recover_meltdown(keyword, total_attempts)
                     # 恢复后重置 limiter，避免再次立刻进入高处罚
-                    try: self.limiter.current_base = self.limiter.default_base
-                    except: pass
+                    self.limiter.reset()
                     # 修正页码计数器，确保重试当前页不在打印时串号
                     total_attempts -= 1
                     continue # 重新执行对该页的抓取
                 else:
                     raise e
             
+            if self.router:
+                self.router.page_report(f"Page {total_attempts}")
+            if self.discovery:
+                self.discovery.flush()
+            if self.resolver:
+                self.resolver.flush()
+            if self.enrichment:
+                self.enrichment.flush()
+            stop_early = self._stop_paging(keyword)
+            if stop_early:
+                self._warm_up_next()
+            
             # Logic: If batch has items, it counts as a page.
             # We yield both the data AND any NEW prefixes found during this page
             if current_batch or self.current_discovered:
@@ -250,9 +573,383 @@ class NMPAScraper:
             else:
                 print(f"[Scraper] Page yielded NO new data and no new prefixes. NOT counting.")
             
+            if stop_early:
+                break
+            
+            # managed 模式：浏览器实例回收 / 崩溃重启后已直接恢复到下一页
+            if (not self.last_total_pages or total_attempts < self.last_total_pages) and \
+               self._pool_maintenance(keyword, total_attempts + 1):
+                continue
+            
+            if self.prefetch and self._swap_to_prefetched(total_attempts + 1):
+                print(f"[Prefetch] Page {total_attempts + 1} already loaded in the shadow tab.")
+                prefetched = True
+                continue
+            
             if not self.go_to_next_page():
                 print("[Scraper] No more pages.")
+                self.last_search_exhaustive = bool(self.last_total_pages) and total_attempts >= self.last_total_pages
                 break
+        self._close_shadow()
+
+    def _ensure_category(self, page, category_target=None):
+        """Select the active category (default 医疗器械经营企业（备案）) on `page` unless it is already active. Returns False on failure."""
+        category_target = category_target or self.category
+        try:
+            # 1. First, check if the category tag is ALREADY active (Best visual confirmation)
+            # The screenshot shows the tag below the search bar even if the dropdown says "请选择"
+            tag_exists = page.locator(f".el-tag:has-text('{category_target}')").count() > 0
+            
+            if tag_exists:
+                    print(f"[Scraper] Found active category tag '{category_target}'. Skipping selection.")
+            else:
+                print(f"[Scraper] Tag missing. Checking dropdown value...")
+                # 2. Check current value via JS (targeting the 'Select' input we identified as Input #0)
+                current_cat = page.evaluate("""() => {
+                    const i = document.querySelector('input[placeholder="请选择"]'); 
+                    return i ? i.value : '';
+                }""")
+                
+                if category_target not in current_cat:
+                    print(f"[Scraper] Category mismatch. actively selecting '{category_target}'...")
+                    page.click('input[placeholder="请选择"]', timeout=3000)
+                    time.sleep(1)
+                    # Wait and Click the option
+                    # Use locator with visible=True to avoid clicking hidden dropdowns
+                    page.locator(f".el-select-dropdown__item:has-text('{category_target}')").filter(has=page.locator(":visible")).first.click(timeout=5000)
+                    time.sleep(1)
+                else:
+                    print(f"[Scraper] Category dropdown already set to '{current_cat}'. Skipping.")
+        except Exception as e_cat:
+            print(f"[Warning] Category selection failed: {e_cat}")
+            return False
+        return True
+
+    def _submit_keyword(self, page, keyword):
+        """Fill the keyword box on `page` and trigger the search. Returns False if the input is missing."""
+        # 🔧 对齐成功诊断脚本：使用 fill + 物理按键触发 Vue 同步
+        input_locator = page.locator('input[placeholder*="企业名称"]')
+        if input_locator.count() == 0:
+            return False
+        input_locator.fill(keyword)
+        time.sleep(0.5)
+        page.keyboard.press("End")
+        page.keyboard.press("Space")
+        page.keyboard.press("Backspace")
+        time.sleep(0.5)
+        page.keyboard.press("Enter")
+        return True
+
+    # ------------------------------------------------------------------
+    # Pipelined list prefetch (config.LIST_PREFETCH): page N+1 loads in a shadow tab while page N's details run
+    # ------------------------------------------------------------------
+    def _prefetch_list(self, keyword, target_page):
+        """Start loading `target_page` in the shadow list tab (non-blocking: fill the jump box and return)."""
+        if not self.prefetch or target_page > (self.last_total_pages or 0):
+            return False
+        try:
+            if self.shadow is None or self.shadow.is_closed():
+                self.shadow = self.context.new_page()
+                self.shadow.goto(self.base_url, timeout=60000)
+                self.shadow.wait_for_load_state("networkidle")
+                self._ensure_category(self.shadow)
+                if not self._submit_keyword(self.shadow, keyword):
+                    raise RuntimeError("search input missing in shadow tab")
+                self.shadow.wait_for_timeout(3000)
+                self._select_shadow_page_size()
+            jump_input = self.shadow.locator("span.el-pagination__jump input").first
+            if jump_input.count() == 0:
+                raise RuntimeError("no pagination jump box")
+            jump_input.fill(str(target_page))
+            jump_input.press("Enter")
+            self.shadow_target = target_page
+            self._prefetch_at = time.time()  # 这次列表请求计入限速预算（见 _pace_after_prefetch）
+            self.prefetch_stats["started"] += 1
+            return True
+        except Exception as e:
+            print(f"[Prefetch] Shadow tab unavailable ({e}). Paging in the main tab for '{keyword}'.")
+            self._close_shadow()
+            self.prefetch = False
+            return False
+
+    def _select_shadow_page_size(self):
+        main_page, self.page = self.page, self.shadow
+        try:
+            self._select_page_size()
+        finally:
+            self.page = main_page
+
+    def _pace_after_prefetch(self):
+        """Keep the shadow list load and the next detail request at least one limiter delay apart."""
+        if self._prefetch_at:
+            gap = self.limiter.get_delay() - (time.time() - self._prefetch_at)
+            self._prefetch_at = None
+            if gap > 0:
+                time.sleep(gap)
+
+    def _swap_to_prefetched(self, target_page, timeout_s=15):
+        """If the shadow tab shows `target_page`, make it the list tab (the old one becomes the shadow)."""
+        if not self.shadow or self.shadow_target != target_page:
+            return False
+        deadline = time.time() + timeout_s
+        while True:
+            try:
+                active = self.shadow.locator(".el-pager li.active, .el-pager li.number.active").first.inner_text().strip()
+                if active == str(target_page) and self.shadow.locator(".el-table__row, tr").count() > 1:
+                    break
+            except Exception:
+                pass
+            if time.time() > deadline:
+                print(f"[Prefetch] Shadow tab did not reach page {target_page}. Using the main tab.")
+                self.prefetch_stats["missed"] += 1
+                return False
+            self.shadow.wait_for_timeout(300)
+        self.page, self.shadow = self.shadow, self.page
+        self.shadow_target = None
+        self.prefetch_stats["swapped"] += 1
+        return True
+
+    def _close_shadow(self):
+        if self.shadow is not None:
+            try: self.shadow.close()
+            except: pass
+        self.shadow = None
+        self.shadow_target = None
+
+    # ------------------------------------------------------------------
+    # Keyword warm-up (config.KEYWORD_PREFETCH): the next keyword is searched in a standby tab during the current tail
+    # ------------------------------------------------------------------
+    def _warm_up_next(self):
+        """Submit the hinted next keyword in the standby tab (non-blocking: the results load while we keep scraping)."""
+        if not self.warmup_enabled or (self.api and self.api.ready()):
+            return False
+        hint = self.next_keyword() if callable(self.next_keyword) else self.next_keyword
+        # 提示可以是关键词，或 (关键词, 类别)（多类别轮转时下一个关键词可能属于另一个类别）
+        keyword, category = hint if isinstance(hint, tuple) else (hint, self.category)
+        if not keyword or (keyword, category) in ((self.standby_keyword, self.standby_category),
+                                                  (self._current_keyword, self.category)):
+            return False
+        try:
+            if self.standby is None or self.standby.is_closed():
+                self.standby = self.context.new_page()
+                self.standby.goto(self.base_url, timeout=60000)
+                self.standby.wait_for_load_state("networkidle")
+            if not self._ensure_category(self.standby, category):
+                raise RuntimeError(f"could not select category '{category}'")
+            if not self._submit_keyword(self.standby, keyword):
+                raise RuntimeError("search input missing in standby tab")
+        except Exception as e:
+            print(f"[Warmup] Standby tab unavailable ({e}).")
+            self._close_standby()
+            return False
+        if self.standby_keyword:
+            self.warmup_stats["wasted"] += 1
+        self.standby_keyword = keyword
+        self.standby_category = category
+        self._standby_at = time.time()
+        self._prefetch_at = self._standby_at  # 这次搜索请求同样计入限速预算（见 _pace_after_prefetch）
+        self.warmup_stats["started"] += 1
+        print(f"[Warmup] Searching next keyword '{keyword}' in the standby tab.")
+        return True
+
+    def _take_standby(self, keyword, settle_s=5, timeout_s=15):
+        """If the standby tab already searched `keyword`, make it the list tab (the old one becomes the standby)."""
+        if self.standby is None or (self.standby_keyword, self.standby_category) != (keyword, self.category):
+            if self.standby_keyword:
+                self.warmup_stats["wasted"] += 1
+                self.standby_keyword = None
+            return False
+        try:
+            if self.standby.is_closed():
+                raise RuntimeError("standby tab closed")
+            # 与 search() 的固定等待一致：提交后至少 settle_s 秒，且加载遮罩已消失
+            wait = settle_s - (time.time() - self._standby_at)
+            if wait > 0:
+                self.standby.wait_for_timeout(wait * 1000)
+            deadline = time.time() + timeout_s
+            while self.standby.locator(".el-loading-mask:visible").count() > 0:
+                if time.time() > deadline:
+                    raise RuntimeError(f"results still loading after {settle_s + timeout_s}s")
+                self.standby.wait_for_timeout(300)
+        except Exception as e:
+            print(f"[Warmup] Standby tab for '{keyword}' not usable ({e}). Searching in the main tab.")
+            self._close_standby()
+            return False
+        self.page, self.standby = self.standby, self.page
+        self.standby_keyword = None
+        self.page.bring_to_front()
+        self._close_overlays()
+        self.warmup_stats["used"] += 1
+        return True
+
+    def _close_standby(self):
+        if self.standby is not None:
+            try: self.standby.close()
+            except: pass
+        self.standby = None
+        self.standby_keyword = None
+
+    def _api_call(self, fn, *args):
+        """One API call; on rejection refresh the borrowed credentials and retry once."""
+        try:
+            return fn(*args)
+        except ApiRejected as e:
+            print(f"[API] Rejected ({e}). Refreshing browser cookies and retrying...")
+            self.limiter.record_block()
+            self.api.refresh(self.context)
+            time.sleep(self.limiter.get_backoff_wait(1))
+            return fn(*args)
+
+    def _api_paced(self, fn, *args):
+        """One API request at least one limiter delay after the previous one, whichever thread (main / list prefetch) sent it."""
+        with self._api_pace_lock:
+            wait = self._api_last_at + self.limiter.get_delay() - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                return fn(*args)
+            finally:
+                self._api_last_at = time.time()
+
+    def _search_via_api(self, keyword, max_pages, skip_dedupe=False):
+        """
+        Direct-API version of the page loop (same yields as search()).
+        Returns True when the keyword is finished, False if the API rejected us and the
+        browser engine must take over (already-yielded rows are skipped there by dedupe).
+        """
+        print(f"[API] Searching '{keyword}' via direct API...")
+        self.current_discovered = set()
+        if self.api.client is None:
+            self.api.borrow(self.context)
+        try:
+            rows, total = self._api_call(self.api.fetch_list, keyword, 1)
+        except ApiRejected as e:
+            print(f"[API] List call rejected after refresh ({e}).")
+            self.api.suspend()
+            return False
+
+        page_size = len(rows) or self.page_size  # 服务端若封顶每页条数，以实际返回为准
+        self.last_total_records = total
+        self.last_total_pages = (total + page_size - 1) // page_size if total else 0
+        if total:
+            print(f"[Scraper] 📊 Total records on site: {total} ({self.last_total_pages} pages)")
+        if self.coverage and not skip_dedupe:
+            self.coverage.begin(keyword, total, page_size=page_size)
+
+        SITE_PAGE_LIMIT = 1000
+        page = 1
+        effective_pages = 0
+        prefetcher = ThreadPoolExecutor(max_workers=1) if self.prefetch_enabled else None
+        pending = None
+        try:
+            while rows and effective_pages < max_pages and page <= SITE_PAGE_LIMIT:
+                items = []
+                if self.archive:
+                    self.archive.record_list([self.api.map_row(r) for r in rows], keyword=keyword,
+                                            category=self.partition.id)
+                # 预取：本页详情请求期间，后台线程先取下一页列表（httpx.Client 可跨线程共用）
+                if prefetcher and len(rows) >= page_size and not (self.last_total_pages and page >= self.last_total_pages):
+                    pending = prefetcher.submit(self._api_paced, self.api.fetch_list, keyword, page + 1)
+                    self.prefetch_stats["started"] += 1
+                try:
+                    for row in rows:
+                        base_info = self.api.map_row(row)
+                        is_duplicate = None if skip_dedupe else self._is_duplicate(base_info)
+                        self._harvest_prefix(base_info.get('licenseNum', ''), duplicate=is_duplicate)
+                        if self.coverage:
+                            self.coverage.observe(is_duplicate)
+                        if self.incremental:
+                            self.incremental.observe(base_info, is_duplicate)
+                        if is_duplicate:
+                            continue
+                        if self.list_only:
+                            self._queue_enrichment(base_info)
+                            continue
+
+                        payload = self._api_call(self._api_paced, self.api.fetch_detail, row, base_info)
+                        raw = self.api.map_detail(payload)
+                        final_item = merge_list_info({k: clean_detail_value(k, v) for k, v in raw.items()}, base_info)
+
+                        if has_detail_payload(final_item):
+                            items.append(final_item)
+                            if final_item.get('licenseNum'):
+                                self.existing_licenses.add(final_item['licenseNum'].strip())
+                            if final_item.get('entName'):
+                                self.existing_names.add(final_item['entName'].strip())
+                            if self.resolver:
+                                self.resolver.add(final_item.get('entName'), final_item.get('licenseNum'))
+                            self.limiter.record_success()
+                            if self.archive:
+                                self.archive.record_detail(final_item.get('licenseNum') or base_info.get('licenseNum'),
+                                                           base_info, fields=raw, payload=payload, keyword=keyword,
+                                                           category=self.partition.id)
+                        else:
+                            self._log_failure(base_info, "Empty Detail payload dropped (API)")
+                except ApiRejected as e:
+                    print(f"[API] Detail call rejected after refresh ({e}).")
+                    self.api.suspend()
+                    if items or self.current_discovered:
+                        yield (items, list(self.current_discovered))
+                    return False
+
+                print(f"[API] Page {page}: {len(items)} new record(s) of {len(rows)}")
+                if self.discovery:
+                    self.discovery.flush()
+                if self.resolver:
+                    self.resolver.flush()
+                if self.enrichment:
+                    self.enrichment.flush()
+                stop_early = self._stop_paging(keyword)
+                if items or self.current_discovered:
+                    yield (items, list(self.current_discovered))
+                    self.current_discovered = set()
+                    if items:
+                        effective_pages += 1
+                if stop_early:
+                    break
+                if len(rows) < page_size or (self.last_total_pages and page >= self.last_total_pages):
+                    self.last_search_exhaustive = True
+                    break
+                page += 1
+                rows = None
+                if pending is not None:
+                    try:
+                        rows, _ = pending.result()
+                        self.prefetch_stats["swapped"] += 1
+                    except ApiRejected:
+                        self.prefetch_stats["missed"] += 1  # 凭据刷新只能在主线程做：下面重试
+                    pending = None
+                if rows is None:
+                    try:
+                        rows, _ = self._api_call(self._api_paced, self.api.fetch_list, keyword, page)
+                    except ApiRejected as e:
+                        print(f"[API] List call rejected after refresh ({e}).")
+                        self.api.suspend()
+                        return False
+            else:
+                # 循环条件不成立：没有更多行才算翻完（达到 max_pages / 1000 页上限不算）
+                self.last_search_exhaustive = not rows
+        finally:
+            if prefetcher:
+                prefetcher.shutdown(wait=False)
+        return True
+
+    def _stop_paging(self, keyword):
+        """
+        After each page: True when the incremental cursor reached its watermark (or found the list unordered),
+        or the coverage estimator is confident further pages hold no new enterprises.
+        """
+        if self.incremental:
+            stop, reason = self.incremental.end_page()
+            if stop:
+                print(f"[Incremental] Stopping '{keyword}': {reason}")
+                return True
+        if not self.coverage:
+            return False
+        stop, reason = self.coverage.should_stop()
+        if stop:
+            print(f"[Coverage] Stopping '{keyword}' early: {reason}")
+        return stop
 
     def _read_pagination_info(self):
         """读取分页栏的 '共 XX 条' 和总页数，存入实例属性供 main.py 使用"""
@@ -267,12 +964,48 @@ class NMPAScraper:
                 match = _re.search(r'(\d+)', total_text.replace(',', '').replace(' ', ''))
                 if match:
                     self.last_total_records = int(match.group(1))
-                    # 每页10条，计算总页数
-                    self.last_total_pages = (self.last_total_records + 9) // 10
+                    # 按实际每页条数计算总页数
+                    self.last_total_pages = (self.last_total_records + self.page_size - 1) // self.page_size
                     print(f"[Scraper] 📊 Total records on site: {self.last_total_records} ({self.last_total_pages} pages)")
         except Exception as e:
             print(f"[Scraper] Could not read pagination info: {e}")
 
+    def _select_page_size(self):
+        """
+        Switch the el-pagination sizes selector to the largest option (config.LIST_PAGE_SIZE:
+        "max", an upper bound in rows, or None to keep the site default). Returns the active rows per page.
+        """
+        want = getattr(config, 'LIST_PAGE_SIZE', None)
+        try:
+            sizes = self.page.locator(".el-pagination__sizes input").first
+            if sizes.count() == 0:
+                return self.page_size
+            self.page_size = _parse_page_size(sizes.input_value()) or self.page_size
+            if not want:
+                return self.page_size
+            sizes.click(timeout=3000)
+            self.page.wait_for_timeout(500)
+            options = self.page.locator(".el-select-dropdown__item:visible").filter(has_text="条")
+            offered = {}
+            for i in range(options.count()):
+                n = _parse_page_size(options.nth(i).inner_text())
+                if n:
+                    offered[n] = options.nth(i)
+            limit = want if isinstance(want, int) else max(offered or [self.page_size])
+            target = max([n for n in offered if n <= limit] or [self.page_size])
+            if target == self.page_size:
+                self.page.keyboard.press("Escape")
+                return self.page_size
+            offered[target].click(timeout=3000)
+            time.sleep(3)  # 列表按新的每页条数重新加载
+            self.page_size = _parse_page_size(sizes.input_value()) or target
+            print(f"[Scraper] 📏 Page size set to {self.page_size} rows (offered: {sorted(offered)})")
+        except Exception as e:
+            print(f"[Scraper] Could not change page size: {e}")
+            try: self.page.keyboard.press("Escape")
+            except: pass
+        return self.page_size
+
     def _recover_meltdown(self, keyword, target_page):
         """
         Recover from a hard block:
@@ -288,7 +1021,20 @@ class NMPAScraper:
         # Deep sleep to cool down IP
         time.sleep(120)
         
-        # Close extra tabs
+        self._restore_search(keyword, target_page)
+        print(f"[🔥 MELTDOWN] Recovery complete. Resuming scraping.")
+
+    def _restore_search(self, keyword, target_page):
+        """
+        Re-create the search state from scratch (after a meltdown or a browser recycle):
+        close extra tabs, navigate to base URL, pick category, search again, then
+        jump/fast-forward to target_page.
+        """
+        # Close extra tabs (including the prefetch shadow tab and the warm-up standby tab)
+        self.shadow = None
+        self.shadow_target = None
+        self.standby = None
+        self.standby_keyword = None
         while len(self.context.pages) > 1:
             try: self.context.pages[-1].close()
             except: pass
@@ -297,9 +1043,9 @@ class NMPAScraper:
             self.page = self.context.pages[0]
             self.page.bring_to_front()
         
-        print(f"[🔥 MELTDOWN] Restarting search for '{keyword}'...")
+        print(f"[Restore] Restarting search for '{keyword}'...")
         try:
-            self.page.goto(BASE_URL, timeout=60000)
+            self.page.goto(self.base_url, timeout=60000)
             self.page.wait_for_load_state("networkidle")
         except:
             self.page.reload()
@@ -308,33 +1054,21 @@ class NMPAScraper:
         time.sleep(1)
         
         # Category
-        category_target = "医疗器械经营企业（备案）"
-        try:
-            self.page.click('input[placeholder="请选择"]', timeout=3000)
-            time.sleep(1)
-            self.page.locator(f".el-select-dropdown__item:has-text('{category_target}')").filter(has=self.page.locator(":visible")).first.click(timeout=5000)
-            time.sleep(1)
-        except: pass
+        self._ensure_category(self.page)
         
         # Search
         try:
-            input_locator = self.page.locator('input[placeholder*="企业名称"]')
-            if input_locator.count() > 0:
-                input_locator.fill(keyword)
-                time.sleep(0.5)
-                self.page.keyboard.press("End")
-                self.page.keyboard.press("Space")
-                self.page.keyboard.press("Backspace")
-                time.sleep(0.5)
-                self.page.keyboard.press("Enter")
+            self._submit_keyword(self.page, keyword)
         except: pass
         
-        print(f"[🔥 MELTDOWN] Waiting for initial results...")
+        print(f"[Restore] Waiting for initial results...")
         time.sleep(5)
+        # 页码按之前选定的每页条数计算：先恢复每页条数再跳页
+        self._select_page_size()
         
         # Jump or Fast-Forward
         if target_page > 1:
-            print(f"[🔥 MELTDOWN] Fast-forwarding back to page {target_page}...")
+            print(f"[Restore] Fast-forwarding back to page {target_page}...")
             
             # Attempt direct jump if jump input exists
             jump_input = self.page.locator("span.el-pagination__jump input").first
@@ -343,20 +1077,20 @@ class NMPAScraper:
                     jump_input.fill(str(target_page))
                     time.sleep(0.5)
                     jump_input.press("Enter")
-                    print(f"[🔥 MELTDOWN] Triggered direct pagination jump to page {target_page}.")
+                    print(f"[Restore] Triggered direct pagination jump to page {target_page}.")
                     time.sleep(3)
                     return
                 except:
-                    print(f"[🔥 MELTDOWN] Direct jump failed. Falling back to next clicking...")
+                    print(f"[Restore] Direct jump failed. Falling back to next clicking...")
                     
             # Fallback to next clicking
             for p in range(1, target_page):
                 if p % 10 == 0:
-                    print(f"[🔥 MELTDOWN] Fast-forward progress: {p}/{target_page}...")
+                    print(f"[Restore] Fast-forward progress: {p}/{target_page}...")
                 if not self.go_to_next_page():
                     break
                 time.sleep(1.5)
-        print(f"[🔥 MELTDOWN] Recovery complete. Resuming scraping.")
+        print(f"[Restore] Search restored. Resuming scraping.")
 
     def _close_overlays(self):
         """Attempt to close known overlays/popups."""
@@ -373,14 +1107,78 @@ class NMPAScraper:
                     time.sleep(0.5)
         except: pass
 
-    def _scrape_with_details(self, skip_dedupe=False):
-        """Find rows, open detail tabs using hardware-emulated clicks, scrape, close."""
+    def _harvest_prefix(self, lic_text, duplicate=None):
+        """
+        Extract the regulator identifier (e.g. 京朝食药监械经营备案) from a license number into current_discovered.
+        With the discovery engine on, the row is also counted in the prefix table (new vs already-in-DB).
+        """
+        if not lic_text:
+            return
+        try:
+            if self.discovery:
+                prefix = self.discovery.observe(lic_text, self._current_keyword, duplicate)
+            else:
+                prefix = extract_prefix(lic_text)
+        except Exception:
+            return
+        if prefix:
+            self.current_discovered.add(prefix)
+
+    def _queue_enrichment(self, base_info):
+        """List-only mode: park a new row for the enrichment stage and treat it as known for this session."""
+        lic = base_info.get('licenseNum', '')
+        extract = self.discovery.extract if self.discovery else extract_prefix
+        self.enrichment.add(base_info, self._current_keyword, extract(lic) if lic else None)
+        if lic:
+            self.existing_licenses.add(lic.strip())
+        if base_info.get('entName'):
+            self.existing_names.add(base_info['entName'].strip())
+
+    def _is_duplicate(self, base_info):
+        """Loose dedupe against the DB snapshot: exact license, exact name, or truncated-name prefix."""
+        curr_lic = base_info.get('licenseNum', '').strip()
+        curr_name = base_info.get('entName', '').strip()
+
+        # Check by license number (exact match)
+        if curr_lic and curr_lic in self.existing_licenses:
+            return True
+        
+        # Check by name (support truncated names with "...")
+        if curr_name:
+            # If list page name is truncated (ends with "..."), match by prefix
+            if curr_name.endswith('...'):
+                name_prefix = curr_name[:-3].strip()  # Remove "..."
+                # Check if any existing name starts with this prefix
+                for existing_name in self.existing_names:
+                    if existing_name.startswith(name_prefix):
+                        print(f"[Dedupe] Truncated match: '{curr_name}' → '{existing_name}'")
+                        return True
+            else:
+                # Exact name match
+                if curr_name in self.existing_names:
+                    return True
+        # 近似重复：名称变体（全半角括号 / 公司后缀 / 分支机构）或同一编号改名
+        if self.resolver and (curr_name or curr_lic):
+            match = self.resolver.lookup(curr_name, curr_lic)
+            if match:
+                print(f"[Entity] '{curr_name}' ≈ '{match['name']}' ({match['reason']}, {match['score']:.2f})")
+                self.resolver.record_match(curr_name, curr_lic, self._current_keyword, match)
+                return self.entity_action == "skip"
+        return False
+
+    def _scrape_with_details(self, skip_dedupe=False, settled=False):
+        """
+        Find rows, open detail tabs using hardware-emulated clicks, scrape, close.
+        settled: the list was already loaded (prefetched in the shadow tab), skip the render wait.
+        """
         items = []
+        list_rows = []  # 本页所有行的列表信息（含重复行），供归档回放重新发现前缀
         try:
             # 1. WAIT FOR DATA (Crucial: AJAX might be slow)
             # 🔧 FIX: 不再用 wait_for_selector —— 已确认会破坏 Vue 状态
             # 用 time.sleep 替代，等待数据渲染
-            time.sleep(2)
+            if not settled:
+                time.sleep(2)
 
             # 2. Find all potential rows
             rows = self.page.locator("tr").all()
@@ -402,63 +1200,32 @@ class NMPAScraper:
                     cols = row.locator("td").all()
                     if len(cols) >= 3:
                         # 0序号, 1编号, 2企业名称
-                        lic_text = cols[1].inner_text().strip().replace(" ", "").replace("\t", "").replace("\n", "")
+                        lic_text = compact_text(cols[1].inner_text())
                         base_info['licenseNum'] = lic_text
                         
-                        ent_name = cols[2].inner_text().strip().replace(" ", "").replace("\t", "").replace("\n", "")
+                        ent_name = compact_text(cols[2].inner_text())
                         base_info['entName'] = ent_name
-                        
-                        # DYNAMIC KEYWORD HARVESTING (User Request)
-                        # Extract the regulator identifier (e.g. 京朝食药监械经营备案)
-                        # Harvesting happens for ALL rows, even duplicates, to build the full discovery map.
-                        if lic_text:
-                            # 🔧 改进正则：匹配到括号或数字就停止
-                            # 例如：银审服械备字〈2020〉 → 银审服械备字
-                            prefix_match = re.search(r'^([^0-9()（）〈〉﹝﹞\[\]【】<>《》]+)', lic_text)
-                            if prefix_match:
-                                prefix = prefix_match.group(1).strip()
-                                # 🔧 FIX: 去除所有空格 (例如 "粤江 食药监械经营备" -> "粤江食药监械经营备")
-                                # 🔧 FIX: 去除偶尔出现的 "备案号：" 前缀 (爬虫有时会误把标签抓进来)
-                                prefix = prefix.replace(" ", "").replace("\t", "").replace("\n", "") \
-                                               .replace("备案号", "").replace("：", "").replace(":", "")
-                                
-                                # 去掉可能残留的年份部分
-                                prefix = re.split(r'20\d\d|20[012]\d', prefix)[0].strip()
-                                # 🔧 最终验证：长度>1 且 不含特殊字符
-                                if len(prefix) > 1 and prefix.replace('药监械经营备', '').replace('食', '').replace('市监械经营备', ''):
-                                    self.current_discovered.add(prefix)
+                        list_rows.append(dict(base_info))
                 except: pass
 
                 # Duplication Check (Loose Coupling with Truncation Support)
                 # Skip check during repair phase to allow re-scraping same-named records
-                is_duplicate = False
-                if not skip_dedupe:
-                    curr_lic = base_info.get('licenseNum', '').strip()
-                    curr_name = base_info.get('entName', '').strip()
-
-                    # Check by license number (exact match)
-                    if curr_lic and curr_lic in self.existing_licenses:
-                        is_duplicate = True
-                    
-                    # Check by name (support truncated names with "...")
-                    if not is_duplicate and curr_name:
-                        # If list page name is truncated (ends with "..."), match by prefix
-                        if curr_name.endswith('...'):
-                            name_prefix = curr_name[:-3].strip()  # Remove "..."
-                            # Check if any existing name starts with this prefix
-                            for existing_name in self.existing_names:
-                                if existing_name.startswith(name_prefix):
-                                    is_duplicate = True
-                                    print(f"[Dedupe] Truncated match: '{curr_name}' → '{existing_name}'")
-                                    break
-                        else:
-                            # Exact name match
-                            if curr_name in self.existing_names:
-                                is_duplicate = True
+                is_duplicate = None if skip_dedupe else self._is_duplicate(base_info)
+
+                # DYNAMIC KEYWORD HARVESTING (User Request)
+                # Harvesting happens for ALL rows, even duplicates, to build the full discovery map.
+                self._harvest_prefix(base_info.get('licenseNum', ''), duplicate=is_duplicate)
+                if self.coverage and base_info:
+                    self.coverage.observe(is_duplicate)
+                if self.incremental and base_info:
+                    self.incremental.observe(base_info, is_duplicate)
 
                 if is_duplicate:
-                     print(f"[Scraper] Skipping: {curr_name} (Already in DB)")
+                     print(f"[Scraper] Skipping: {base_info.get('entName', '').strip()} (Already in DB)")
                      continue
+                if self.list_only:
+                    self._queue_enrichment(base_info)
+                    continue
                 
                 # Find detail button (Strategy: Text -> Class -> Last Column)
                 btn = row.locator("button, a, .el-button, span").filter(has_text="详情").first
@@ -477,58 +1244,19 @@ class NMPAScraper:
                     btn = row.locator("td").nth(2).locator("div, span, a").first 
                 
                 if btn.count() > 0:
+                    self._pace_after_prefetch()
                     detail_success = False
+                    row_started = time.time()
                     for attempt in range(3):
                         try:
-                            initial_page_count = len(self.context.pages)
                             print(f"[Scraper] Row {i}: Opening '{base_info.get('entName', 'Unknown')}'...")
                             
-                            detail_page = None
-                            # 🔧 FIX: 不再用硬件鼠标模拟 —— 已确认会导致详情页白屏
-                            # 也不再用 scroll_into_view —— 已确认会干扰 Vue 状态
-                            with self.context.expect_page(timeout=10000) as new_page_info:
-                                btn.click(force=True)
-                            detail_page = new_page_info.value
-                            
-                            if not detail_page and len(self.context.pages) > initial_page_count:
-                                detail_page = self.context.pages[-1]
+                            detail_page, opened_at = self._open_detail(btn, base_info)
 
                             if detail_page:
                                 try:
-                                    detail_page.bring_to_front()
-                                    detail_page.wait_for_load_state("domcontentloaded")
-                                    
-                                    # 🔧 FIX: 柔性等待，模仿测试脚本的前置缓冲
-                                    time.sleep(2.0)
-                                    
-                                    # Content Polling (渐进式重试 10秒)
-                                    data_ready = False
-                                    for _ in range(20):
-                                        try:
-                                            # 使用更严格的数据判定（只看<tr>数量不够，需要检查是否有实质文本）
-                                            if detail_page.locator("tr").count() > 5:
-                                                # 🔧 响应架构师审计：采用“白名单特征确认”替代“黑名单排除法”
-                                                has_val = detail_page.evaluate("""() => {
-                                                    const rows = Array.from(document.querySelectorAll('tr'));
-                                                    for (let row of rows) {
-                                                        const cells = row.querySelectorAll('td');
-                                                        if (cells.length >= 2) {
-                                                            const label = cells[0].innerText.trim();
-                                                            const value = cells[1].innerText.trim();
-                                                            // 🔧 FIX: 增加脏数据过滤，防止 Vue 吐出 "无" 或 "******" 被当做正常数据
-                                                            if ((label.includes("名称") || label.includes("代表人") || label.includes("范围") || label.includes("方式") || label.includes("部门")) && value.length > 2) {
-                                                                // 排除无意义的高频空值
-                                                                if (!value.includes("无") && !value.includes("***")) {
-                                                                    return true;
-                                                                }
-                                                            }
-                                                        }
-                                                    }
-                                                    return false;
-                                                }""")
-                                                if has_val: data_ready = True; break
-                                        except: pass
-                                        time.sleep(0.5)
+                                    data_ready, block_reason = self._wait_detail_ready(detail_page, opened_at, buffer_s=2.0)
+                                    signal_penalized = bool(block_reason)
                                     
                                     # Persistent Reload Strategy -> Changed to "Close & Re-Click"
                                     reload_attempts = 0
@@ -536,48 +1264,25 @@ class NMPAScraper:
                                         reload_attempts += 1
                                         
                                         # Tell the brain we failed (延迟到第 3 次连败才判定为真・封锁)
-                                        if reload_attempts == 3: self.limiter.record_block()
+                                        # 网络层信号已经即时惩罚过的，不重复记账
+                                        if reload_attempts == 3 and not signal_penalized: self.limiter.record_block()
                                         
                                         # 🔧 FIX: 恢复用户要求的原版长时惩罚（才能越过防火墙拦截期）
                                         wait_time = self.limiter.get_backoff_wait(reload_attempts)
-                                        print(f"[SmartLimiter] BLANK page! Penalty Base: {self.limiter.current_base:.1f}s. Waiting {wait_time:.1f}s (Attempt {reload_attempts}/7)...")
+                                        reason_note = f" [{block_reason}]" if block_reason else ""
+                                        print(f"[SmartLimiter] BLANK page!{reason_note} Penalty Base: {self.limiter.current_base:.1f}s. Waiting {wait_time:.1f}s (Attempt {reload_attempts}/7)...")
                                         
-                                        try: detail_page.close()
-                                        except: pass
+                                        self._dispose_detail(detail_page, discard=True)  # 白屏标签页不复用，重开新标签
                                         time.sleep(wait_time)
                                         
                                         try:
-                                            # 用回原来的按钮去点击
+                                            # 用回原来的按钮去点击（复用模式下重新加载详情 URL）
                                             print(f"[Scraper] Re-clicking details button...")
-                                            with self.context.expect_page(timeout=10000) as re_page_info:
-                                                btn.click(force=True)
-                                            detail_page = re_page_info.value
-                                            detail_page.bring_to_front()
-                                            detail_page.wait_for_load_state("domcontentloaded")
-                                            time.sleep(1.0) # 缩减重新点开的无谓等待
-
+                                            detail_page, opened_at = self._open_detail(btn, base_info)
                                             
-                                            # Re-check data (渐进式重试 10秒)
-                                            for _ in range(20):
-                                                if detail_page.locator("tr").count() > 5:
-                                                    has_val = detail_page.evaluate("""() => {
-                                                        const rows = Array.from(document.querySelectorAll('tr'));
-                                                        for (let row of rows) {
-                                                            const cells = row.querySelectorAll('td');
-                                                            if (cells.length >= 2) {
-                                                                const label = cells[0].innerText.trim();
-                                                                const value = cells[1].innerText.trim();
-                                                                if ((label.includes("名称") || label.includes("代表人") || label.includes("范围") || label.includes("方式") || label.includes("部门")) && value.length > 2) {
-                                                                    if (!value.includes("无") && !value.includes("***")) {
-                                                                        return true;
-                                                                    }
-                                                                }
-                                                            }
-                                                        }
-                                                        return false;
-                                                    }""")
-                                                    if has_val: data_ready = True; break
-                                                time.sleep(0.5)
+                                            # Re-check data (缩减重新点开的无谓等待)
+                                            data_ready, block_reason = self._wait_detail_ready(detail_page, opened_at, buffer_s=1.0)
+                                            signal_penalized = signal_penalized or bool(block_reason)
                                         except Exception as e_rel:
                                             print(f"[Warning] Re-click attempt {reload_attempts} failed: {e_rel}")
 
@@ -593,37 +1298,33 @@ class NMPAScraper:
                                     
                                     if not detail_item:
                                         print(f"[Scraper] Extraction failed (Incomplete data) for: {base_info.get('entName')}. Fast Retrying...")
-                                        try: detail_page.close()
-                                        except: pass
+                                        self._dispose_detail(detail_page)
                                         time.sleep(1.0) # 仅需短暂缓冲，快速重开刷新 Vue 状态
                                         continue # Go to next attempt for this row
 
-                                    # Use DETAIL page data as authoritative (has full names, not truncated)
-                                    # Only fall back to list page if detail is missing
-                                    final_item = detail_item.copy()
-                                    # Fill in any missing fields from list page
-                                    for key, value in base_info.items():
-                                        if key not in final_item or not final_item.get(key):
-                                            final_item[key] = value
-                                    
-                                    # IMPORTANT: Always use detail page entName if available (it's complete)
-                                    # List page names may be truncated with "..."
-                                    if detail_item.get('entName'):
-                                        final_item['entName'] = detail_item['entName']
+                                    # Use DETAIL page data as authoritative; list page only fills gaps
+                                    final_item = merge_list_info(detail_item, base_info)
                                     
                                     # Double Check: Ensure we have a REAL detail payload (Defend against silent WAF packet drop)
                                     # 要求至少存在法人、负责人或经营方式中任意一项，且非极短无效字符
-                                    def is_valid(val): return bool(val and len(str(val).strip()) > 1 and str(val).strip() not in ("无", "***", "暂无", "空"))
-                                    
-                                    if is_valid(final_item.get('legalRep')) or is_valid(final_item.get('resPerson')) or is_valid(final_item.get('opMode')):
+                                    if has_detail_payload(final_item):
                                         items.append(final_item)
                                         # Update Dedupe Set immediately to prevent re-scraping in same session
                                         if final_item.get('licenseNum'):
                                             self.existing_licenses.add(final_item['licenseNum'].strip())
                                         if final_item.get('entName'):
                                             self.existing_names.add(final_item['entName'].strip())
+                                        if self.resolver:
+                                            self.resolver.add(final_item.get('entName'), final_item.get('licenseNum'))
                                         
                                         print(f"[Scraper] Captured: {final_item['entName']}")
+                                        if self.api:
+                                            self.api.learn_fields(final_item, self.intercepted_data)
+                                        if self.archive:
+                                            self.archive.record_detail(final_item.get('licenseNum') or base_info.get('licenseNum'),
+                                                                       base_info, pairs=self._last_detail_pairs, keyword=self._current_keyword,
+                                                                       category=self.partition.id)
+                                        self.detail_metrics.note_row(time.time() - row_started)
                                         # Tell the brain we won
                                         self.limiter.record_success()
                                         detail_success = True
@@ -638,12 +1339,8 @@ class NMPAScraper:
                                     break
                                     
                                 finally:
-                                    # CRITICAL: Always close detail page to prevent tab accumulation
-                                    try:
-                                        detail_page.close()
-                                        print(f"[Scraper]Detail page closed.")
-                                    except:
-                                        pass 
+                                    # CRITICAL: Always close (or reset pooled) detail page to prevent tab accumulation
+                                    self._dispose_detail(detail_page)
                             else:
                                 print(f"[Detail Retry {attempt+1}/3] No tab found.")
                         except Exception as e:
@@ -653,6 +1350,8 @@ class NMPAScraper:
                                 raise e
                             time.sleep(2)
                     
+                    if not detail_success:
+                        self.detail_metrics.note_row(time.time() - row_started, success=False)
                     if not detail_success and base_info.get('entName'):
                         print(f"[Scraper] Failed details for: {base_info['entName']}. Item will NOT be saved to avoid ghost records.")
                         self._log_failure(base_info, "Extraction Failed / Closed unexpectedly")
@@ -662,71 +1361,28 @@ class NMPAScraper:
             # 🚨 致命修复：如果是 IP 封锁引起的持续白屏（ABORT异常），必须向上抛出，阻断整个爬虫！
             if "ABORT:" in str(e):
                 raise e
+        finally:
+            if self.archive and list_rows:
+                self.archive.record_list(list_rows, keyword=self._current_keyword, category=self.partition.id)
         return items
 
     def _extract_detail_fields(self, page):
         """Parse the table using strict Key-Value pairing with fuzzy match and retry logic."""
         item = {}
+        self._last_detail_pairs = []
         # Retry up to 3 times if essential data is missing (Async Rendering)
         for attempt in range(3):
             try:
-                # Refresh element list on each attempt
-                rows = page.locator("tr").all()
-                if not rows:
+                # 一次 evaluate 取出全部 (标签, 值)，解析交给纯函数 parse_detail_pairs
+                pairs = page.evaluate(DETAIL_PAIRS_JS)
+                if not pairs:
                     time.sleep(1)
                     continue
 
-                item = {} # Reset
-                key_map = {
-                    "编号": "licenseNum", "企业名称": "entName", "法定代表人": "legalRep",
-                    "企业负责人": "resPerson", "住所": "entAddress", "经营场所": "opAddress",
-                    "经营方式": "opMode", "经营范围": "scope", 
-                    "备案部门": "filingDept", "备案日期": "filingDate"
-                }
+                item = parse_detail_pairs(pairs)
+                self._last_detail_pairs = pairs
                 
-                for row in rows:
-                    cells = row.locator("td").all()
-                    if len(cells) >= 2:
-                        raw_label = cells[0].inner_text()
-                        # Normalize label: Remove spaces, colons, newlines
-                        compact_label = raw_label.replace(" ", "").replace("　", "").replace("：", "").replace(":", "").replace("\n", "").strip()
-                        val = cells[1].inner_text().strip()
-                        
-                        if compact_label in key_map:
-                            field_key = key_map[compact_label]
-                            
-                            # 🧹 数据清洗：过滤无效的法人/负责人值
-                            if field_key in ("legalRep", "resPerson"):
-                                import re
-                                # 1. 去除括号前缀，如 "(负责人)陈泓" -> "陈泓"
-                                val = re.sub(r'^[\(（][^)）]*[\)）]', '', val).strip()
-                                # 2. 去除括号后缀，如 "罗焯(总公司)" -> "罗焯"
-                                val = re.sub(r'[\(（][^)）]*[\)）]$', '', val).strip()
-                                
-                                # 3. 过滤无效值
-                                invalid_values = {"无", "无此项", "无法人", "-", "/", "\\", "——", "—", "暂无", "无数据", "空", "null", "NULL", "N/A", "n/a"}
-                                if val in invalid_values:
-                                    val = ""
-                                # 4. 只要包含*就不存
-                                elif "*" in val:
-                                    val = ""
-
-                            # 🧹 数据清洗：过滤无效的地址 (新增请求)
-                            # 已移除 warehouseAddr (库房地址)，不再采集
-                            if field_key in ("entAddress", "opAddress"):
-                                invalid_addr = {"无", "无此项", "暂无", "无数据", "不适用", "未填写", "-", "/", "//", "\\", "——", "—", ".", "null", "NULL", "N/A", "n/a"}
-                                if val in invalid_addr:
-                                    val = ""
-                                # 地址如果全是星号，或者包含 "无" 且长度极短 (<4)
-                                elif set(val) == {'*'} or ( "*" in val and len(val) < 5 ): 
-                                    val = ""
-                                elif "无" in val and len(val) < 4 and "市" not in val and "县" not in val:
-                                    val = ""
-                            
-                            item[field_key] = val
-                
-                # Validation: Require at least Name, License AND identity data
-                if item.get("entName") and item.get("licenseNum") and (item.get("legalRep") or item.get("resPerson")):
+                if is_complete(item):
                     break 
                 else:
                     print(f"[Parser] Attempt {attempt+1}: Identity data missing. Retrying...")
@@ -825,7 +1481,39 @@ class NMPAScraper:
         except: pass
 
     def close(self):
+        self.limiter.save_state()
+        if self.router:
+            print(f"[Router] Session savings: {self.router.summary()}")
+        if self.archive:
+            self.archive.close()
+        for part in self.partitions.values():
+            if part.discovery:
+                print(f"[Discovery] {part.id}: {part.discovery.report()}")
+                part.discovery.close()
+            if part.resolver:
+                print(f"[Entity] {part.id}: {part.resolver.stats}")
+                part.resolver.close()
+        if self.coverage:
+            print(f"[Coverage] Session: {self.coverage.stats}")
+        if self.prefetch_enabled:
+            print(f"[Prefetch] Session: {self.prefetch_stats}")
+            self._close_shadow()
+        if self.warmup_enabled:
+            print(f"[Warmup] Session: {self.warmup_stats}")
+            self._close_standby()
+        if self.enrichment:
+            print(f"[Enrichment] Pending table: {self.enrichment.stats()}")
+            self.enrichment.close()
+        if self.api:
+            print(f"[API] Session: {self.api.stats}")
+            self.api.close()
+        if self.detail_tabs:
+            print(f"[DetailTabs] Session: {self.detail_tabs.stats()}")
+            self.detail_tabs.close()
+        else:
+            print(f"[Detail] Session: {self.detail_metrics.summary()}")
         try:
+            if self.pool: self.pool.close()
             if self.browser: self.browser.close()
             if self.playwright: self.playwright.stop()
         except: pass
@@ -0,0 +1,83 @@
+"""
+Search - 经营范围 / 地址全文检索（MySQL FULLTEXT WITH PARSER ngram）
+
+scope、address、operation_address 都是无索引的 TEXT，"经营范围包含 第三类 + 体外诊断" 只能 LIKE 全表扫描。
+这里在 InnoDB 上建 ngram 全文索引（中文无分词，按 ngram_token_size=2 的二元组切分）：
+- ft_scope (scope)、ft_address (address, operation_address)；写路径不用改，InnoDB 随 INSERT / UPDATE 同步维护
+- 查询：用户输入按空白拆成词，每个词都必须出现（BOOLEAN MODE "+词"，ngram 下即短语匹配）；
+  按 NATURAL LANGUAGE MODE 相关度排序，同分按 id；LIMIT / OFFSET 分页，可叠加地区列过滤（engine/geo.py）
+- 单字词短于 ngram 切分长度，按前缀 "+字*" 匹配；布尔运算符等特殊字符先剥掉，避免用户输入改变查询语义
+
+建索引会重建表（首个 FULLTEXT 索引需要 FTS_DOC_ID），大表请在低峰期执行 --build；
+config.FULLTEXT_INDEX = True 时 Storage.init_db 启动时自动补建。
+
+用法:
+    python -m engine.search --build
+    python -m engine.search "第三类 体外诊断" [--field scope|address] [--page 2] [--page-size 20] [--region 浙江]
+"""
+import argparse
+import re
+import time
+
+import config
+
+# 检索字段 → 全文索引名、MATCH 列（必须与索引列完全一致）
+FULLTEXT_FIELDS = {
+    "scope": ("ft_scope", "scope"),
+    "address": ("ft_address", "address, operation_address"),
+}
+NGRAM_TOKEN_SIZE = 2
+RE_OPERATORS = re.compile(r'[+\-<>()~*"@\'\\]')
+
+
+def boolean_query(text, token_size=NGRAM_TOKEN_SIZE):
+    """'第三类 体外诊断' → '+第三类 +体外诊断' (every term required); '' when nothing searchable is left."""
+    terms = []
+    for term in RE_OPERATORS.sub(" ", text or "").split():
+        terms.append(f"+{term}*" if len(term) < token_size else f"+{term}")
+    return " ".join(terms)
+
+
+def natural_query(text):
+    """Terms for relevance ranking (operators stripped)."""
+    return " ".join(RE_OPERATORS.sub(" ", text or "").split())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search over scope / addresses (MySQL ngram index)")
+    parser.add_argument("query", nargs="?", default=None)
+    parser.add_argument("--build", action="store_true", help="Create the FULLTEXT ngram indexes if missing")
+    parser.add_argument("--field", choices=sorted(FULLTEXT_FIELDS), default="scope")
+    parser.add_argument("--region", default=None, help="Province / city filter, e.g. 浙江 or 杭州")
+    parser.add_argument("--page", type=int, default=1)
+    parser.add_argument("--page-size", type=int, default=getattr(config, 'SEARCH_PAGE_SIZE', 20))
+    parser.add_argument("--table", default=None, help="Table name (default config.TABLE_NAME)")
+    args = parser.parse_args()
+
+    from database.storage import Storage
+    db = Storage(table_name=args.table)
+    try:
+        if args.build:
+            db.migrate_fulltext()
+        if not args.query:
+            return
+        province_code = city = None
+        if args.region:
+            from engine.geo import get_parser
+            province_code, city = get_parser().resolve_region(args.region)
+        started = time.perf_counter()
+        total, rows = db.search_text(args.query, field=args.field, province_code=province_code, city=city,
+                                     limit=args.page_size, offset=(args.page - 1) * args.page_size)
+        elapsed = (time.perf_counter() - started) * 1000
+        pages = max(1, -(-total // args.page_size))
+        print(f"[Search] '{args.query}' in {args.field}: {total} matches, page {args.page}/{pages} ({elapsed:.0f} ms)")
+        for row in rows:
+            text = (row.get(args.field) or "").replace("\n", " ")
+            print(f"  {row['score']:.2f}  {row['enterprise_name']} [{row.get('province') or '-'}"
+                  f"{row.get('city') or ''}]  {text[:60]}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
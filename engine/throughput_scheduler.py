@@ -0,0 +1,176 @@
+"""
+Throughput Scheduler - 按时段学习封锁容忍度，最大化 records/day
+
+从 logs/scraper_behavior.jsonl 的 heartbeat / BLOCK 事件（带 iso_time）统计每个小时的封锁率：
+- 快窗口 (fast)：历史上几乎不封 → 降低 current_base，优先跑大关键词 / 拆分子任务
+- 慢窗口 (slow)：历史上容易被封 → 提高 current_base，跑小关键词 / 自修复
+"""
+import json
+import os
+import time
+
+import config
+from engine.rate_limiter import TimeOfDayPolicy
+
+BEHAVIOR_LOG = "logs/scraper_behavior.jsonl"
+OVERFLOW_LOG = "logs/overflow_keywords.jsonl"
+
+
+class ThroughputScheduler:
+    def __init__(self, log_path=BEHAVIOR_LOG, overflow_log=OVERFLOW_LOG,
+                 fast_block_rate=None, slow_block_rate=None, min_requests=None,
+                 fast_base=None, slow_base=None, lookahead=50):
+        self.log_path = log_path
+        self.overflow_log = overflow_log
+        # 阈值单位：每 100 次请求的封锁次数
+        self.fast_block_rate = fast_block_rate if fast_block_rate is not None else getattr(config, 'SCHED_FAST_BLOCK_RATE', 0.5)
+        self.slow_block_rate = slow_block_rate if slow_block_rate is not None else getattr(config, 'SCHED_SLOW_BLOCK_RATE', 2.0)
+        self.min_requests = min_requests if min_requests is not None else getattr(config, 'SCHED_MIN_REQUESTS', 200)
+        self.fast_base = fast_base if fast_base is not None else getattr(config, 'SCHED_FAST_BASE', config.RL_MIN_WAIT)
+        self.slow_base = slow_base if slow_base is not None else getattr(config, 'SCHED_SLOW_BASE', config.RL_BASE_WAIT + 1.0)
+        self.lookahead = lookahead
+
+        self.hour_requests = [0] * 24
+        self.hour_blocks = [0] * 24
+        self.heavy_keywords = set()
+        self.learn()
+
+    # ------------------------------------------------------------------
+    # Learning
+    # ------------------------------------------------------------------
+    def learn(self):
+        """(Re)build per-hour block statistics and the heavy keyword set from logs."""
+        self.hour_requests = [0] * 24
+        self.hour_blocks = [0] * 24
+        if os.path.exists(self.log_path):
+            try:
+                with open(self.log_path, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            ev = json.loads(line)
+                        except ValueError:
+                            continue
+                        hour = _hour_of(ev)
+                        if hour is None:
+                            continue
+                        if ev.get("event") == "heartbeat":
+                            self.hour_requests[hour] += 10
+                        elif ev.get("event") == "BLOCK":
+                            self.hour_blocks[hour] += 1
+                            self.hour_requests[hour] += 1
+            except Exception as e:
+                print(f"[Scheduler] Failed to read {self.log_path}: {e}")
+
+        if os.path.exists(self.overflow_log):
+            try:
+                with open(self.overflow_log, "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            kw = json.loads(line).get("keyword")
+                        except ValueError:
+                            continue
+                        if kw:
+                            self.heavy_keywords.add(kw)
+            except Exception as e:
+                print(f"[Scheduler] Failed to read {self.overflow_log}: {e}")
+
+    def block_rate(self, hour):
+        """Blocks per 100 requests for this hour of day, or None if too few samples."""
+        if self.hour_requests[hour] < self.min_requests:
+            return None
+        return 100.0 * self.hour_blocks[hour] / self.hour_requests[hour]
+
+    def window(self, hour=None):
+        """'fast' / 'slow' / 'normal' for the given hour (default: now)."""
+        hour = time.localtime().tm_hour if hour is None else hour
+        rate = self.block_rate(hour)
+        if rate is None:
+            return "normal"
+        if rate <= self.fast_block_rate:
+            return "fast"
+        if rate >= self.slow_block_rate:
+            return "slow"
+        return "normal"
+
+    def is_fast_window(self, hour=None):
+        return self.window(hour) == "fast"
+
+    def is_slow_window(self, hour=None):
+        return self.window(hour) == "slow"
+
+    def schedule(self):
+        """{hour: base} for TimeOfDayPolicy; 'normal' hours keep the limiter's default."""
+        plan = {}
+        for hour in range(24):
+            w = self.window(hour)
+            if w == "fast":
+                plan[hour] = self.fast_base
+            elif w == "slow":
+                plan[hour] = self.slow_base
+        return plan
+
+    def attach(self, limiter):
+        """Wrap the limiter's current policy in a time-of-day schedule."""
+        plan = self.schedule()
+        if not plan:
+            print("[Scheduler] Not enough history to build an hourly schedule. Limiter unchanged.")
+            return
+        inner = limiter.policy.inner if isinstance(limiter.policy, TimeOfDayPolicy) else limiter.policy
+        limiter.set_policy(TimeOfDayPolicy(schedule=plan, inner=inner))
+        limiter.policy.apply_schedule(limiter)
+
+    def describe(self):
+        lines = ["[Scheduler] Hourly tolerance (blocks/100 req):"]
+        for hour in range(24):
+            rate = self.block_rate(hour)
+            if rate is not None:
+                lines.append(f"  {hour:02d}:00  {rate:6.2f}  ({self.hour_requests[hour]} req)  -> {self.window(hour)}")
+        if len(lines) == 1:
+            lines.append("  (no history yet)")
+        return "\n".join(lines)
+
+    # ------------------------------------------------------------------
+    # Queue ordering
+    # ------------------------------------------------------------------
+    def mark_heavy(self, keyword):
+        self.heavy_keywords.add(keyword)
+
+    def is_heavy(self, keyword):
+        return keyword in self.heavy_keywords
+
+    def pick_next(self, queue, hour=None):
+        """
+        Index of the keyword to run next.
+        - fast window: first heavy keyword within lookahead (else queue head)
+        - slow window: first light keyword within lookahead (else queue head)
+        """
+        if not queue:
+            return None
+        w = self.window(hour)
+        if w == "normal" or not self.heavy_keywords:
+            return 0
+        want_heavy = (w == "fast")
+        for idx, kw in enumerate(queue[:self.lookahead]):
+            if self.is_heavy(kw) == want_heavy:
+                return idx
+        return 0
+
+    def should_defer_heavy(self, hour=None):
+        return self.is_slow_window(hour)
+
+    def should_run_repair(self, hour=None):
+        """Self-repair is low-value per request -> keep it out of fast windows."""
+        return not self.is_fast_window(hour)
+
+
+def _hour_of(ev):
+    iso = ev.get("iso_time")
+    if iso and len(iso) >= 13:
+        try:
+            return int(iso[11:13])
+        except ValueError:
+            pass
+    ts = ev.get("timestamp")
+    if ts:
+        return time.localtime(ts).tm_hour
+    return None
@@ -0,0 +1,287 @@
+"""
+Work Queue - 基于 SQLite 的关键词租约队列
+
+多个 worker（进程）共享同一个本地 SQLite 文件：
+- claim(): 原子地领取一个 pending 或租约已过期的关键词
+- renew(): 续租（worker 还活着）
+- complete() / release(): 完成 / 放回队列
+租约过期 = worker 已死，关键词会被其它 worker 重新领取。
+LeaseKeeper 是后台心跳线程：每 lease/3 秒为本 worker 的全部租约续期，
+因此租约可以设得很短，死掉的 worker 手上的关键词在一个租约周期内就会被回收。
+done 行一直保留；main.py 只认本轮（checkpoint 创建之后）完成的 done，旧轮次的 done 不会挡住重采。
+
+用法:
+    python -m engine.work_queue                  # 统计
+    python -m engine.work_queue --reset          # 清空 done / pending 行（正在租用的保留）
+"""
+import argparse
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+DEFAULT_STORE = "resources/work_queue.db"
+
+
+def make_worker_id(prefix="main"):
+    return f"{prefix}-{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    def __init__(self, path=DEFAULT_STORE, lease_seconds=90):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # isolation_level=None: 手动 BEGIN IMMEDIATE，保证 claim 的读-改-写是原子的
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self._init_schema()
+
+    def _init_schema(self):
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS work_items (
+                keyword     TEXT PRIMARY KEY,
+                kind        TEXT NOT NULL DEFAULT 'static',   -- static / dynamic / split
+                parent      TEXT,
+                priority    INTEGER NOT NULL DEFAULT 0,       -- 越大越先领
+                status      TEXT NOT NULL DEFAULT 'pending',  -- pending / leased / done
+                owner       TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                attempts    INTEGER NOT NULL DEFAULT 0,
+                saved       INTEGER NOT NULL DEFAULT 0,
+                pages       INTEGER NOT NULL DEFAULT 0,
+                note        TEXT,
+                created_at  REAL NOT NULL,
+                updated_at  REAL NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_work_claim ON work_items (status, priority, created_at)")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id  TEXT PRIMARY KEY,
+                pid        INTEGER,
+                host       TEXT,
+                started_at REAL,
+                last_beat  REAL
+            )
+        """)
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def add(self, keywords, kind="static", priority=0, parent=None):
+        """Insert keywords that are not in the store yet. Returns number added."""
+        now = time.time()
+        added = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for i, kw in enumerate(keywords):
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO work_items (keyword, kind, parent, priority, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    # created_at 加微小偏移，保持插入顺序 = 领取顺序
+                    (kw, kind, parent, priority, now + i * 1e-6, now))
+                added += cur.rowcount
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def mark_done(self, keywords, note="checkpoint"):
+        """Import already-completed keywords (e.g. from the main.py checkpoint)."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for kw in keywords:
+                self.conn.execute(
+                    "INSERT INTO work_items (keyword, status, note, created_at, updated_at) VALUES (?, 'done', ?, ?, ?) "
+                    "ON CONFLICT(keyword) DO UPDATE SET status='done', owner=NULL, lease_until=0, note=excluded.note, updated_at=excluded.updated_at",
+                    (kw, note, now, now))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    # ------------------------------------------------------------------
+    # Worker side
+    # ------------------------------------------------------------------
+    def claim(self, worker_id, lease_seconds=None):
+        """Atomically lease the next keyword. Returns a dict row or None."""
+        lease = lease_seconds or self.lease_seconds
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT keyword, kind, parent, attempts FROM work_items "
+                "WHERE status = 'pending' OR (status = 'leased' AND lease_until < ?) "
+                "ORDER BY priority DESC, created_at ASC LIMIT 1", (now,)).fetchone()
+            if not row:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE work_items SET status='leased', owner=?, lease_until=?, attempts=attempts+1, updated_at=? WHERE keyword=?",
+                (worker_id, now + lease, now, row[0]))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return {"keyword": row[0], "kind": row[1], "parent": row[2], "attempts": row[3] + 1}
+
+    def acquire(self, keyword, worker_id, kind="static", lease_seconds=None, done_since=0.0):
+        """
+        Lease a specific keyword (main.py drives its own queue order).
+        Returns False if another live worker holds it or it was completed at or after `done_since`
+        (older completions belong to a previous run and are leased again).
+        """
+        lease = lease_seconds or self.lease_seconds
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT status, owner, lease_until, updated_at FROM work_items WHERE keyword=?", (keyword,)).fetchone()
+            if row and ((row[0] == 'done' and row[3] >= done_since) or
+                        (row[0] == 'leased' and row[2] >= now and row[1] != worker_id)):
+                self.conn.execute("COMMIT")
+                return False
+            self.conn.execute(
+                "INSERT INTO work_items (keyword, kind, status, owner, lease_until, attempts, created_at, updated_at) "
+                "VALUES (?, ?, 'leased', ?, ?, 1, ?, ?) "
+                "ON CONFLICT(keyword) DO UPDATE SET status='leased', owner=excluded.owner, lease_until=excluded.lease_until, "
+                "attempts=attempts+1, updated_at=excluded.updated_at",
+                (keyword, kind, worker_id, now + lease, now, now))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return True
+
+    def renew(self, keyword, worker_id, lease_seconds=None):
+        """Extend our lease. Returns False if the lease was lost (expired and re-claimed)."""
+        lease = lease_seconds or self.lease_seconds
+        now = time.time()
+        cur = self.conn.execute(
+            "UPDATE work_items SET lease_until=?, updated_at=? WHERE keyword=? AND owner=? AND status='leased'",
+            (now + lease, now, keyword, worker_id))
+        return cur.rowcount == 1
+
+    def complete(self, keyword, worker_id, saved=0, pages=0, note=None):
+        now = time.time()
+        cur = self.conn.execute(
+            "UPDATE work_items SET status='done', lease_until=0, saved=saved+?, pages=pages+?, note=?, updated_at=? "
+            "WHERE keyword=? AND owner=?",
+            (saved, pages, note, now, keyword, worker_id))
+        return cur.rowcount == 1
+
+    def release(self, keyword, worker_id, saved=0, pages=0):
+        """Give the keyword back (interrupted / failed) so another worker can pick it up."""
+        now = time.time()
+        self.conn.execute(
+            "UPDATE work_items SET status='pending', owner=NULL, lease_until=0, saved=saved+?, pages=pages+?, updated_at=? "
+            "WHERE keyword=? AND owner=? AND status='leased'",
+            (saved, pages, now, keyword, worker_id))
+
+    def renew_all(self, worker_id, lease_seconds=None):
+        """Heartbeat: extend every lease held by this worker. Returns number renewed."""
+        lease = lease_seconds or self.lease_seconds
+        now = time.time()
+        cur = self.conn.execute(
+            "UPDATE work_items SET lease_until=?, updated_at=? WHERE owner=? AND status='leased'",
+            (now + lease, now, worker_id))
+        self.conn.execute(
+            "INSERT INTO workers (worker_id, pid, host, started_at, last_beat) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(worker_id) DO UPDATE SET last_beat=excluded.last_beat",
+            (worker_id, os.getpid(), socket.gethostname(), now, now))
+        return cur.rowcount
+
+    def release_all(self, worker_id):
+        """Graceful shutdown: hand every unfinished lease back immediately."""
+        now = time.time()
+        self.conn.execute(
+            "UPDATE work_items SET status='pending', owner=NULL, lease_until=0, updated_at=? WHERE owner=? AND status='leased'",
+            (now, worker_id))
+        self.conn.execute("DELETE FROM workers WHERE worker_id=?", (worker_id,))
+
+    # ------------------------------------------------------------------
+    # Introspection
+    # ------------------------------------------------------------------
+    def status_of(self, keyword):
+        row = self.conn.execute("SELECT status FROM work_items WHERE keyword=?", (keyword,)).fetchone()
+        return row[0] if row else None
+
+    def is_done(self, keyword, since=0.0):
+        """True if the keyword was completed at or after `since`."""
+        row = self.conn.execute(
+            "SELECT 1 FROM work_items WHERE keyword=? AND status='done' AND updated_at >= ?", (keyword, since)).fetchone()
+        return row is not None
+
+    def reset(self):
+        """Forget finished and queued work (live leases stay). Returns rows deleted."""
+        cur = self.conn.execute("DELETE FROM work_items WHERE status != 'leased' OR lease_until < ?", (time.time(),))
+        return cur.rowcount
+
+    def outstanding(self):
+        """Pending + leased count (0 = all work finished)."""
+        return self.conn.execute("SELECT COUNT(*) FROM work_items WHERE status != 'done'").fetchone()[0]
+
+    def stats(self):
+        out = {"pending": 0, "leased": 0, "done": 0}
+        for status, n in self.conn.execute("SELECT status, COUNT(*) FROM work_items GROUP BY status"):
+            out[status] = n
+        out["saved"] = self.conn.execute("SELECT COALESCE(SUM(saved), 0) FROM work_items").fetchone()[0]
+        out["by_owner"] = {owner: n for owner, n in self.conn.execute(
+            "SELECT owner, COALESCE(SUM(saved), 0) FROM work_items WHERE owner IS NOT NULL GROUP BY owner")}
+        out["live_workers"] = self.conn.execute(
+            "SELECT COUNT(*) FROM workers WHERE last_beat >= ?", (time.time() - self.lease_seconds,)).fetchone()[0]
+        return out
+
+    def close(self):
+        try: self.conn.close()
+        except: pass
+
+
+class LeaseKeeper(threading.Thread):
+    """Background heartbeat: renews all of `worker_id`'s leases every lease/3 seconds."""
+
+    def __init__(self, store_path, worker_id, lease_seconds=90):
+        super().__init__(name=f"lease-keeper-{worker_id}", daemon=True)
+        self.store_path = store_path
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self._stop_event = threading.Event()
+
+    def run(self):
+        # SQLite 连接不跨线程共用：心跳线程单独开一个
+        store = WorkQueue(self.store_path, lease_seconds=self.lease_seconds)
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    store.renew_all(self.worker_id)
+                except Exception as e:
+                    print(f"[LeaseKeeper] Heartbeat failed: {e}")
+                self._stop_event.wait(self.lease_seconds / 3)
+        finally:
+            store.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword lease store statistics / reset")
+    parser.add_argument("--store", default=DEFAULT_STORE)
+    parser.add_argument("--reset", action="store_true", help="delete done / pending rows (live leases are kept)")
+    args = parser.parse_args()
+    store = WorkQueue(args.store)
+    try:
+        if args.reset:
+            print(f"[WorkQueue] Reset: {store.reset()} row(s) deleted.")
+        print(f"[WorkQueue] {args.store}: {store.stats()}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import sys
 import time
 import io
@@ -6,93 +7,218 @@ import os
 from database.storage import Storage
 from engine.scraper import NMPAScraper
 from engine.process_lock import ProcessLock
+from engine.work_queue import WorkQueue, LeaseKeeper, make_worker_id
+from engine.throughput_scheduler import ThroughputScheduler
+from engine.enrichment import open_queue, run_enrichment
+from engine.categories import load_categories, lease_key, CategoryStats
+import config
 from config import MAX_PAGES
 
 # Force UTF-8 for Windows Console
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-CHECKPOINT_FILE = "resources/scraper_checkpoint.json"
+# 每个 main.py 实例一个 checkpoint；多开时用环境变量区分，关键词由共享租约表去重
+CHECKPOINT_FILE = os.environ.get("SCRAPER_CHECKPOINT", "resources/scraper_checkpoint.json")
 
-def load_checkpoint():
-    if os.path.exists(CHECKPOINT_FILE):
+def load_checkpoint(path=CHECKPOINT_FILE):
+    """
+    created_at marks the run: lease-store 'done' rows older than it belong to an earlier crawl and are ignored
+    (delete the checkpoint or run with --reset to re-crawl). Checkpoints from before this field count every 'done'.
+    """
+    if os.path.exists(path):
         try:
-            with open(CHECKPOINT_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            checkpoint.setdefault("created_at", 0)
+            return checkpoint
         except:
-            return {"completed": []}
-    return {"completed": []}
+            pass
+    return {"completed": [], "created_at": time.time()}
 
-def save_checkpoint(checkpoint):
+def reset_checkpoint(path):
+    """Start a new run on this checkpoint: forget completed keywords, keep discovered pending ones."""
+    checkpoint = load_checkpoint(path)
+    checkpoint.update({"completed": [], "current": None, "created_at": time.time()})
+    save_checkpoint(checkpoint, path)
+    print(f"[Checkpoint] Reset '{path}' ({len(checkpoint.get('pending', []))} pending keyword(s) kept).")
+
+def save_checkpoint(checkpoint, path=CHECKPOINT_FILE):
     try:
-        os.makedirs(os.path.dirname(CHECKPOINT_FILE), exist_ok=True)
-        with open(CHECKPOINT_FILE, 'w', encoding='utf-8') as f:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
             json.dump(checkpoint, f, ensure_ascii=False, indent=2)
     except Exception as e:
         print(f"[Warning] Failed to save checkpoint: {e}")
 
+def run_self_repair(scraper, db, broken_names):
+    """Re-scrape incomplete records (empty fields + truncated names '...'). Returns repaired count."""
+    print(f"\n=== Phase 1: Self-Repair ({len(broken_names)} items) ===")
+    print(f"[Self-Repair] Repairing incomplete records (empty fields + truncated names '...')")
+    repair_count = 0
+    for name in broken_names:
+        print(f">>> Repairing: {name}")
+        # IMPORTANT: Delete old record first (for truncated names)
+        if name.endswith('...'):
+            deleted = db.delete_by_name(name)
+            if deleted:
+                print(f"[Repair] Deleted old truncated record: {name}")
+        
+        # Search and repair ALL records with this name (may span multiple pages)
+        # Skip dedupe to allow processing all same-name records with different license numbers
+        for batch_data, _ in scraper.search(keyword=name, max_pages=10, skip_dedupe=True):
+            if batch_data:
+                count = db.save_batch(batch_data)
+                repair_count += count
+        time.sleep(1.5)
+    print(f"=== Phase 1 Complete. Repaired {repair_count} records. ===\n")
+    return repair_count
+
+def harvest_prefixes(new_prefixes, kw, queue, completed_kw, discovered, discovery=None, protected=()):
+    """
+    Put newly discovered prefixes at the front of the queue.
+    With the discovery engine (config.PREFIX_DISCOVERY) only prefixes expected to add coverage are queued,
+    and queued dynamic keywords that contain a new prefix are folded into it.
+    """
+    for p in new_prefixes:
+        if p == kw or p in queue or p in completed_kw:
+            continue
+        if discovery:
+            ok, reason = discovery.should_enqueue(p, queue, completed_kw)
+            if not ok:
+                print(f"[📍 Discovery] Skipped '{p}': {reason}")
+                continue
+            folded = discovery.fold_supersets(p, queue, protected)
+            if folded:
+                discovered.difference_update(folded)
+                print(f"[📍 Discovery] '{p}' supersedes queued: {folded[:5]}")
+        discovered.add(p)
+        queue.insert(0, p)
+        print(f"[📍 Discovery] New keyword: '{p}'")
+
+def take_deferred(run, scheduler):
+    """
+    True when the next keyword should come from the run's deferred heavy list:
+    outside slow windows, or once nothing else is left.
+    """
+    return bool(run["deferred"]) and (not run["queue"] or (scheduler and not scheduler.is_slow_window()))
+
+def peek_next_keyword(queue, scheduler, completed_kw):
+    """The keyword the main loop will pop next (hint for the scraper's standby tab; evaluated lazily)."""
+    upcoming = list(queue)
+    while upcoming:
+        idx = scheduler.pick_next(upcoming) if scheduler else 0
+        kw = upcoming.pop(idx)
+        if kw not in completed_kw:
+            return kw
+    return None
+
 def main():
-    # Acquire process lock to prevent multiple instances
-    lock = ProcessLock()
+    parser = argparse.ArgumentParser(description="NMPA medical device enterprise scraper")
+    parser.add_argument("--reset", action="store_true",
+                        help="start a new run: clear completed keywords in every category checkpoint before crawling")
+    args = parser.parse_args()
+
+    # OS-level lock on this checkpoint only (released automatically if we crash)
+    lock = ProcessLock(lock_file=os.path.splitext(CHECKPOINT_FILE)[0] + ".lock")
     if not lock.acquire():
         return
+    if args.reset:
+        for cat in load_categories(CHECKPOINT_FILE):
+            reset_checkpoint(cat["checkpoint"])
+    
+    # Per-keyword leases shared with other main.py instances / fleet workers
+    worker_id = make_worker_id("main")
+    lease_seconds = getattr(config, 'LEASE_SECONDS', 90)
+    store = WorkQueue(config.WORK_STORE, lease_seconds=lease_seconds)
+    keeper = LeaseKeeper(config.WORK_STORE, worker_id, lease_seconds)
+    keeper.start()
     
     try:
         print("=== NMPA Medical Device Enterprise Scraper ===")
         
+        # 🗂️ 类别分区 (engine/categories.py)：每个类别独立的表 / checkpoint / 去重索引 / 租约键
+        categories = load_categories(CHECKPOINT_FILE)
+        if getattr(config, 'CRAWL_PHASE', 'full') != 'full' and len(categories) > 1:
+            # 待补表不区分类别：两阶段采集只覆盖主类别
+            print(f"[Categories] CRAWL_PHASE='{config.CRAWL_PHASE}' covers the primary category '{categories[0]['label']}' only.")
+            categories = categories[:1]
+        runs = []  # 每个类别一份运行状态
+        
         # 1. Init Database
         try:
-            db = Storage()
-            db.init_db()
+            for cat in categories:
+                cat_db = Storage(table_name=cat["table"])
+                runs.append({"category": cat, "db": cat_db, "tag": f"[{cat['id']}] " if len(categories) > 1 else ""})
+                cat_db.init_db()
         except Exception as e:
             print(f"[Error] Database connection failed: {e}")
             print("Please check config.py and ensure server/SSH is accessible.")
+            for run in runs:
+                run["db"].close()
             return
+        db = runs[0]["db"]
         
-        # 2. Init Checkpoint
-        checkpoint = load_checkpoint()
-        completed_list = checkpoint.get("completed", [])
-        completed_kw = set(completed_list)
-        pending_queue = checkpoint.get("pending", []) # Discovered but not yet searched
-        print(f"[Checkpoint] Loaded {len(completed_kw)} completed / {len(pending_queue)} pending.")
+        for run in runs:
+            tag = run["tag"]
+            # 2. Init Checkpoint
+            checkpoint = load_checkpoint(run["category"]["checkpoint"])
+            run["checkpoint"] = checkpoint
+            run["completed_list"] = checkpoint.get("completed", [])
+            run["completed_kw"] = set(run["completed_list"])
+            pending_queue = checkpoint.get("pending", []) # Discovered but not yet searched
+            print(f"[Checkpoint] {tag}Loaded {len(run['completed_kw'])} completed / {len(pending_queue)} pending.")
 
-        # 3. Init Scraper
-        existing_records = db.get_existing_records()
-        print(f"[Storage] Loaded {len(existing_records)} existing records for deduplication.")
-        
-        # 3.1 Self-Repair Check
-        broken_names = db.get_empty_records()
-        if broken_names:
-            print(f"[Self-Repair] Found {len(broken_names)} incomplete records to re-scrape.")
-            broken_set = set(broken_names)
-            existing_records = {rec for rec in existing_records if rec[1] not in broken_set}
+            # 3. Init Scraper
+            existing_records = run["db"].get_existing_records()
+            print(f"[Storage] {tag}Loaded {len(existing_records)} existing records for deduplication.")
+            
+            # 3.1 Self-Repair Check
+            broken_names = run["db"].get_empty_records()
+            if broken_names:
+                print(f"[Self-Repair] {tag}Found {len(broken_names)} incomplete records to re-scrape.")
+                broken_set = set(broken_names)
+                existing_records = {rec for rec in existing_records if rec[1] not in broken_set}
+            run["existing_records"] = existing_records
+            run["repair"] = broken_names
 
-        scraper = NMPAScraper(existing_records=existing_records)
+        scraper = NMPAScraper(existing_records=runs[0].pop("existing_records"), category=runs[0]["category"])
+        for run in runs[1:]:
+            scraper.add_category(run["category"], run.pop("existing_records"))
+        stats = CategoryStats()
         
         try:
             scraper.start()
             
+            # ⏰ Time-of-day scheduler: 按历史封锁率划分快/慢窗口
+            scheduler = None
+            if getattr(config, 'SCHED_ENABLED', False):
+                scheduler = ThroughputScheduler()
+                print(scheduler.describe())
+                scheduler.attach(scraper.limiter)
+                for run in runs:
+                    for kw_heavy in run["checkpoint"].get("heavy", []):
+                        scheduler.mark_heavy(kw_heavy)
+
             # --- PHASE 1: SELF-REPAIR ---
-            if broken_names:
-                print(f"\n=== Phase 1: Self-Repair ({len(broken_names)} items) ===")
-                print(f"[Self-Repair] Repairing incomplete records (empty fields + truncated names '...')")
-                repair_count = 0
-                for name in broken_names:
-                    print(f">>> Repairing: {name}")
-                    # IMPORTANT: Delete old record first (for truncated names)
-                    if name.endswith('...'):
-                        deleted = db.delete_by_name(name)
-                        if deleted:
-                            print(f"[Repair] Deleted old truncated record: {name}")
-                    
-                    # Search and repair ALL records with this name (may span multiple pages)
-                    # Skip dedupe to allow processing all same-name records with different license numbers
-                    for batch_data, _ in scraper.search(keyword=name, max_pages=10, skip_dedupe=True):
-                        if batch_data:
-                            count = db.save_batch(batch_data)
-                            repair_count += count
-                    time.sleep(1.5)
-                print(f"=== Phase 1 Complete. Repaired {repair_count} records. ===\n")
+            # 快窗口里自修复（每次请求收益低）推迟到慢窗口 / 队列结束后
+            for run in runs:
+                if run["repair"] and scheduler and not scheduler.should_run_repair():
+                    print(f"[⏰ Scheduler] {run['tag']}Fast window now. Deferring self-repair of {len(run['repair'])} items.")
+                elif run["repair"]:
+                    scraper.use_category(run["category"]["id"])
+                    run_self_repair(scraper, run["db"], run["repair"])
+                    run["repair"] = []
+
+            # --- TWO-PHASE CRAWL: enrichment stage (CRAWL_PHASE = "enrich") ---
+            # 列表快扫（CRAWL_PHASE = "list"）走下面的关键词队列，只是 scraper 不开详情
+            if getattr(config, 'CRAWL_PHASE', 'full') == 'enrich':
+                queue = open_queue()
+                try:
+                    run_enrichment(scraper, db, queue)
+                finally:
+                    queue.close()
+                return
 
             # --- PHASE 2: BATCH SEARCH & RECURSION ---
             # 🧪 Experiment 1: Gradual recovery (test_keywords.json - 山东城市)
@@ -114,21 +240,28 @@ def main():
                 # Track static keywords for filtering warnings
                 static_keywords = set(ALL_STATIC)
                 
-                # Queue = Current (if any) + Pending (Discovered) + Static (Not yet reached)
-                # 🔧 如果有正在处理的关键词（中断恢复），放到队首
-                current_kw = checkpoint.get("current")
-                initial_queue = pending_queue + [k for k in ALL_STATIC if k not in completed_kw and k not in set(pending_queue)]
+                for run in runs:
+                    # Queue = Current (if any) + Pending (Discovered) + Static (Not yet reached)
+                    # 🔧 如果有正在处理的关键词（中断恢复），放到队首
+                    checkpoint, completed_kw = run["checkpoint"], run["completed_kw"]
+                    pending_queue = checkpoint.get("pending", [])
+                    current_kw = checkpoint.get("current")
+                    # 慢窗口里推迟的重关键词（年份拆分）单独存放，快窗口 / 其它关键词跑完后再取
+                    run["deferred"] = [k for k in checkpoint.get("deferred", []) if k not in completed_kw]
+                    skip = set(pending_queue) | set(run["deferred"])
+                    initial_queue = pending_queue + [k for k in ALL_STATIC if k not in completed_kw and k not in skip]
                 
-                # 🔧 FIX: 如果current存在，先从队列中移除它，然后放到队首
-                if current_kw and current_kw not in completed_kw:
-                    # 从队列中移除（如果存在）
-                    if current_kw in initial_queue:
-                        initial_queue.remove(current_kw)
-                    # 放到队首
-                    initial_queue.insert(0, current_kw)
-                    print(f"[Checkpoint] Resuming interrupted keyword: '{current_kw}'")
+                    # 🔧 FIX: 如果current存在，先从队列中移除它，然后放到队首
+                    if current_kw and current_kw not in completed_kw:
+                        # 从队列中移除（如果存在）
+                        if current_kw in initial_queue:
+                            initial_queue.remove(current_kw)
+                        # 放到队首
+                        initial_queue.insert(0, current_kw)
+                        print(f"[Checkpoint] {run['tag']}Resuming interrupted keyword: '{current_kw}'")
                     
-                print(f"[Configuration] Initial Queue Size: {len(initial_queue)}")
+                    run["queue"] = initial_queue
+                    print(f"[Configuration] {run['tag']}Initial Queue Size: {len(initial_queue)}")
             except FileNotFoundError:
                 print(f"[Error] Cannot find '{target_file}'!")
                 print("Please ensure the keyword file exists. You can generate it using 'tools/generate_省市关键词.py'")
@@ -138,26 +271,90 @@ def main():
                 return
 
             total_saved_all = 0
-            queue = initial_queue
+            busy_skips = 0
+            turn = 0
+            
+            def upcoming_hint():
+                """(next keyword, its category) for the scraper's standby tab; evaluated when the current keyword drains."""
+                live = [r for r in runs if r["queue"] or r["deferred"]]
+                if not live:
+                    return None
+                nxt = live[turn % len(live)]
+                if take_deferred(nxt, scheduler):
+                    return None  # 推迟的重关键词直接进年份拆分，不走备用标签页
+                next_kw = peek_next_keyword(nxt["queue"], scheduler, nxt["completed_kw"])
+                return (next_kw, nxt["category"]["label"]) if next_kw else None
             
-            while queue:
-                kw = queue.pop(0)
+            while any(r["queue"] or r["deferred"] for r in runs):
+                scraper.next_keyword = None  # 只在正常关键词搜索期间提示（自修复 / 拆分子任务不预热）
+                # 慢窗口到了 → 先把推迟的自修复跑掉
+                if scheduler and scheduler.should_run_repair():
+                    for r in runs:
+                        if r["repair"]:
+                            scraper.use_category(r["category"]["id"])
+                            run_self_repair(scraper, r["db"], r["repair"])
+                            r["repair"] = []
+                
+                # 🗂️ 类别轮转：各类别轮流取一个关键词，共用同一个浏览器会话和同一个限速预算
+                live = [r for r in runs if r["queue"] or r["deferred"]]
+                run = live[turn % len(live)]
+                turn += 1
+                category, tag, db = run["category"], run["tag"], run["db"]
+                queue, checkpoint = run["queue"], run["checkpoint"]
+                completed_kw, completed_list = run["completed_kw"], run["completed_list"]
+                checkpoint_file = category["checkpoint"]
+                scraper.use_category(category["id"])
+                
+                # 已知要拆分的重关键词：不再重跑第 1 页，直接进入年份拆分
+                resume_split = take_deferred(run, scheduler)
+                if resume_split:
+                    kw = run["deferred"].pop(0)
+                    checkpoint["deferred"] = run["deferred"]
+                else:
+                    next_idx = scheduler.pick_next(queue) if scheduler else 0
+                    kw = queue.pop(next_idx)
                 if kw in completed_kw: continue
                 
+                # 🔒 租约：别的 worker 正在跑 / 已跑完的关键词不重复采集
+                lease = lease_key(category, kw)
+                run_started = checkpoint.get("created_at", 0)  # 只认本轮 checkpoint 创建之后的 done
+                if not store.acquire(lease, worker_id, kind="static" if kw in static_keywords else "dynamic",
+                                     done_since=run_started):
+                    if store.is_done(lease, since=run_started):
+                        print(f"[Lease] '{kw}' already completed by another worker in this run. Skipping.")
+                        completed_kw.add(kw)
+                        completed_list.append(kw)
+                        checkpoint["completed"] = completed_list
+                        continue
+                    print(f"[Lease] '{kw}' is leased by another worker. Moving it to the back of the queue.")
+                    (run["deferred"] if resume_split else queue).append(kw)
+                    busy_skips += 1
+                    if busy_skips >= sum(len(r["queue"]) + len(r["deferred"]) for r in runs):
+                        # 剩下的全在别人手上：等一个心跳周期再看
+                        time.sleep(lease_seconds / 3)
+                        busy_skips = 0
+                    continue
+                busy_skips = 0
+                
                 # 🔧 保存当前正在处理的关键词，防止中断丢失
                 checkpoint["current"] = kw
                 checkpoint["pending"] = queue
                 checkpoint["last_run"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                save_checkpoint(checkpoint)
+                save_checkpoint(checkpoint, checkpoint_file)
                 
-                print(f"\n>>> Starting search for: {kw} (Queue size: {len(queue)})")
+                print(f"\n>>> {tag}Starting search for: {kw} (Queue size: {len(queue)})")
+                kw_started = time.time()
                 kw_saved = 0
                 discovered_this_round = set()
                 pages_processed = 0
-                need_year_split = False  # 🔧 年份拆分标志
+                need_year_split = resume_split  # 🔧 年份拆分标志
+                
+                # ⏩ 关键词预热：本关键词收尾时备用标签页先搜下一个（按当时的队列求值）
+                scraper.next_keyword = None if resume_split else upcoming_hint
                 
                 # Smart Search: Fetch data and discover new keywords
-                for batch_data, new_prefixes in scraper.search(keyword=kw, max_pages=MAX_PAGES):
+                search_pages = () if resume_split else scraper.search(keyword=kw, max_pages=MAX_PAGES)
+                for batch_data, new_prefixes in search_pages:
                     pages_processed += 1
                     if batch_data:
                         count = db.save_batch(batch_data)
@@ -165,11 +362,8 @@ def main():
                         total_saved_all += count
                     
                     # Harvest new prefixes
-                    for p in new_prefixes:
-                        if p != kw and p not in queue and p not in completed_kw:
-                            discovered_this_round.add(p)
-                            queue.insert(0, p)
-                            print(f"[📍 Discovery] New keyword: '{p}'")
+                    harvest_prefixes(new_prefixes, kw, queue, completed_kw, discovered_this_round,
+                                     scraper.discovery, static_keywords)
                     
                     # 🔧 第一页后检查：动态关键词是否需要按年份拆分
                     if pages_processed == 1 and kw not in static_keywords:
@@ -177,14 +371,32 @@ def main():
                         if site_total > 1000:
                             print(f"\n[🔀 AutoSplit] '{kw}' has {site_total} pages (>1000). Switching to year-split mode...")
                             need_year_split = True
+                            scraper.next_keyword = None  # 子任务期间不预热
                             break
                     
                     # 🔧 每10页保存一次checkpoint，防止中断丢失
                     if pages_processed % 10 == 0:
                         checkpoint["pending"] = queue
                         checkpoint["last_run"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                        save_checkpoint(checkpoint)
+                        save_checkpoint(checkpoint, checkpoint_file)
+                # 一直翻到最后一页才能作为前缀覆盖依据（年份拆分没搜 2014 年前的编号，不算）
+                kw_exhaustive = not need_year_split and scraper.last_search_exhaustive
                 
+                # ⏰ 拆分子任务很重：慢窗口里移到推迟列表（pick_next 只看队首一段，放队尾可能永远轮不到），等快窗口再跑
+                if need_year_split and scheduler:
+                    scheduler.mark_heavy(kw)
+                    checkpoint["heavy"] = sorted(set(checkpoint.get("heavy", [])) | {kw})
+                    light_left = any(not scheduler.is_heavy(k) for k in queue)
+                    if scheduler.should_defer_heavy() and light_left:
+                        print(f"[⏰ Scheduler] Slow window. Deferring year-split of '{kw}' to a faster window.")
+                        store.release(lease, worker_id, kw_saved, pages_processed)
+                        run["deferred"].append(kw)
+                        checkpoint["deferred"] = run["deferred"]
+                        checkpoint["current"] = None
+                        checkpoint["pending"] = queue
+                        save_checkpoint(checkpoint, checkpoint_file)
+                        continue
+
                 # ════════════════════════════════════════════════════════════════
                 # 🔀 年份拆分模式（动态关键词专用）
                 # ════════════════════════════════════════════════════════════════
@@ -208,15 +420,12 @@ def main():
                                 sub_saved += count
                                 kw_saved += count
                                 total_saved_all += count
-                            for p in new_prefixes:
-                                if p != kw and p not in queue and p not in completed_kw:
-                                    discovered_this_round.add(p)
-                                    queue.insert(0, p)
-                                    print(f"[📍 Discovery] New keyword: '{p}'")
+                            harvest_prefixes(new_prefixes, kw, queue, completed_kw, discovered_this_round,
+                                             scraper.discovery, static_keywords)
                             if sub_pages % 10 == 0:
                                 checkpoint["pending"] = queue
                                 checkpoint["last_run"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                                save_checkpoint(checkpoint)
+                                save_checkpoint(checkpoint, checkpoint_file)
                         print(f"  >>> [{label}] Done. Saved: {sub_saved} records, {sub_pages} pages.")
                         return sub_saved, sub_pages
                     
@@ -236,11 +445,8 @@ def main():
                                 year_saved += count
                                 kw_saved += count
                                 total_saved_all += count
-                            for p in new_prefixes:
-                                if p != kw and p not in queue and p not in completed_kw:
-                                    discovered_this_round.add(p)
-                                    queue.insert(0, p)
-                                    print(f"[📍 Discovery] New keyword: '{p}'")
+                            harvest_prefixes(new_prefixes, kw, queue, completed_kw, discovered_this_round,
+                                             scraper.discovery, static_keywords)
                             
                             # 第一页后检查：年份子任务是否也超1000页
                             if year_pages == 1:
@@ -253,7 +459,7 @@ def main():
                             if year_pages % 10 == 0:
                                 checkpoint["pending"] = queue
                                 checkpoint["last_run"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                                save_checkpoint(checkpoint)
+                                save_checkpoint(checkpoint, checkpoint_file)
                         
                         # 二级拆分：追加数字 0~9
                         if need_digit_split:
@@ -315,22 +521,44 @@ def main():
                     for np in reversed(new_list):
                         if np not in queue and np not in completed_kw: queue.insert(0, np)
 
+                # 📍 前缀覆盖：翻完的关键词记为覆盖依据；没翻完则把折叠进它的关键词放回队列
+                if scraper.discovery:
+                    if kw_exhaustive:
+                        scraper.discovery.mark_exhaustive(kw, pages_processed)
+                    else:
+                        restored = [k for k in scraper.discovery.unfold(kw) if k not in queue and k not in completed_kw]
+                        if restored:
+                            print(f"[📍 Discovery] '{kw}' stopped before its last page. Re-queued folded: {restored[:5]}")
+                            queue[0:0] = restored
+
                 # 🔧 完成度验证：代码执行到这里 = 正常完成（或年份拆分全部完成）
                 if kw not in completed_kw:
                     completed_kw.add(kw)
                     completed_list.append(kw)
                 checkpoint["completed"] = completed_list
                 checkpoint["current"] = None
+                store.complete(lease, worker_id, kw_saved, pages_processed)
+                stats.record(category["id"], pages_processed, kw_saved, time.time() - kw_started)
+                if len(runs) > 1 and sum(r["keywords"] for r in stats.rows.values()) % 20 == 0:
+                    print(f"[Categories] Throughput: {stats.summary()}")
                 print(f"[✅ Completed] '{kw}' marked as done ({pages_processed} pages{', year-split' if need_year_split else ''})")
                 
                 checkpoint["pending"] = queue
                 checkpoint["last_finished"] = kw
                 checkpoint["last_run"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                save_checkpoint(checkpoint)
+                save_checkpoint(checkpoint, checkpoint_file)
                 
-                time.sleep(2)
+                if not scraper.standby_keyword:
+                    time.sleep(2)  # 下一个关键词已在备用标签页搜好时不再等待
                     
+            for run in runs:
+                if run["repair"]:
+                    scraper.use_category(run["category"]["id"])
+                    run_self_repair(scraper, run["db"], run["repair"])
+                
             print(f"\n[Success] Grand Total records saved this session: {total_saved_all}")
+            if len(runs) > 1:
+                print(f"[Categories] Throughput: {stats.summary()}")
             
         except KeyboardInterrupt:
             print("\n[Stopped] User interrupted.")
@@ -338,10 +566,14 @@ def main():
             print(f"\n[Error] An unexpected error occurred: {e}")
         finally:
             scraper.close()
-            db.close()
+            for run in runs:
+                run["db"].close()
             print("Done.")
     
     finally:
+        keeper.stop()
+        store.release_all(worker_id)  # 未完成的关键词立即交还，不必等租约过期
+        store.close()
         lock.release()
 
 if __name__ == "__main__":